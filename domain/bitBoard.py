@@ -0,0 +1,339 @@
+"""
+Made to replace MiniMaxBoardClass in the minimax algorithm, as copying lists of strings at every node is pretty heavy
+The whole board is a single integer: bit (row * 6 + col) is 1 if that square is blocked (a move or locked), 0 if it's empty
+(row and col are 0-indexed here, the public methods still take 1-indexed values like the other boards)
+"""
+from texttable import Texttable
+from domain.board import Characters
+
+SIZE = 6
+CELLS = SIZE * SIZE
+FULL_MASK = (1 << CELLS) - 1  # every square is blocked, the game is over
+
+
+def _buildLockMask(cell: int) -> int:
+	"""
+	:param cell: index of the square (row * 6 + col)
+	:return: the mask of the 3x3 grid around the square (the squares a move there locks)
+	"""
+	row, col = divmod(cell, SIZE)
+	mask = 0
+
+	for i in range(row - 1, row + 2):
+		for j in range(col - 1, col + 2):
+			if 0 <= i < SIZE and 0 <= j < SIZE:
+				mask |= 1 << (i * SIZE + j)
+
+	return mask
+
+
+# precomputed so that making a move is a single OR
+LOCK_MASKS = tuple(_buildLockMask(cell) for cell in range(CELLS))
+
+
+def cellToMove(cell: int) -> list:
+	"""
+	:param cell: index of the square (row * 6 + col)
+	:return: [row, col] 1-indexed, like the moves that BoardClass takes
+	"""
+	return [cell // SIZE + 1, cell % SIZE + 1]
+
+
+def moveToCell(row: int, col: int) -> int:
+	"""
+	:param row: row on board (1-indexed)
+	:param col: column on board (1-indexed)
+	:return: index of the square (row * 6 + col, 0-indexed)
+	"""
+	return (row - 1) * SIZE + (col - 1)
+
+
+def iterCells(mask: int):
+	"""
+	goes through the set bits of a mask, lowest first (which is the same row by row order as the old loops)
+	:param mask: the mask
+	:return: generator of square indexes
+	"""
+	while mask:
+		low = mask & -mask
+		mask ^= low
+		yield low.bit_length() - 1
+
+
+# the 8 symmetries of the board (rotations and reflections), a position and its 7 copies play exactly the same
+# each one maps (row, col) to a new (row, col), 0 is the identity
+_LAST = SIZE - 1
+SYMMETRY_FUNCTIONS = (
+	lambda r, c: (r, c),  # identity
+	lambda r, c: (c, _LAST - r),  # rotated 90 degrees
+	lambda r, c: (_LAST - r, _LAST - c),  # rotated 180 degrees
+	lambda r, c: (_LAST - c, r),  # rotated 270 degrees
+	lambda r, c: (r, _LAST - c),  # mirrored left-right
+	lambda r, c: (_LAST - r, c),  # mirrored up-down
+	lambda r, c: (c, r),  # mirrored on the main diagonal
+	lambda r, c: (_LAST - c, _LAST - r),  # mirrored on the other diagonal
+)
+SYMMETRIES = len(SYMMETRY_FUNCTIONS)
+
+
+
+def _buildSymmetryCell(sym: int, cell: int) -> int:
+	"""
+	:param sym: index of the symmetry
+	:param cell: index of the square
+	:return: index of the square after the symmetry is applied
+	"""
+	row, col = SYMMETRY_FUNCTIONS[sym](*divmod(cell, SIZE))
+	return row * SIZE + col
+
+
+# SYMMETRY_CELLS[sym][cell] = the cell it gets moved to
+SYMMETRY_CELLS = tuple(tuple(_buildSymmetryCell(sym, cell) for cell in range(CELLS)) for sym in range(SYMMETRIES))
+
+# INVERSE_SYMMETRY[sym] = the symmetry that undoes sym
+INVERSE_SYMMETRY = tuple(
+	next(inv for inv in range(SYMMETRIES) if all(SYMMETRY_CELLS[inv][SYMMETRY_CELLS[sym][cell]] == cell for cell in range(CELLS)))
+	for sym in range(SYMMETRIES)
+)
+
+# transforming a mask bit by bit is slow, so it's done a row at a time:
+# _SYMMETRY_ROWS[sym][row][bits of that row] = the transformed mask of those bits
+_SYMMETRY_ROWS = tuple(
+	tuple(
+		tuple(
+			sum(1 << SYMMETRY_CELLS[sym][row * SIZE + col] for col in range(SIZE) if rowBits >> col & 1)
+			for rowBits in range(1 << SIZE)
+		)
+		for row in range(SIZE)
+	)
+	for sym in range(SYMMETRIES)
+)
+_ROW_MASK = (1 << SIZE) - 1
+
+
+def transformMask(mask: int, sym: int) -> int:
+	"""
+	:param mask: a mask of squares
+	:param sym: index of the symmetry (0 - 7)
+	:return: the mask after the symmetry is applied
+	"""
+	rows = _SYMMETRY_ROWS[sym]
+	return (rows[0][mask & _ROW_MASK] | rows[1][mask >> 6 & _ROW_MASK] | rows[2][mask >> 12 & _ROW_MASK]
+			| rows[3][mask >> 18 & _ROW_MASK] | rows[4][mask >> 24 & _ROW_MASK] | rows[5][mask >> 30])
+
+
+def canonicalMask(mask: int) -> tuple:
+	"""
+	the canonical form is the smallest of the 8 symmetric masks, so all 8 copies of a position have the same one
+	:param mask: a mask of squares
+	:return: (the canonical mask, the symmetry that turns mask into it)
+	"""
+	bestMask, bestSym = mask, 0
+
+	for sym in range(1, SYMMETRIES):
+		transformed = transformMask(mask, sym)
+		if transformed < bestMask:
+			bestMask, bestSym = transformed, sym
+
+	return bestMask, bestSym
+
+
+# masks of the first and last column, so that shifting left/right doesn't wrap to the next row
+_FIRST_COLUMN = sum(1 << (row * SIZE) for row in range(SIZE))
+_LAST_COLUMN = _FIRST_COLUMN << (SIZE - 1)
+
+
+def neighbourhood(mask: int) -> int:
+	"""
+	:param mask: a mask of squares
+	:return: the mask plus every square touching it (sides and corners), the squares a move in mask could lock
+	"""
+	# the square after the last one (bit 36) would come back to the board on the last row when shifted up,
+	# so the shifted masks are cut to the board right away
+	mask |= (mask << 1 & FULL_MASK & ~_FIRST_COLUMN) | (mask >> 1 & ~_LAST_COLUMN)
+	return (mask | mask << SIZE | mask >> SIZE) & FULL_MASK
+
+
+def _growRegion(group: int, empty: int) -> int:
+	"""
+	:param group: some squares of a group
+	:param empty: mask of the empty squares
+	:return: the whole group (every empty square connected to it)
+	"""
+	while True:
+		grown = neighbourhood(group) & empty
+		if grown == group:
+			return group
+		group = grown
+
+
+def isSplit(empty: int) -> bool:
+	"""
+	:param empty: mask of the empty squares
+	:return: True if the empty squares are split into more than one group (see regions)
+	"""
+	return _growRegion(empty & -empty, empty) != empty
+
+
+def regions(empty: int) -> list:
+	"""
+	splits the empty squares into groups that don't touch each other (not even by a corner), a move in one of them
+	can't lock anything in the others, so each one is a separate game
+	:param empty: mask of the empty squares
+	:return: list of masks, one for each group
+	"""
+	groups = []
+
+	while empty:
+		group = _growRegion(empty & -empty, empty)
+		groups.append(group)
+		empty ^= group
+
+	return groups
+
+
+def canonicalShape(region: int) -> int:
+	"""
+	the same shape anywhere on the board, rotated or mirrored, plays the same
+	:param region: mask of a group of squares
+	:return: the smallest of the 8 symmetric versions of the shape, each moved to the top left corner
+	"""
+	best = None
+
+	for sym in range(SYMMETRIES):
+		shape = transformMask(region, sym)
+
+		# moving it up (whole rows) and then left (every square has col >= the first used col, so nothing wraps)
+		shape >>= ((shape & -shape).bit_length() - 1) // SIZE * SIZE
+		columns = 0
+		rows = shape
+		while rows:
+			columns |= rows & _ROW_MASK
+			rows >>= SIZE
+		shape >>= (columns & -columns).bit_length() - 1
+
+		if best is None or shape < best:
+			best = shape
+
+	return best
+
+
+class BitBoardClass:
+	__slots__ = ("__blocked",)
+
+	def __init__(self, blocked: int = 0):
+		"""
+		:param blocked: mask of the blocked squares (0 = empty board)
+		"""
+		self.__blocked = blocked
+
+	@staticmethod
+	def fromBoardList(boardList: list):
+		"""
+		creates a bitboard from BoardClass.boardList
+		:param boardList: 6x6 list of strings, "" for empty squares
+		:return: the bitboard
+		"""
+		blocked = 0
+
+		for i in range(SIZE):
+			for j in range(SIZE):
+				if boardList[i][j] != Characters.EMPTY:
+					blocked |= 1 << (i * SIZE + j)
+
+		return BitBoardClass(blocked)
+
+	def toBoardList(self) -> list:
+		"""
+		the bitboard doesn't know who made each move, so every blocked square is shown as locked
+		:return: 6x6 list of strings in the same format as BoardClass.boardList
+		"""
+		boardList = []
+
+		for i in range(SIZE):
+			boardList.append([])
+			for j in range(SIZE):
+				if self.__blocked >> (i * SIZE + j) & 1:
+					boardList[-1].append(Characters.LOCKED)
+				else:
+					boardList[-1].append(Characters.EMPTY)
+
+		return boardList
+
+	@property
+	def blocked(self) -> int:
+		"""
+		:return: mask of the blocked squares
+		"""
+		return self.__blocked
+
+	@property
+	def empty(self) -> int:
+		"""
+		:return: mask of the empty squares (where moves can be made)
+		"""
+		return FULL_MASK ^ self.__blocked
+
+	def isMoveValid(self, row: int, col: int) -> bool:
+		"""
+		Checks if a move is valid (no range checks, same as MiniMaxBoardClass)
+		:param row: row on board
+		:param col: column on board
+		:return: True if the move is valid, False otherwise
+		"""
+		return not self.__blocked >> moveToCell(row, col) & 1
+
+	def makeMove(self, row: int, col: int) -> bool:
+		"""
+		Makes a move on the board (locks the 3x3 grid around it)
+		:param row: row on board
+		:param col: column on board
+		:return: True if the move was made
+		"""
+		self.__blocked |= LOCK_MASKS[moveToCell(row, col)]
+		return True
+
+	def cloneBoard(self):
+		"""
+		:return: a clone of the board (it's just an int, so it's basically free)
+		"""
+		return BitBoardClass(self.__blocked)
+
+	@property
+	def gameOver(self) -> bool:
+		"""
+		:return: True if the board is full, False otherwise
+		"""
+		return self.__blocked == FULL_MASK
+
+	def availableMoves(self) -> int:
+		"""
+		:return: the number of available moves
+		"""
+		return (FULL_MASK ^ self.__blocked).bit_count()
+
+	def validMoves(self) -> list:
+		"""
+		:return: list of all the valid moves as [row, col], row by row
+		"""
+		return [cellToMove(cell) for cell in iterCells(FULL_MASK ^ self.__blocked)]
+
+	def __eq__(self, other) -> bool:
+		return isinstance(other, BitBoardClass) and self.__blocked == other.blocked
+
+	def __hash__(self) -> int:
+		return hash(self.__blocked)
+
+	def __str__(self) -> str:
+		"""
+		:return: a string representation of the board
+		"""
+
+		txtTable = Texttable()
+
+		boardList = self.toBoardList()
+		txtTable.add_row([" "] + [i for i in range(1, 7)])
+		for i in range(0, 6):
+			txtTable.add_row([i + 1] + boardList[i])
+
+		return txtTable.draw()
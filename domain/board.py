@@ -30,6 +30,9 @@ class BoardClass:
 		Characters() # init characters
 		self.__board = []
 		self.__moves = []
+		# bit (row * 6 + col) is 1 if that square is empty, kept up to date by makeMove so that the AI
+		# doesn't need to copy and walk the board to know the position (same layout as BitBoardClass)
+		self.__emptyMask = (1 << 36) - 1
 		
 		# init board
 		for i in range(6):
@@ -114,6 +117,7 @@ class BoardClass:
 			for j in range(col - 1, col + 2):
 				if 0 <= i <= 5 and 0 <= j <= 5:
 					self.__board[i][j] = Characters.LOCKED
+					self.__emptyMask &= ~(1 << (i * 6 + j))
 		
 		self.__moves.append([row, col])
 		
@@ -125,6 +129,13 @@ class BoardClass:
 		
 		return True
 	
+	@property
+	def emptyMask(self) -> int:
+		"""
+		:return: the empty squares as an int, bit (row * 6 + col) is 1 if that square is empty (0-indexed)
+		"""
+		return self.__emptyMask
+	
 	@property
 	def boardList(self):
 		"""
@@ -142,14 +153,7 @@ class BoardClass:
 		:return: the number of available moves
 		"""
 		
-		nr = 0
-		
-		for row in range(6):
-			for col in range(6):
-				if self.__board[row][col] == Characters.EMPTY:
-					nr += 1
-		
-		return nr
+		return self.__emptyMask.bit_count()
 	
 	def __str__(self) -> str:
 		"""
@@ -0,0 +1,327 @@
+"""
+Cache of the best moves of the AI (files/AICache.bin), kept between games
+The entries are in 3 places: the cache file (BinaryTableClass, opened with mmap), the log next to it (RecordLogClass,
+every new entry is appended to it right away) and the new entries in memory, the log is folded into the file when it
+gets long
+
+key: the canonical mask of the empty squares (the smallest of the 8 rotations/reflections), different moves can leave
+the same empty squares and the game only depends on them
+record: the best move (square index, rotated the same way as the key), flags, the search time it saves (milliseconds),
+the empty squares of the position
+
+The number of entries is capped, the entries to drop are picked with GreedyDual (a cost aware LRU): every entry has a
+priority, set to inflation + cost when it's added or used, the entry with the lowest priority is dropped first and the
+inflation becomes its priority, so an expensive entry that isn't used anymore still gets dropped eventually, and a cheap
+entry goes before an expensive one used just as recently
+the priorities only live in memory, the entries of the file start with their cost when the game starts
+the cap is checked when the log is folded into the file (the file is rewritten anyway then), so it can go over it by
+the length of the log
+
+A cache file should be opened with AICacheClass.open, which gives everyone in the process the same AICacheClass (the
+games of the GUI, the games of an event loop, the pondering thread), so the entries aren't split between 2 views of the
+same file, a compaction still reads the file and the log from the disk again before it rewrites them (another game
+process can have changed them), the processes take a file lock (path + ".lock") to append to the log and for the whole
+compaction, so nothing is appended between reading the log and emptying it
+The log is only folded into the file every compactEvery entries (the whole file is rewritten then), or when the game
+ends and there's no cache file yet
+source: https://www.usenix.org/legacy/publications/library/proceedings/usits97/full_papers/cao/cao.pdf
+"""
+import contextlib
+import os
+import threading
+from services import ServicesError
+from services.BinaryTable import BinaryTableClass, RecordLogClass, FileLockClass, readRecordLog, loadOldCache, RECORD, KEY_EMPTY
+
+# the biggest search time a record can hold (the value of a record is an i16)
+MAX_COST = 32767
+
+# log entries between 2 compactions, a compaction rewrites the whole file, the log is only read when the cache is opened
+COMPACT_EVERY = 1 << 12
+
+
+class AICacheClass:
+	# the caches opened with AICacheClass.open, absolute path: [the cache, how many times it's open]
+	__shared = {}
+	__sharedLock = threading.Lock()
+
+
+	def __init__(self, path: str, maxEntries: int = 1 << 16, compactEvery: int = COMPACT_EVERY):
+		"""
+		opens the cache file and replays the log of the entries added since it was written
+		:param path: path of the cache file (the log is path + ".log")
+		:param maxEntries: the most entries kept, the ones with the lowest priority are dropped when it's over it
+		:param compactEvery: the log is folded into the cache file once it has this many entries
+		"""
+		if maxEntries < 1:
+			raise ServicesError("the cache needs room for at least 1 entry")
+
+		self.__path = path
+		self.__maxEntries = maxEntries
+		self.__compactEvery = compactEvery
+		# the cache can be used by several threads (see AICacheClass.open)
+		self.__lock = threading.RLock()
+		# key of the cache in __shared (None = not shared)
+		self.__sharedKey = None
+
+		self.__file = None
+		# the entries added since the file was written, they're also in the log
+		self.__newEntries = {}
+		self.__log = None
+		# between the processes that use the file (None = no folder for the cache, nothing is written)
+		self.__fileLock = None
+
+		# GreedyDual priorities of the entries added or used in this game, the others have their cost as priority
+		self.__priorities = {}
+		self.__inflation = 0
+
+		self.__hits = 0
+		self.__misses = 0
+		self.__stores = 0
+		self.__evictions = 0
+		self.__compactions = 0
+
+		try:
+			self.__fileLock = FileLockClass(path + ".lock")
+		except FileNotFoundError:
+			# no folder for the cache, the new entries only stay in memory
+			pass
+
+		with self.__lockFile():
+			try:
+				self.__file = BinaryTableClass(path)
+			except ServicesError:
+				# old cache (pickle or keyed by the moves), it gets written in the new format on the next save
+				self.__newEntries = loadOldCache(path)
+
+			self.__newEntries.update(readRecordLog(path + ".log"))
+			if self.__fileLock is not None:
+				self.__log = RecordLogClass(path + ".log")
+
+
+	@classmethod
+	def open(cls, path: str, maxEntries: int = 1 << 16, compactEvery: int = COMPACT_EVERY):
+		"""
+		:param path: path of the cache file
+		:param maxEntries, compactEvery: see __init__ (only used by the first one to open the path)
+		:return: the cache of the path, the same AICacheClass for everyone that opens it in this process, it's only
+		really closed when all of them have closed it
+		"""
+		sharedKey = os.path.abspath(path)
+
+		with cls.__sharedLock:
+			shared = cls.__shared.get(sharedKey)
+			if shared is None:
+				cache = cls(path, maxEntries, compactEvery)
+				cache.__sharedKey = sharedKey
+				shared = cls.__shared[sharedKey] = [cache, 0]
+
+			shared[1] += 1
+			return shared[0]
+
+
+	def __lockFile(self):
+		"""
+		:return: the file lock to hold in a with block (one that does nothing if there's no folder for the cache)
+		"""
+		return self.__fileLock or contextlib.nullcontext()
+
+
+	@staticmethod
+	def __cost(record: tuple) -> int:
+		"""
+		:param record: (move, flags, search time in ms, empty squares)
+		:return: the cost of the entry (entries from before the search times were saved count as 1 ms)
+		"""
+		return max(record[2], 1)
+
+
+	def get(self, key: int) -> tuple | None:
+		"""
+		:param key: canonical mask of the empty squares
+		:return: (move, flags, search time in ms, empty squares) or None if the position isn't cached
+		"""
+		with self.__lock:
+			record = self.__newEntries.get(key)
+			if record is None and self.__file is not None:
+				record = self.__file.get(key)
+
+			if record is None:
+				self.__misses += 1
+				return None
+
+			self.__hits += 1
+			self.__priorities[key] = self.__inflation + self.__cost(record)
+			return record
+
+
+	def __contains__(self, key: int) -> bool:
+		"""
+		like get, but it doesn't count as a use of the entry
+		"""
+		with self.__lock:
+			if key in self.__newEntries:
+				return True
+			return self.__file is not None and key in self.__file
+
+
+	def put(self, key: int, move: int, flags: int, seconds: float, emptySquares: int):
+		"""
+		adds an entry (it's in the log right away)
+		:param key: canonical mask of the empty squares
+		:param move: the best move, rotated the same way as the key
+		:param flags: flags of the record (FLAG_PROVEN)
+		:param seconds: how long the search of the move took
+		:param emptySquares: number of empty squares of the position
+		"""
+		record = (move, flags, min(int(seconds * 1000), MAX_COST), emptySquares)
+
+		with self.__lock:
+			self.__newEntries[key] = record
+			self.__priorities[key] = self.__inflation + self.__cost(record)
+			self.__stores += 1
+
+			if self.__log is not None:
+				with self.__lockFile():
+					self.__log.append(key, record)
+				if len(self.__log) >= self.__compactEvery:
+					self.compact()
+
+
+	def save(self):
+		"""
+		makes sure the new entries are on the disk (they're already in the log, the log is only folded into the cache
+		file when it gets long, or when there's no log or cache file)
+		"""
+		with self.__lock:
+			if self.__log is not None:
+				self.__log.sync()
+
+			if self.__log is None or self.__file is None or not len(self.__file) or len(self.__log) >= self.__compactEvery:
+				self.compact()
+
+
+	def compact(self):
+		"""
+		folds the new entries into the cache file (the entries of the file and of the log, read again from the disk, and
+		the new ones are written to a new file, which replaces the old one), drops the entries over the cap and
+		empties the part of the log that was read
+		if the game is closed in the middle of it, either the old file and the log or the new file are still there
+		"""
+		with self.__lock, self.__lockFile():
+			logPath = self.__path + ".log"
+			logSize = os.path.exists(logPath) and os.path.getsize(logPath) or 0
+			if not self.__newEntries and not logSize:
+				return
+
+			if self.__file is not None:
+				self.__file.close()
+
+			# another cache on the same file (another game process) may have rewritten it or added to the log
+			records = {}
+			if BinaryTableClass.keyTypeOf(self.__path) == KEY_EMPTY:
+				table = BinaryTableClass(self.__path)
+				for record in table.items():
+					records[record[0]] = record[1:]
+				table.close()
+			records.update(readRecordLog(logPath, logSize))
+			records.update(self.__newEntries)
+
+			self.__evict(records)
+
+			try:
+				BinaryTableClass.write(self.__path, records)
+			except FileNotFoundError:
+				# the old file is already closed, so everything stays in memory
+				self.__file = None
+				self.__newEntries = records
+				return
+
+			self.__newEntries = {}
+			self.__file = BinaryTableClass(self.__path)
+			self.__compactions += 1
+			if self.__log is not None:
+				self.__log.clear(logSize)
+
+
+	def __evict(self, records: dict):
+		"""
+		drops the entries with the lowest priority until there are at most maxEntries
+		:param records: dictionary key: record, changed in place
+		"""
+		extra = len(records) - self.__maxEntries
+		if extra <= 0:
+			return
+
+		priority = lambda key: self.__priorities.get(key, self.__cost(records[key]))
+		for key in sorted(records, key=priority)[:extra]:
+			self.__inflation = max(self.__inflation, priority(key))
+			self.__priorities.pop(key, None)
+			del records[key]
+
+		self.__evictions += extra
+
+
+	def __len__(self) -> int:
+		with self.__lock:
+			if self.__file is None:
+				return len(self.__newEntries)
+			return len(self.__file) + sum(1 for key in self.__newEntries if key not in self.__file)
+
+
+	def resetStats(self):
+		"""
+		resets the counters
+		"""
+		self.__hits = 0
+		self.__misses = 0
+		self.__stores = 0
+		self.__evictions = 0
+		self.__compactions = 0
+
+
+	@property
+	def stats(self) -> dict:
+		"""
+		:return: dictionary with the counters of the cache and its size
+		"""
+		lookups = self.__hits + self.__misses
+		entries = len(self)
+
+		return {
+			"hits": self.__hits,
+			"misses": self.__misses,
+			"hitRate": lookups and self.__hits / lookups,
+			"stores": self.__stores,
+			"evictions": self.__evictions,
+			"compactions": self.__compactions,
+			"entries": entries,
+			"maxEntries": self.__maxEntries,
+			"logEntries": self.__log is not None and len(self.__log) or 0,
+			"bytes": entries * RECORD.size,
+			"fileBytes": os.path.exists(self.__path) and os.path.getsize(self.__path) or 0,
+		}
+
+
+	def close(self):
+		"""
+		syncs and closes the log and closes the cache file (the cache can't be used after this)
+		a cache from AICacheClass.open is only closed by the last one that opened it
+		"""
+		if self.__sharedKey is not None:
+			with AICacheClass.__sharedLock:
+				shared = AICacheClass.__shared[self.__sharedKey]
+				shared[1] -= 1
+				if shared[1]:
+					return
+				del AICacheClass.__shared[self.__sharedKey]
+
+		with self.__lock:
+			if self.__log is not None:
+				self.__log.close()
+				self.__log = None
+			if self.__file is not None:
+				self.__file.close()
+				self.__file = None
+			if self.__fileLock is not None:
+				self.__fileLock.close()
+				self.__fileLock = None
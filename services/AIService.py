@@ -1,39 +1,241 @@
 
-import pickle
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from random import randint
+from services import ServicesError
+from services.AICache import AICacheClass
+from services.BinaryTable import BinaryTableClass, FLAG_PROVEN
 from repository.Repo import RepositoryClass
-from domain.minimaxBoard import MiniMaxBoardClass
+from domain.bitBoard import BitBoardClass, LOCK_MASKS, FULL_MASK, cellToMove, moveToCell, iterCells, canonicalMask, regions, isSplit, SYMMETRY_CELLS, INVERSE_SYMMETRY
+from services.GrundySolver import GrundySolverClass
+from services.MoveOrdering import MoveOrderingClass, MAX_PLIES
+from services.SearchStats import SearchStatsClass
+from services.Tablebase import TablebaseClass
+from services.TranspositionTable import TranspositionTableClass, EXACT, LOWER, UPPER, KEY, SCORE, FLAG, DEPTH, MOVE
+
+# a search with this many moves left is a full search (there are only 36 squares)
+FULL_DRAFT = 36
+
+# "pvs" - principal variation search (negamax form), "minimax" - the plain alpha-beta minimax,
+# "dfpn" - proves who wins first (depth-first proof-number search), then the pvs only looks for the fastest win/slowest loss
+ALGORITHMS = ("pvs", "minimax", "dfpn")
+
+# proof/disproof number of a position that can't be proven (infinity)
+PROOF_INFINITY = 1 << 30
+
+# half the width of the aspiration window of the principal variation search (the scores are between -10 and 10)
+ASPIRATION = 2
+
+
+class _SearchTimeout(Exception):
+	"""
+	raised inside minimax when the time limit of the move is up (or the move is cancelled), to stop the search right away
+	"""
+
+
+class SearchCancelledError(ServicesError):
+	"""
+	raised by makeMove when the move was cancelled (AIClass.cancel), the board is left as it was
+	"""
+
+
+# the AI of a worker process of the parallel search and the best root score found so far by all the workers
+_workerAI = None
+_sharedAlpha = None
+
+
+def _initWorker(sharedAlpha, options: dict):
+	"""
+	runs once in every worker process of the parallel search
+	:param sharedAlpha: multiprocessing.Value with the best root score found so far (shared by all the workers)
+	:param options: the arguments for the AIClass of the worker
+	"""
+	global _workerAI, _sharedAlpha
+	_workerAI = AIClass(None, cachePath=None, bookPath=None, **options)
+	_sharedAlpha = sharedAlpha
+
+
+def _searchRootMove(blocked: int, cell: int, draft: int, beta: int, searchId: int, deadline: float | None) -> int:
+	"""
+	runs in a worker process, scores one move of the root
+	the move only has to beat the best score found so far by any worker, so the search starts from it (minus 1, so a
+	move as good as the best one still gets its exact score, the first one in the root order has to win ties)
+	:return: the score of the move, exact if it's >= the best score so far, otherwise just something lower
+	"""
+	alpha = _sharedAlpha.value
+	score = _workerAI.scoreRootMove(blocked, cell, alpha - 1, beta, draft, searchId, deadline)
+	
+	with _sharedAlpha.get_lock():
+		if score > _sharedAlpha.value:
+			_sharedAlpha.value = score
+	
+	return score
+
 
 class AIClass:
-	def __init__(self, repo: RepositoryClass):
+	def __init__(
+		self,
+		repo: RepositoryClass,
+		timeLimit: float | None = None,
+		tableMegabytes: float = 16,
+		tableReplacement: str = "depth",
+		minEmptyForSymmetry: int = 24,
+		useGrundy: bool = True,
+		grundyTablePath: str | None = "files/GrundyTable.bin",
+		workers: int = 1,
+		moveOrdering: str = "static,killers",
+		algorithm: str = "pvs",
+		cachePath: str | None = "files/AICache.bin",
+		cacheMaxEntries: int = 1 << 16,
+		cacheMinSeconds: float = 0.05,
+		cacheInteriorMinEmpty: int | None = None,
+		bookPath: str | None = "files/OpeningBook.bin",
+		tablebasePath: str | None = "files/Tablebase.bin",
+		statsLogPath: str | None = None,
+		ponder: bool = False,
+	):
+		"""
+		:param repo: the repository with the board
+		:param timeLimit: max number of seconds the AI can think about a move (None = no limit, full search)
+		with a limit it searches deeper and deeper until the time is up and plays the best move found so far
+		:param tableMegabytes: memory cap of the transposition table used by minimax (0 = no table)
+		:param tableReplacement: replacement policy of the transposition table ("depth" / "always")
+		:param minEmptyForSymmetry: positions with at least this many empty squares are stored in the transposition
+		table under their canonical form (the 8 rotations/reflections share an entry), 37 = never
+		:param useGrundy: if True, in positions where the empty squares are split into separate groups the
+		Sprague-Grundy values (GrundySolverClass) say who wins, the search only looks for how soon (and prunes the
+		positions where that can't change the move)
+		:param grundyTablePath: path of the table of the Grundy values of the shapes (built with
+		services/GrundyTableBuilder.py, the new shapes are added to it by saveCache, None = no table, every shape is
+		solved when it's needed)
+		:param workers: number of processes that search the moves of the root at the same time (1 = no extra
+		processes, 0 = one for every CPU core), the move is the same as the one of a search with 1 worker
+		:param moveOrdering: how the moves are sorted before they're searched (see MoveOrderingClass.fromName),
+		"static,killers" = by the squares each move locks, then killer moves first, "none" = row by row
+		:param algorithm: "pvs" - principal variation search, with aspiration windows when there's a time limit,
+		"minimax" - plain alpha-beta minimax, "dfpn" - proof-number search for who wins, then pvs only among the
+		winning moves (or the losing ones) for the fastest win or the slowest loss (all 3 pick the same moves,
+		with a time limit dfpn searches like pvs, a proof that runs out of time gives no move)
+		:param cachePath: path of the cache of the best moves (None = no cache, every move is searched)
+		:param cacheMaxEntries: the most positions kept in the cache (16 bytes each), see AICacheClass
+		:param cacheMinSeconds: only the moves that took at least this long to search are cached (the others are
+		about as fast to search again as to look up)
+		:param cacheInteriorMinEmpty: after every move, the positions inside the search tree with at least this many
+		empty squares that were solved exactly (not just bounds) are cached too, None = only the moves played
+		:param bookPath: path of the opening book (built with services/OpeningBookBuilder.py, None = no book)
+		:param tablebasePath: path of the endgame tablebase (built with services/Tablebase.py, None = no tablebase)
+		:param statsLogPath: the SearchStatsClass of every move is appended to this file as a line of JSON (None = no log)
+		:param ponder: True = after every AI move, the replies of the human are searched on a background thread while
+		the human thinks (see startPondering)
+		"""
+		if algorithm not in ALGORITHMS:
+			raise ServicesError("algorithm must be one of " + str(ALGORITHMS))
+		
 		self.__repo = repo
 		self.__bestMove = None
+		self.__pvs = algorithm != "minimax"
+		self.__dfpn = algorithm == "dfpn"
+		
+		# proof search: empty mask: (proof number, disproof number), from the point of view of the player to move
+		# when it gets bigger than __maxProofEntries, the positions that aren't proven yet are dropped
+		self.__proofTable = {}
+		self.__maxProofEntries = 1 << 20
+		
+		self.__timeLimit = timeLimit
+		self.__deadline = None
+		# set by cancel() from another thread, checked with the deadline
+		self.__cancelled = False
+		# a move is made on the board and cancel() is called one at a time, so once cancel() returns either the move
+		# is already made or it won't be
+		self.__moveLock = threading.Lock()
+		self.__nodes = 0
+		# counted for the SearchStatsClass of every move: positions searched and cutoffs at every depth, positions
+		# solved by the tablebase and by Grundy values, depth of the last finished iterative deepening search
+		self.__plyNodes = [0] * MAX_PLIES
+		self.__plyCutoffs = [0] * MAX_PLIES
+		self.__tablebaseHits = 0
+		self.__grundyHits = 0
+		self.__lastDraft = None
+		self.__statsLogPath = statsLogPath
+		self.__lastStats = None
+		
+		# pondering: canonical empty mask after a reply of the human: (SearchStatsClass of the AI move for it, the move
+		# as a canonical square), filled by the pondering thread, the search stops right away when __ponderStop is set
+		# and no other reply is started after __ponderLast is set (the lock keeps __ponderKey and __ponderLast in sync)
+		self.__ponder = ponder
+		self.__ponderThread = None
+		self.__ponderMoves = {}
+		self.__ponderKey = None
+		self.__ponderStop = False
+		self.__ponderLast = False
+		self.__ponderLock = threading.Lock()
+		# True if the last move came from a full search (or the cache), False if the time ran out before
+		self.__lastMoveProven = True
+		# the best move of the last depth, searched first by the next one
+		self.__rootFirstCell = None
+		
+		# positions reached through different move orders are only searched once
+		self.__table = tableMegabytes and TranspositionTableClass(tableMegabytes, tableReplacement) or None
+		# positions with fewer empty squares than this are faster to search than to look up
+		self.__minEmptyForTable = 4
+		# canonicalizing costs 7 mask transforms, it's only worth it for big subtrees
+		self.__minEmptyForSymmetry = minEmptyForSymmetry
+		# once the board splits into groups that don't touch each other, the groups are separate games and
+		# the nim-sum of their Grundy values says who wins, the search only has to find out how soon
+		# the values of the shapes are precomputed in the Grundy table (services/GrundyTableBuilder.py)
+		# (solving the shapes that aren't in it stops like the search, when it's cancelled or the time is up)
+		self.__grundy = GrundySolverClass(grundyTablePath, self.__checkStop) if useGrundy else None
+		# small positions are faster to search than to split into groups
+		self.__minEmptyForGrundy = 12
+		
+		# the exact result of every position with few empty squares, the search stops as soon as it gets to one
+		# (positions with more than __tablebaseEmpty empty squares aren't looked up, -1 = no tablebase)
+		self.__tablebase = None
+		self.__tablebaseEmpty = -1
+		if tablebasePath is not None:
+			self.__tablebase = TablebaseClass(tablebasePath)
+			self.__tablebaseEmpty = self.__tablebase.maxEmpty
+		
+		# good moves first = more pruning
+		self.__ordering = MoveOrderingClass.fromName(moveOrdering)
+		# sorting costs more than it saves in small positions
+		self.__minEmptyForOrdering = 6
+		
+		# the root moves are split between worker processes, each with its own transposition table
+		# the pool is only started on the first parallel search (starting the processes takes a while)
+		self.__workers = workers or os.cpu_count() or 1
+		self.__workerOptions = {
+			"tableMegabytes": tableMegabytes, "tableReplacement": tableReplacement,
+			"minEmptyForSymmetry": minEmptyForSymmetry, "useGrundy": useGrundy, "grundyTablePath": grundyTablePath,
+			"moveOrdering": moveOrdering, "algorithm": algorithm, "tablebasePath": tablebasePath,
+		}
+		self.__pool = None
+		self.__sharedAlpha = None
+		self.__searchId = 0
+		self.__lastSearchId = None
+		# small positions are searched faster than they're sent to the workers
+		self.__minEmptyForParallel = 16
 		
 		# the first move of the AI is always gonna be one of the 4, no reason to not store them and wait like 10 sec
 		# for the AI to keep computing it
 		self.__bestFirstMoves = [(1, 1), (1, 6), (6, 6), (6, 1)]
-		self.__minAvailableMovesForCache = 20
 		
-		# opening the cache file
-		try:
-			cacheFile = open("files/AICache.bin", "rb")
-			self.__cache = pickle.load(cacheFile)
-		except (FileNotFoundError, EOFError):
-			self.__cache = {}
-			# it's inside looks like this:
-			"""
-			{
-				20 = [  # 20 is the available moves from that position and the moves before are the moves done by others
-					{ "moves": board.moves, "bestMove": move },
-					{ "moves": board.moves, "bestMove": move },
-					{ "moves": board.moves, "bestMove": move },
-					...
-				],
-				21 = [
-					...
-				]
-			}
-			"""
+		# the cache file is a BinaryTableClass file (mmap, hash indexed), so nothing gets parsed here, the new
+		# entries are appended to a log as soon as they're found, so closing the game before it's over doesn't lose them
+		self.__cache = None
+		if cachePath is not None:
+			self.__cache = AICacheClass.open(cachePath, cacheMaxEntries)
+		self.__cacheMinSeconds = cacheMinSeconds
+		self.__cacheInteriorMinEmpty = cacheInteriorMinEmpty
+		
+		# the opening book has the best move of every position with a lot of empty squares, it's only read
+		# same keys and records as the cache
+		self.__book = None
+		if bookPath is not None:
+			self.__book = BinaryTableClass(bookPath)
 	
 	
 	def getRndMove(self):  # no longer used
@@ -50,176 +252,1157 @@ class AIClass:
 		return row, col
 	
 	
-	def makeFirstMove(self):
+	def makeFirstMove(self) -> SearchStatsClass:
 		"""
 		the first move of the AI is always gonna be in a corner
 		makes a move at the coordinates of one of the corners
+		:return: the stats of the move (nothing searched)
 		"""
 		rndBestMove = self.__bestFirstMoves[randint(0, len(self.__bestFirstMoves)-1)]
+		stats = SearchStatsClass("first", rndBestMove, self.__repo.board.availableMoves())
 		self.__repo.board.makeMove(False, *rndBestMove)
+		
+		if self.__ponder:
+			self.startPondering()
+		return self.__finishStats(stats)
 
 
-	def makeMove(self):
+	def makeMove(self, timeLimit: float | None = None) -> SearchStatsClass:
 		"""
 		makes an AI move
+		:param timeLimit: max number of seconds for this move (None = the time limit of the AI), the smaller of the two
+		is used
+		:return: the stats of the move (where it came from, what was searched)
+		:raises SearchCancelledError: if cancel() was called before or during the move
 		"""
+		if timeLimit is None or self.__timeLimit is not None and self.__timeLimit < timeLimit:
+			timeLimit = self.__timeLimit
+		
+		empty = self.__repo.board.emptyMask
+		# if the position is the one being pondered, the pondering search is finished first
+		self.stopPondering(empty)
+		self.__checkCancelled()
+		
+		start = time.perf_counter()
 		availableMoves = self.__repo.board.availableMoves()
-		if availableMoves >= self.__minAvailableMovesForCache:
-			move = self.__getMoveFromCache(availableMoves)
-			if move:
-				self.__repo.board.makeMove(False, *move)
-				return
-			
-		self.__repo.board.makeMove(False, *self.__getBestMove())
+		source = None
+		move = None
+		if self.__cache is not None:
+			move = self.__getMoveFromCache()
+			source = "cache"
+		if move is None and self.__book is not None:
+			move = self.__getMoveFromBook()
+			source = "book"
+		if move is None and availableMoves <= self.__tablebaseEmpty:
+			entry = self.__tablebase.probe(empty)
+			if entry is not None:
+				move = cellToMove(entry[2])
+				source = "tablebase"
+		
+		if move:
+			self.__lastMoveProven = True
+			self.__nodes = 0
+			stats = SearchStatsClass(source, move, availableMoves)
+		else:
+			stats = self.__getPonderedMove(empty)
+			if stats is None:
+				try:
+					stats = self.__search(empty, timeLimit)
+				except _SearchTimeout:
+					# only a cancel stops the search of a move
+					self.__cancelled = False
+					raise SearchCancelledError("the move was cancelled")
+		
+		# the replies that weren't played are dropped
+		self.__ponderMoves = {}
+		
+		with self.__moveLock:
+			# a cancel that came after the search still stops the move
+			self.__checkCancelled()
+			self.__repo.board.makeMove(False, *stats.move)
+		stats.seconds = time.perf_counter() - start
+		
+		if self.__ponder:
+			self.startPondering()
+		return self.__finishStats(stats)
+	
+	
+	def makeFallbackMove(self, ponder: bool = True) -> SearchStatsClass:
+		"""
+		makes a move without searching, for when there's no time left for one: the first move the search would try
+		(the move of the transposition table, or the one that locks the most empty squares)
+		:param ponder: False = the replies aren't pondered after the move even if pondering is on (for when a cancelled
+		search is still stopping)
+		:return: the stats of the move (not proven)
+		"""
+		self.stopPondering()
+		start = time.perf_counter()
+		
+		# the same lock as the move of makeMove, a cancelled move that's still stopping can't make its move meanwhile
+		with self.__moveLock:
+			empty = self.__repo.board.emptyMask
+			move = cellToMove(self.__rootCells(FULL_MASK ^ empty)[0])
+			stats = SearchStatsClass("fallback", move, empty.bit_count())
+			stats.proven = False
+			self.__lastMoveProven = False
+			self.__nodes = 0
+			self.__repo.board.makeMove(False, *move)
+		stats.seconds = time.perf_counter() - start
+		
+		if self.__ponder and ponder:
+			self.startPondering()
+		return self.__finishStats(stats)
+	
+	
+	def __search(self, empty: int, timeLimit: float | None) -> SearchStatsClass:
+		"""
+		searches the best move of a position, doesn't change the board (the pondering thread uses it too)
+		:param empty: mask of the empty squares (not 0)
+		:param timeLimit: max number of seconds (None = full search)
+		:return: the stats of the search (the time is only the time of the search)
+		:raises _SearchTimeout: if the search was cancelled or the pondering was stopped
+		"""
+		self.__plyNodes = [0] * MAX_PLIES
+		self.__plyCutoffs = [0] * MAX_PLIES
+		self.__tablebaseHits = 0
+		self.__grundyHits = 0
+		self.__lastDraft = None
+		tableStats = self.tableStats
+		start = time.perf_counter()
+		
+		move = self.__getBestMove(empty, timeLimit)
+		stats = SearchStatsClass("search", move, empty.bit_count())
+		stats.seconds = time.perf_counter() - start
+		
+		stats.proven = self.__lastMoveProven
+		stats.draft = self.__lastDraft
+		stats.nodes = self.__nodes
+		depth = len(self.__plyNodes)
+		while depth and not self.__plyNodes[depth - 1]:
+			depth -= 1
+		stats.plyNodes = self.__plyNodes[:depth]
+		stats.plyCutoffs = self.__plyCutoffs[:depth]
+		stats.tablebaseHits = self.__tablebaseHits
+		stats.grundyHits = self.__grundyHits
+		if tableStats is not None:
+			stats.tableHits = self.tableStats["hits"] - tableStats["hits"]
+			stats.tableMisses = self.tableStats["misses"] - tableStats["misses"]
+		
+		return stats
+	
+	
+	def startPondering(self):
+		"""
+		starts searching the replies of the human on a background thread, the likely ones first (in the order the
+		search tries the moves), each one like a move of the AI (with the time limit), symmetric replies only once
+		and the replies with an answer in the cache, the opening book or the tablebase not at all
+		makeMove uses the result of the reply the human made and drops the others
+		"""
+		self.stopPondering()
+		
+		empty = self.__repo.board.emptyMask
+		if not empty:
+			return
+		
+		self.__ponderMoves = {}
+		self.__ponderStop = False
+		self.__ponderLast = False
+		self.__ponderThread = threading.Thread(target=self.__ponderReplies, args=(empty,), daemon=True)
+		self.__ponderThread.start()
+	
+	
+	def stopPondering(self, empty: int | None = None):
+		"""
+		stops the pondering thread (if it's running) and waits for it
+		:param empty: mask of the empty squares the AI has to move in now, if it's the position being pondered, its
+		search is finished instead of stopped (None = stop right away)
+		"""
+		thread = self.__ponderThread
+		if thread is None or not thread.is_alive():
+			return
+		
+		with self.__ponderLock:
+			self.__ponderLast = True
+			if empty is None or self.__ponderKey is None or self.__ponderKey != canonicalMask(empty)[0]:
+				self.__ponderStop = True
+		
+		thread.join()
+		self.__ponderStop = False
+	
+	
+	@property
+	def pondering(self) -> bool:
+		"""
+		:return: True if the pondering thread is searching
+		"""
+		return self.__ponderThread is not None and self.__ponderThread.is_alive()
+	
+	
+	def __ponderReplies(self, empty: int):
+		"""
+		runs on the pondering thread, searches the position after every reply of the human until it's stopped
+		:param empty: mask of the empty squares, the human to move
+		"""
+		searched = set()
+		
+		try:
+			for cell in self.__rootCells(FULL_MASK ^ empty):
+				reply = empty & ~LOCK_MASKS[cell]
+				# no empty squares left = the human won, nothing to answer
+				if not reply or self.__isKnown(reply):
+					continue
+				
+				key, sym = canonicalMask(reply)
+				if key in searched:
+					continue
+				searched.add(key)
+				
+				with self.__ponderLock:
+					if self.__ponderLast:
+						return
+					self.__ponderKey = key
+				
+				try:
+					stats = self.__search(reply, self.__timeLimit)
+				except _SearchTimeout:
+					return
+				
+				self.__ponderMoves[key] = (stats, SYMMETRY_CELLS[sym][moveToCell(*stats.move)])
+		finally:
+			self.__ponderKey = None
+	
+	
+	def __isKnown(self, empty: int) -> bool:
+		"""
+		:param empty: mask of the empty squares
+		:return: True if the move of the position is in the cache, the opening book or the tablebase (no search needed)
+		"""
+		key, sym = canonicalMask(empty)
+		if self.__cache is not None and key in self.__cache:
+			return True
+		if self.__book is not None and self.__book.get(key) is not None:
+			return True
+		return empty.bit_count() <= self.__tablebaseEmpty and self.__tablebase.probe(empty) is not None
+	
+	
+	def __getPonderedMove(self, empty: int) -> SearchStatsClass | None:
+		"""
+		:param empty: mask of the empty squares
+		:return: the stats of the move found for the position by the pondering thread (None if it wasn't pondered)
+		"""
+		key, sym = canonicalMask(empty)
+		pondered = self.__ponderMoves.get(key)
+		if pondered is None:
+			return None
+		
+		stats, cell = pondered
+		# the position may be a rotation of the one searched
+		stats.source = "ponder"
+		stats.move = list(cellToMove(SYMMETRY_CELLS[INVERSE_SYMMETRY[sym]][cell]))
+		self.__lastMoveProven = stats.proven
+		self.__nodes = stats.nodes
+		return stats
+	
+	
+	def cancel(self):
+		"""
+		stops the move being searched (or the next one, if no move is being searched), can be called from another
+		thread, the search stops within 256 positions (or one Grundy shape) and makeMove raises SearchCancelledError
+		without making a move, if the move is made already when cancel() returns, the cancel is for the next move
+		the moves already sent to the worker processes of the parallel search run until they're done or the time is up
+		"""
+		with self.__moveLock:
+			self.__cancelled = True
+	
+	
+	def clearCancel(self):
+		"""
+		forgets a cancel() that came too late to stop a move (so it doesn't cancel the next one)
+		"""
+		self.__cancelled = False
+	
+	
+	def __checkCancelled(self):
+		"""
+		:raises SearchCancelledError: if cancel() was called (only once for every call of cancel)
+		"""
+		if self.__cancelled:
+			self.__cancelled = False
+			raise SearchCancelledError("the move was cancelled")
 	
 	
-	def __getMoveFromCache(self, availableMoves: int) -> list | None:
+	def __checkStop(self):
+		"""
+		:raises _SearchTimeout: if the search was cancelled, the pondering was stopped or the time is up
+		"""
+		if self.__cancelled or self.__ponderStop or self.__deadline is not None and time.monotonic() > self.__deadline:
+			raise _SearchTimeout()
+	
+	
+	def __finishStats(self, stats: SearchStatsClass) -> SearchStatsClass:
+		"""
+		keeps the stats of the move and writes them to the log
+		:param stats: the stats of the move
+		:return: the stats
+		"""
+		self.__lastStats = stats
+		if self.__statsLogPath is not None:
+			stats.writeLine(self.__statsLogPath)
+		return stats
+	
+	
+	@property
+	def lastStats(self) -> SearchStatsClass | None:
+		"""
+		:return: the stats of the last move (None before the first one)
+		"""
+		return self.__lastStats
+	
+	
+	def __getMoveFromCache(self) -> list | None:
 		"""
 		gets the best possible move from cache
-		:param availableMoves: number of available moves
 		:return: the move or None if there isn't one cached already
 		"""
-		moves = self.__getSortedMoves() # current board moves sorted
+		key, sym = self.__getCacheKey()
 		
-		if availableMoves in self.__cache:
-			for moveDict in self.__cache[availableMoves]:
-				if moveDict["moves"] == moves:  # they've both been ordered so this works as it should
-					return moveDict["bestMove"]
+		record = self.__cache.get(key)
+		if record is not None:
+			# the move is stored for the canonical position, it has to be rotated back to our board
+			return cellToMove(SYMMETRY_CELLS[INVERSE_SYMMETRY[sym]][record[0]])
+	
+	
+	def __getMoveFromBook(self) -> list | None:
+		"""
+		gets the best possible move from the opening book
+		:return: the move or None if the position isn't in the book
+		"""
+		key, sym = self.__getCacheKey()
+		
+		record = self.__book.get(key)
+		if record is not None:
+			return cellToMove(SYMMETRY_CELLS[INVERSE_SYMMETRY[sym]][record[0]])
 	
 	
 	def saveCache(self):
 		"""
-		saves the cache file
+		saves the new shapes of the Grundy table and makes sure the new cache entries are on the disk (see
+		AICacheClass.save), the pondering is stopped first (it adds to the cache too)
 		"""
+		self.stopPondering()
 		
-		try:
-			cacheFile = open("files/AICache.bin", "wb")
-			pickle.dump(self.__cache, cacheFile)
-		except FileNotFoundError:
-			pass
+		if self.__grundy is not None:
+			self.__grundy.saveTable()
+		
+		if self.__cache is not None:
+			self.__cache.save()
 	
 	
-	@staticmethod
-	def __sortKey(move): # key function used for sorting moves
-		return move[0], move[1]
+	def compactCache(self):
+		"""
+		folds the new cache entries into the cache file and empties its log (see AICacheClass.compact)
+		"""
+		if self.__cache is not None:
+			self.__cache.compact()
 	
 	
-	def __getSortedMoves(self) -> list:
+	@property
+	def cacheStats(self) -> dict | None:
 		"""
-		sorts the moves list
-		:return: the sorted list of the moves
+		:return: dictionary with the counters of the cache (hits, evictions, size...), None if there's no cache
+		"""
+		return self.__cache is not None and self.__cache.stats or None
+	
+	
+	def __getCacheKey(self) -> tuple:
+		"""
+		the position only depends on the empty squares, and it's the same after any rotation or reflection of the
+		board, so it's turned into the smallest of its 8 symmetric versions
+		:return: (the canonical mask of the empty squares, the symmetry that turned the board into it)
+		"""
+		return canonicalMask(self.__repo.board.emptyMask)
+	
+	
+	def __addMoveToCache(self, empty: int, seconds: float):
+		"""
+		adds a move to cache
+		:param empty: mask of the empty squares of the position
+		:param seconds: how long the search of the move took
 		"""
 		
-		moves = self.__repo.board.moves
-		moves.sort(key=self.__sortKey)
+		key, sym = canonicalMask(empty)
 		
-		return moves
+		self.__cache.put(key, SYMMETRY_CELLS[sym][moveToCell(*self.__bestMove)], FLAG_PROVEN, seconds, empty.bit_count())
 	
 	
-	def __addMoveToCache(self, availableMoves: int):
+	def __addTableToCache(self):
 		"""
-		adds a move to cache
-		:param availableMoves: number of available moves
+		adds the positions of the transposition table that were solved (exact score, searched to the end of the game)
+		and have at least cacheInteriorMinEmpty empty squares to the cache, with their search time as 0 (they're
+		dropped first when the cache is full)
+		the table keys are the blocked squares (some of them rotated), the cache keys are the canonical empty squares
 		"""
 		
-		if availableMoves not in self.__cache:
-			self.__cache[availableMoves] = []
+		for entry in self.__table.items():
+			empty = FULL_MASK ^ entry[KEY]
+			emptyCount = empty.bit_count()
+			if entry[MOVE] is None or emptyCount < self.__cacheInteriorMinEmpty:
+				continue
+			
+			# a positive score is always a proven win (the unknown positions score 0), and the move of a lower bound
+			# reaches at least that score, so it's a winning move too (not always the fastest one)
+			solved = entry[FLAG] == EXACT and entry[DEPTH] >= emptyCount
+			if not solved and not (entry[FLAG] == LOWER and entry[SCORE] > 0):
+				continue
+			
+			key, sym = canonicalMask(empty)
+			if key not in self.__cache:
+				self.__cache.put(key, SYMMETRY_CELLS[sym][entry[MOVE]], FLAG_PROVEN, 0, emptyCount)
+	
+	
+	@property
+	def tableStats(self) -> dict | None:
+		"""
+		:return: the counters of the transposition table (hits, misses...) or None if there's no table
+		"""
+		return self.__table and self.__table.stats
+	
+	
+	@staticmethod
+	def __toTableScore(score: int, depth: int, maximizingPlr: bool) -> int:
+		"""
+		the table doesn't know the depth or the player, so the scores are stored from the point of view of the player
+		that has to move, and counted from the position itself instead of from the root
+		:param score: the minimax score (AI's point of view, counted from the root)
+		:param depth: depth of the position
+		:param maximizingPlr: True if it's AI's turn in that position
+		:return: the score that can be stored in the table
+		"""
+		if not maximizingPlr:
+			score = -score
 		
-		moves = self.__getSortedMoves()
+		if score > 0:
+			return score + depth
+		if score < 0:
+			return score - depth
+		return score
+	
+	
+	@staticmethod
+	def __fromTableScore(score: int, depth: int, maximizingPlr: bool) -> int:
+		"""
+		reverse of __toTableScore
+		"""
+		if score > 0:
+			score -= depth
+		elif score < 0:
+			score += depth
 		
-		self.__cache[availableMoves].append({
-			"moves": moves,
-			"bestMove": self.__bestMove
-		})
+		return maximizingPlr and score or -score
 	
 	
-	def __getBestMove(self):
+	@property
+	def nodes(self) -> int:
+		"""
+		:return: the number of positions searched for the last move (not counting the worker processes)
+		"""
+		return self.__nodes
+	
+	
+	@property
+	def lastMoveProven(self) -> bool:
+		"""
+		:return: True if the last move was proven to be the best one (full search or cache), False if the time limit
+		ran out and it's just the best move found so far
+		"""
+		return self.__lastMoveProven
+	
+	
+	def __getBestMove(self, empty: int, timeLimit: float | None):
 		"""
 		uses the minimax algorithm to get the best possible move
+		with a time limit, it's iterative deepening: it searches 1 move deep, then 2, ... until the search is complete
+		(proven win/loss) or the time is up, each depth starts with the best move of the one before
+		:param empty: mask of the empty squares
+		:param timeLimit: max number of seconds (None = full search)
 		:return: the best possible move
+		:raises _SearchTimeout: if the search was cancelled or the pondering was stopped
 		"""
 		
-		minimaxBoard = MiniMaxBoardClass(self.__repo.board.boardList)
+		bitBoard = BitBoardClass(FULL_MASK ^ empty)
+		self.__lastMoveProven = True
+		self.__nodes = 0
+		start = time.perf_counter()
 		
-		_maxScore = self.__minimax(minimaxBoard, 0, -1000, 1000, True)
+		if timeLimit is None:
+			_cell, _maxScore = self.solvePosition(bitBoard.empty)
+		else:
+			self.__iterativeDeepening(bitBoard, timeLimit)
 		
-		availableMoves = self.__repo.board.availableMoves()
-		if availableMoves >= self.__minAvailableMovesForCache:
-			self.__addMoveToCache(availableMoves)
+		# iterative deepening stops quietly, like when the time is up
+		if self.__cancelled or self.__ponderStop:
+			raise _SearchTimeout()
+		
+		seconds = time.perf_counter() - start
+		if self.__cache is not None and self.__lastMoveProven and seconds >= self.__cacheMinSeconds:
+			self.__addMoveToCache(empty, seconds)
+		if self.__cache is not None and self.__cacheInteriorMinEmpty is not None and self.__table is not None:
+			self.__addTableToCache()
 		
 		return self.__bestMove[0], self.__bestMove[1]
 	
 	
-	def __minimax(self, board: MiniMaxBoardClass, depth: int, alpha: int, beta: int, maximizingPlr: bool) -> int:
+	def solvePosition(self, empty: int) -> tuple:
+		"""
+		full search of a position (no time limit, cache or book), also used to build the opening book
+		:param empty: mask of the empty squares (not 0)
+		:return: (the best move as a square index, its score for the player to move), the best move is also put in
+		self.__bestMove
+		"""
+		self.__nodes = 0
+		
+		if self.__dfpn:
+			# once it's known who wins, the search only needs the exact score of the moves that keep that result
+			if self.__proveWin(empty):
+				score = self.__searchRoot(FULL_MASK ^ empty, FULL_DRAFT, 0, 1000)
+			else:
+				score = self.__searchRoot(FULL_MASK ^ empty, FULL_DRAFT, -1000, 0)
+		else:
+			score = self.__searchRoot(FULL_MASK ^ empty, FULL_DRAFT)
+		
+		return moveToCell(*self.__bestMove), score
+	
+	
+	def __proveWin(self, empty: int) -> bool:
+		"""
+		depth-first proof-number search (df-pn), only looks for who wins, not how fast
+		every position has a proof number (how many positions still have to be solved to prove that the player to move
+		wins, at least) and a disproof number (same for proving they lose), the search always goes into the position
+		that is the closest to a proof or disproof, until the root is solved
+		sources: https://www.chessprogramming.org/Proof-Number_Search, https://www.chessprogramming.org/DFPN
+		:param empty: mask of the empty squares
+		:return: True if the player to move wins
+		"""
+		while True:
+			proof, disproof = self.__proofNumbers(empty)
+			if proof == 0 or disproof == 0:
+				return proof == 0
+			
+			self.__proofSearch(empty, PROOF_INFINITY, PROOF_INFINITY, 0)
+	
+	
+	def __proofNumbers(self, empty: int) -> tuple:
+		"""
+		:param empty: mask of the empty squares
+		:return: (proof number, disproof number) of the position, from the table, the tablebase, the Grundy values or
+		an estimate if nothing is known about it
+		"""
+		numbers = self.__proofTable.get(empty)
+		if numbers is not None:
+			return numbers
+		
+		if not empty:
+			return PROOF_INFINITY, 0  # no moves left, the player to move lost
+		
+		emptyCount = empty.bit_count()
+		wins = None
+		
+		if emptyCount <= self.__tablebaseEmpty:
+			entry = self.__tablebase.probe(empty)
+			if entry is not None:
+				wins = entry[0]
+		
+		if wins is None and self.__grundy is not None and emptyCount >= self.__minEmptyForGrundy and isSplit(empty):
+			wins = self.__grundy.value(empty) != 0
+		
+		if wins is None:
+			# every move has to be refuted to prove a loss, so positions with more empty squares are harder to disprove
+			return 1, emptyCount
+		
+		numbers = wins and (0, PROOF_INFINITY) or (PROOF_INFINITY, 0)
+		self.__proofTable[empty] = numbers
+		return numbers
+	
+	
+	def __proofSearch(self, empty: int, proofLimit: int, disproofLimit: int, depth: int):
+		"""
+		searches the position until its proof number gets to proofLimit or its disproof number gets to disproofLimit
+		(negamax form: the player to move wins if one move leads to a lost position, so
+		proof = min(disproof of the moves), disproof = sum(proof of the moves))
+		:param empty: mask of the empty squares (not 0)
+		:param proofLimit, disproofLimit: the thresholds
+		:param depth: depth of the position (the positions are counted by depth like in the other searches)
+		"""
+		self.__nodes += 1
+		self.__plyNodes[depth] += 1
+		if self.__cancelled or self.__ponderStop:
+			raise _SearchTimeout()
+		children = [empty & ~LOCK_MASKS[cell] for cell in iterCells(empty)]
+		
+		while True:
+			proof = PROOF_INFINITY
+			disproof = 0
+			best = None
+			bestDisproof = secondDisproof = PROOF_INFINITY
+			bestProof = 0
+			
+			for child in children:
+				childProof, childDisproof = self.__proofNumbers(child)
+				disproof = min(disproof + childProof, PROOF_INFINITY)
+				
+				if childDisproof < bestDisproof:
+					secondDisproof = bestDisproof
+					best, bestDisproof, bestProof = child, childDisproof, childProof
+				elif childDisproof < secondDisproof:
+					secondDisproof = childDisproof
+			
+			proof = bestDisproof
+			
+			if proof >= proofLimit or disproof >= disproofLimit:
+				self.__storeProofNumbers(empty, proof, disproof)
+				return
+			
+			# the move closest to a proof is searched until it isn't the closest anymore
+			self.__proofSearch(best, min(disproofLimit - disproof + bestProof, PROOF_INFINITY), min(proofLimit, secondDisproof + 1), depth + 1)
+	
+	
+	def __storeProofNumbers(self, empty: int, proof: int, disproof: int):
+		"""
+		:param empty: mask of the empty squares
+		:param proof, disproof: the numbers of the position
+		"""
+		if len(self.__proofTable) >= self.__maxProofEntries:
+			# the solved positions are worth the most, the rest can be found again
+			self.__proofTable = {key: value for key, value in self.__proofTable.items() if 0 in value}
+			if len(self.__proofTable) >= self.__maxProofEntries // 2:
+				self.__proofTable = {}
+		
+		self.__proofTable[empty] = (proof, disproof)
+	
+	
+	def __iterativeDeepening(self, bitBoard: BitBoardClass, timeLimit: float):
+		"""
+		searches deeper and deeper until the position is solved or the time limit is up
+		puts the best move in self.__bestMove and sets self.__lastMoveProven
+		:param bitBoard: the board
+		:param timeLimit: max number of seconds
+		"""
+		self.__deadline = time.monotonic() + timeLimit
+		self.__rootFirstCell = None
+		
+		# if not even 1 depth gets searched, any move is better than no move
+		bestMove = cellToMove((bitBoard.empty & -bitBoard.empty).bit_length() - 1)
+		proven = False
+		
+		score = None
+		
+		try:
+			for draft in range(1, bitBoard.availableMoves() + 1):
+				if self.__pvs and score is not None:
+					# the score usually doesn't change much from one depth to the next, a small window around it
+					# prunes more, if the real score is outside of it the depth is searched again with the full window
+					alpha, beta = score - ASPIRATION, score + ASPIRATION
+					score = self.__searchRoot(bitBoard.blocked, draft, alpha, beta)
+					if score <= alpha or score >= beta:
+						score = self.__searchRoot(bitBoard.blocked, draft)
+				else:
+					score = self.__searchRoot(bitBoard.blocked, draft)
+				
+				bestMove = self.__bestMove
+				self.__rootFirstCell = moveToCell(*bestMove)
+				self.__lastDraft = draft
+				
+				# positions past the depth limit score 0, any other score is a proven win or loss, but the tablebase
+				# scores come from past the depth limit, so it's only the fastest win or slowest loss once the depth
+				# limit covers the end of the game (10 - |score| moves): a faster win would end before it and the
+				# positions cut at the depth limit can only end later
+				if score != 0 and draft >= 10 - abs(score):
+					proven = True
+					break
+			else:
+				proven = True  # searched to the end of the game
+		except _SearchTimeout:
+			pass
+		finally:
+			self.__deadline = None
+			self.__rootFirstCell = None
+		
+		self.__bestMove = bestMove
+		self.__lastMoveProven = proven
+	
+	
+	def __searchRoot(self, blocked: int, draft: int, alpha: int = -1000, beta: int = 1000) -> int:
+		"""
+		searches the root, with the worker processes if there are more than 1 and the position is big enough
+		:param blocked: mask of the blocked squares
+		:param draft: how many moves deep to search
+		:param alpha, beta: the search window
+		:return: the score of the root, the best move is put in self.__bestMove
+		"""
+		if self.__workers > 1 and (FULL_MASK ^ blocked).bit_count() >= self.__minEmptyForParallel:
+			return self.__parallelSearch(blocked, draft, alpha, beta)
+		
+		if self.__table is not None:
+			self.__table.newSearch()
+		if self.__ordering is not None:
+			self.__ordering.newSearch()
+		
+		if self.__pvs:
+			return self.__pvSearch(blocked, 0, alpha, beta, draft)
+		return self.__minimax(blocked, 0, alpha, beta, True, draft)
+	
+	
+	def __parallelSearch(self, blocked: int, draft: int, alpha: int, beta: int) -> int:
+		"""
+		root parallel search: every move of the root is scored by one of the worker processes, in the same order as
+		__minimax would search them, the workers share the best score found so far (their alpha)
+		the move picked is the first one in that order with the best score, same as the sequential search
+		:param blocked: mask of the blocked squares
+		:param draft: how many moves deep to search
+		:param alpha, beta: the search window
+		:return: the score of the root, the best move is put in self.__bestMove
+		"""
+		if self.__pool is None:
+			self.__sharedAlpha = multiprocessing.Value("i", -1000)
+			self.__pool = ProcessPoolExecutor(self.__workers, initializer=_initWorker, initargs=(self.__sharedAlpha, self.__workerOptions))
+		
+		self.__sharedAlpha.value = alpha
+		self.__searchId += 1
+		
+		futures = []
+		for cell in self.__rootCells(blocked):
+			futures.append((cell, self.__pool.submit(_searchRootMove, blocked, cell, draft, beta, self.__searchId, self.__deadline)))
+		
+		bestScore = -100
+		bestCell = None
+		
+		try:
+			for cell, future in futures:
+				# waits in short steps, so a cancel doesn't have to wait for the move to be scored
+				while True:
+					try:
+						score = future.result(timeout=0.05)
+						break
+					except TimeoutError:
+						if self.__cancelled or self.__ponderStop:
+							raise _SearchTimeout()
+				if score > bestScore:
+					bestScore = score
+					bestCell = cell
+		finally:
+			# the moves that didn't start yet aren't needed anymore (time limit), the running ones stop by themselves
+			for cell, future in futures:
+				future.cancel()
+		
+		self.__bestMove = cellToMove(bestCell)
+		return bestScore
+	
+	
+	def __rootCells(self, blocked: int) -> list:
+		"""
+		:param blocked: mask of the blocked squares of the root
+		:return: the moves of the root in the order __minimax searches them
+		"""
+		empty = FULL_MASK ^ blocked
+		emptyCount = empty.bit_count()
+		cells = []
+		
+		if self.__rootFirstCell is not None:
+			cells.append(self.__rootFirstCell)
+			empty ^= 1 << self.__rootFirstCell
+		
+		if self.__table is not None and emptyCount >= self.__minEmptyForTable:
+			key, sym = blocked, 0
+			if emptyCount >= self.__minEmptyForSymmetry:
+				key, sym = canonicalMask(blocked)
+			
+			entry = self.__table.probe(key)
+			if entry is not None and entry[MOVE] is not None:
+				tableCell = SYMMETRY_CELLS[INVERSE_SYMMETRY[sym]][entry[MOVE]]
+				if empty >> tableCell & 1:
+					cells.append(tableCell)
+					empty ^= 1 << tableCell
+		
+		if self.__ordering is not None and emptyCount >= self.__minEmptyForOrdering:
+			return cells + self.__ordering.orderRoot(list(iterCells(empty)), FULL_MASK ^ blocked)
+		return cells + list(iterCells(empty))
+	
+	
+	def scoreRootMove(self, blocked: int, cell: int, alpha: int, beta: int, draft: int, searchId: int, deadline: float | None) -> int:
+		"""
+		used by the worker processes of the parallel search, searches the position after one move of the root
+		:param blocked: mask of the blocked squares of the root
+		:param cell: the move
+		:param alpha: the score the move has to beat
+		:param beta: the upper bound of the root window
+		:param draft: how many moves deep the root is searched
+		:param searchId: id of the root search, the transposition table starts a new search when it changes
+		:param deadline: time.monotonic() value when the search has to stop (None = no limit)
+		:return: the score of the move (like __minimax)
+		"""
+		if searchId != self.__lastSearchId:
+			if self.__table is not None:
+				self.__table.newSearch()
+			if self.__ordering is not None:
+				self.__ordering.newSearch()
+		self.__lastSearchId = searchId
+		
+		self.__deadline = deadline
+		try:
+			if self.__pvs:
+				return -self.__pvSearch(blocked | LOCK_MASKS[cell], 1, -beta, -alpha, draft - 1)
+			return self.__minimax(blocked | LOCK_MASKS[cell], 1, alpha, beta, False, draft - 1)
+		finally:
+			self.__deadline = None
+	
+	
+	def close(self):
+		"""
+		stops the pondering, the worker processes of the parallel search (if they were started) and closes the cache log
+		"""
+		self.stopPondering()
+		if self.__pool is not None:
+			self.__pool.shutdown(cancel_futures=True)
+			self.__pool = None
+		if self.__cache is not None:
+			self.__cache.close()
+			self.__cache = None
+	
+	
+	@staticmethod
+	def __tablebaseScore(entry: tuple, depth: int, maximizingPlr: bool) -> int:
+		"""
+		:param entry: what TablebaseClass.probe returned for the position
+		:param depth: depth of the position
+		:param maximizingPlr: True if it's AI's turn
+		:return: the score of the position, same as minimax would find (the game ends at depth + moves left)
+		"""
+		wins, movesLeft, _move = entry
+		endDepth = depth + movesLeft
+		
+		if wins == maximizingPlr:
+			return 10 - endDepth
+		return endDepth - 10
+	
+	
+	def __grundyBounds(self, empty: int, emptyCount: int, depth: int, maximizingPlr: bool) -> tuple:
+		"""
+		bounds of the score of a position that is split into separate groups, the winner comes from the nim-sum, but not
+		how many moves are left: at least one move per group and at most one per empty square, an odd number of moves
+		if the player to move wins (they make the last move), even if they lose
+		:param empty: mask of the empty squares
+		:param emptyCount: the number of empty squares
+		:param depth: depth of the position
+		:param maximizingPlr: True if it's AI's turn
+		:return: (lowest, highest) score the position can have, on the same scale as the minimax scores
+		"""
+		wins = self.__grundy.value(empty) != 0
+		fewestMoves = len(regions(empty))
+		if (fewestMoves % 2 == 1) != wins:
+			fewestMoves += 1
+		mostMoves = emptyCount
+		if (mostMoves % 2 == 1) != wins:
+			mostMoves -= 1
+		
+		# same as the game over scores of minimax, at the earliest and the latest depth where the game can end
+		if wins == maximizingPlr:
+			return 10 - depth - mostMoves, 10 - depth - fewestMoves
+		return depth + fewestMoves - 10, depth + mostMoves - 10
+	
+	
+	def __minimax(self, blocked: int, depth: int, alpha: int, beta: int, maximizingPlr: bool, draft: int) -> int:
 		"""
 		Uses the minimax AI algorithm to determine the best move that the AI can make
 		also uses alpha-beta pruning to optimize it
 		sources: https://www.neverstopbuilding.com/blog/minimax, https://youtu.be/l-hh51ncgDI?si=Wzdoo5bBo2j9j4sG&t=533
-		:param board: minimax board made for the minimax algorithm to optimize it
+		:param blocked: bitboard mask of the blocked squares (see BitBoardClass), a move is just an OR with its lock mask
 		:param depth: used to make sure the AI is fighting more when losing and ends it quicker when winning
 		:param alpha, beta: values used to prune options to save computational time
 		(view this for a visual representation: https://youtu.be/l-hh51ncgDI?si=Wzdoo5bBo2j9j4sG&t=533)
 		:param maximizingPlr: if True, it's our turn, and we want the game to end after it. winning +10, losing -10
+		:param draft: how many moves deeper to search, positions past it score 0 (unknown), FULL_DRAFT = no limit
 		:return: the score of that position (assuming both players play optimally), also puts the best move in self.__bestMove as a list
 		"""
 		
-		if board.gameOver:
+		self.__nodes += 1
+		self.__plyNodes[depth] += 1
+		if self.__nodes & 255 == 0 and (self.__cancelled or self.__ponderStop or self.__deadline is not None and time.monotonic() > self.__deadline):
+			raise _SearchTimeout()
+		
+		if blocked == FULL_MASK:
 			# if the game is already over, and it's AI's turn: -10 (lose), if it's the human's turn: 10 (win)
 			# depth-10 if losing so that the AI fights to play more rounds
 			# 10-depth if winning so that the AI ends it sooner
 			return maximizingPlr and depth-10 or 10-depth
 		
-		availableMoves = []
+		# the empty squares where we can move, the lowest bit gets popped first, so it's still row by row
+		empty = FULL_MASK ^ blocked
+		emptyCount = empty.bit_count()
+		
+		if emptyCount <= self.__tablebaseEmpty and depth > 0:
+			entry = self.__tablebase.probe(empty)
+			if entry is not None:
+				self.__tablebaseHits += 1
+				return self.__tablebaseScore(entry, depth, maximizingPlr)
+		
+		if self.__grundy is not None and depth > 0 and emptyCount >= self.__minEmptyForGrundy and isSplit(empty):
+			# the nim-sum only says who wins, the search goes on for how soon, unless the bounds are enough to prune
+			low, high = self.__grundyBounds(empty, emptyCount, depth, maximizingPlr)
+			if low == high or high <= alpha:
+				self.__grundyHits += 1
+				return high
+			if low >= beta:
+				self.__grundyHits += 1
+				return low
+			alpha, beta = max(alpha, low), min(beta, high)
+		
+		if draft == 0:
+			return 0  # nobody knows who wins yet
+		
+		# the game can't last more moves than there are empty squares, so a bigger draft is a full search
+		draft = min(draft, emptyCount)
+		useTable = self.__table is not None and emptyCount >= self.__minEmptyForTable
+		cells = []
+		
+		if depth == 0 and self.__rootFirstCell is not None:
+			# the best move of the last iteration goes first
+			cells.append(self.__rootFirstCell)
+			empty ^= 1 << self.__rootFirstCell
+		
+		if useTable:
+			# big positions share an entry with their rotations/reflections, the moves are stored for the canonical
+			# position so they have to be rotated back and forth
+			key, sym = blocked, 0
+			if emptyCount >= self.__minEmptyForSymmetry:
+				key, sym = canonicalMask(blocked)
+			
+			entry = self.__table.probe(key)
+			
+			if entry is not None:
+				# the entry is only good if it was searched at least as deep as we need
+				if depth > 0 and entry[DEPTH] >= draft:  # the root has to be searched to get the best move
+					score = self.__fromTableScore(entry[SCORE], depth, maximizingPlr)
+					flag = entry[FLAG]
+					
+					# the bounds are from the point of view of the player to move, they flip for the human
+					if flag != EXACT and not maximizingPlr:
+						flag = flag == LOWER and UPPER or LOWER
+					
+					if flag == EXACT:
+						return score
+					elif flag == LOWER:
+						alpha = max(alpha, score)
+					else:
+						beta = min(beta, score)
+					
+					if alpha >= beta:
+						return score
+				
+				# the best move of the last search goes first, it's the most likely to prune the rest
+				if entry[MOVE] is not None:
+					tableCell = SYMMETRY_CELLS[INVERSE_SYMMETRY[sym]][entry[MOVE]]
+					if empty >> tableCell & 1:
+						cells.append(tableCell)
+						empty ^= 1 << tableCell
+		
+		if self.__ordering is not None and emptyCount >= self.__minEmptyForOrdering:
+			if depth == 0:
+				cells += self.__ordering.orderRoot(list(iterCells(empty)), FULL_MASK ^ blocked)
+			else:
+				cells += self.__ordering.order(list(iterCells(empty)), FULL_MASK ^ blocked, depth)
+		else:
+			while empty:
+				low = empty & -empty
+				empty ^= low
+				cells.append(low.bit_length() - 1)
 		
-		# getting all the empty squares where we can move
-		for row in range(1, 7):
-			for col in range(1, 7):
-				if board.isMoveValid(row, col):
-					availableMoves.append([row, col])
+		alphaOrig, betaOrig = alpha, beta
+		bestCell = None
 		
 		if maximizingPlr:
 			# maximizingPlayer = True  if it's AI's turn and is trying to max the score
-			maxScore = -100
-			bestMove = None
+			bestScore = -100
 			
-			for move in availableMoves:
-				newBoard = board.cloneBoard()
-				newBoard.makeMove(*move)
+			for cell in cells:
+				score = self.__minimax(blocked | LOCK_MASKS[cell], depth + 1, alpha, beta, False, draft - 1)
 				
-				score = self.__minimax(newBoard, depth + 1, alpha, beta, not maximizingPlr)
-				
-				if score > maxScore:
-					maxScore = score
-					bestMove = move
+				if score > bestScore:
+					bestScore = score
+					bestCell = cell
 				
 				# pruning
-				alpha = max(maxScore, alpha)
+				alpha = max(bestScore, alpha)
 				if alpha >= beta:
+					self.__plyCutoffs[depth] += 1
+					if self.__ordering is not None:
+						self.__ordering.cutoff(cell, depth, draft)
 					break
-			
-			self.__bestMove = bestMove
-			return maxScore
 		else:
 			# maximizingPlayer = False  if it's human's turn and is trying to min the score for AI
-			minScore = 100
-			bestMove = None
+			bestScore = 100
 			
-			for move in availableMoves:
-				newBoard = board.cloneBoard()
-				newBoard.makeMove(*move)
-				
-				score = self.__minimax(newBoard, depth + 1, alpha, beta, not maximizingPlr)
+			for cell in cells:
+				score = self.__minimax(blocked | LOCK_MASKS[cell], depth + 1, alpha, beta, True, draft - 1)
 				
-				if score < minScore:
-					minScore = score
-					bestMove = move
+				if score < bestScore:
+					bestScore = score
+					bestCell = cell
 				
 				# pruning
-				beta = min(minScore, beta)
+				beta = min(bestScore, beta)
 				if alpha >= beta:
+					self.__plyCutoffs[depth] += 1
+					if self.__ordering is not None:
+						self.__ordering.cutoff(cell, depth, draft)
 					break
+		
+		if useTable:
+			if bestScore <= alphaOrig:
+				flag = maximizingPlr and UPPER or LOWER
+			elif bestScore >= betaOrig:
+				flag = maximizingPlr and LOWER or UPPER
+			else:
+				flag = EXACT
 			
-			self.__bestMove = bestMove
-			return minScore
+			self.__table.store(key, self.__toTableScore(bestScore, depth, maximizingPlr), flag, draft, SYMMETRY_CELLS[sym][bestCell])
+		
+		if depth == 0:  # only the root move is needed, no reason to build a list at every node
+			self.__bestMove = cellToMove(bestCell)
+		return bestScore
 	
-	
\ No newline at end of file
+	
+	
+	
+	def __pvSearch(self, blocked: int, depth: int, alpha: int, beta: int, draft: int) -> int:
+		"""
+		Principal variation search, in negamax form: the score is always from the point of view of the player that has
+		to move, so there's no max/min branch, the score of a move is minus the score of the position after it
+		with good move ordering the first move is usually the best one, so it's searched with the full window and the
+		others only with a null window (alpha, alpha + 1), which just proves they're not better, if one of them
+		turns out better it's searched again with the full window
+		sources: https://www.chessprogramming.org/Principal_Variation_Search, https://www.chessprogramming.org/Negamax
+		:param blocked: bitboard mask of the blocked squares
+		:param depth: depth of the position (the scores are 10-depth/depth-10 like in __minimax)
+		:param alpha, beta: the search window, from the point of view of the player to move
+		:param draft: how many moves deeper to search, positions past it score 0 (unknown)
+		:return: the score of the position for the player to move (at the root, the AI), at the root it also puts the
+		best move in self.__bestMove
+		"""
+		
+		self.__nodes += 1
+		self.__plyNodes[depth] += 1
+		if self.__nodes & 255 == 0 and (self.__cancelled or self.__ponderStop or self.__deadline is not None and time.monotonic() > self.__deadline):
+			raise _SearchTimeout()
+		
+		if blocked == FULL_MASK:
+			return depth - 10  # the player to move has no moves left, they lost
+		
+		empty = FULL_MASK ^ blocked
+		emptyCount = empty.bit_count()
+		
+		if emptyCount <= self.__tablebaseEmpty and depth > 0:
+			entry = self.__tablebase.probe(empty)
+			if entry is not None:
+				self.__tablebaseHits += 1
+				return self.__tablebaseScore(entry, depth, True)
+		
+		if self.__grundy is not None and depth > 0 and emptyCount >= self.__minEmptyForGrundy and isSplit(empty):
+			low, high = self.__grundyBounds(empty, emptyCount, depth, True)
+			if low == high or high <= alpha:
+				self.__grundyHits += 1
+				return high
+			if low >= beta:
+				self.__grundyHits += 1
+				return low
+			alpha, beta = max(alpha, low), min(beta, high)
+		
+		if draft == 0:
+			return 0
+		
+		draft = min(draft, emptyCount)
+		useTable = self.__table is not None and emptyCount >= self.__minEmptyForTable
+		cells = []
+		
+		if depth == 0 and self.__rootFirstCell is not None:
+			cells.append(self.__rootFirstCell)
+			empty ^= 1 << self.__rootFirstCell
+		
+		if useTable:
+			key, sym = blocked, 0
+			if emptyCount >= self.__minEmptyForSymmetry:
+				key, sym = canonicalMask(blocked)
+			
+			entry = self.__table.probe(key)
+			
+			if entry is not None:
+				if depth > 0 and entry[DEPTH] >= draft:
+					# the table keeps the scores from the point of view of the player to move, same as negamax
+					score = self.__fromTableScore(entry[SCORE], depth, True)
+					flag = entry[FLAG]
+					
+					if flag == EXACT:
+						return score
+					elif flag == LOWER:
+						alpha = max(alpha, score)
+					else:
+						beta = min(beta, score)
+					
+					if alpha >= beta:
+						return score
+				
+				if entry[MOVE] is not None:
+					tableCell = SYMMETRY_CELLS[INVERSE_SYMMETRY[sym]][entry[MOVE]]
+					if empty >> tableCell & 1:
+						cells.append(tableCell)
+						empty ^= 1 << tableCell
+		
+		if self.__ordering is not None and emptyCount >= self.__minEmptyForOrdering:
+			if depth == 0:
+				cells += self.__ordering.orderRoot(list(iterCells(empty)), FULL_MASK ^ blocked)
+			else:
+				cells += self.__ordering.order(list(iterCells(empty)), FULL_MASK ^ blocked, depth)
+		else:
+			while empty:
+				low = empty & -empty
+				empty ^= low
+				cells.append(low.bit_length() - 1)
+		
+		alphaOrig = alpha
+		bestScore = -100
+		bestCell = None
+		
+		for cell in cells:
+			child = blocked | LOCK_MASKS[cell]
+			
+			if bestCell is None:
+				score = -self.__pvSearch(child, depth + 1, -beta, -alpha, draft - 1)
+			else:
+				score = -self.__pvSearch(child, depth + 1, -alpha - 1, -alpha, draft - 1)
+				if alpha < score < beta:
+					# it's better than the first move after all, now its real score is needed
+					score = -self.__pvSearch(child, depth + 1, -beta, -alpha, draft - 1)
+			
+			if score > bestScore:
+				bestScore = score
+				bestCell = cell
+			
+			alpha = max(score, alpha)
+			if alpha >= beta:
+				self.__plyCutoffs[depth] += 1
+				if self.__ordering is not None:
+					self.__ordering.cutoff(cell, depth, draft)
+				break
+		
+		if useTable:
+			if bestScore <= alphaOrig:
+				flag = UPPER
+			elif bestScore >= beta:
+				flag = LOWER
+			else:
+				flag = EXACT
+			
+			self.__table.store(key, self.__toTableScore(bestScore, depth, True), flag, draft, SYMMETRY_CELLS[sym][bestCell])
+		
+		if depth == 0:
+			self.__bestMove = cellToMove(bestCell)
+		return bestScore
@@ -0,0 +1,352 @@
+"""
+Benchmark of the AI on a fixed corpus of positions: the openings, middle games and endgames are generated from random
+games (always the same seed) and taken from the AI cache, every position is searched by a new AIClass (empty
+transposition table, no cache or book, and by default no tablebase or Grundy values either, they answer most positions
+without a search) and the results are written as JSON, so 2 runs can be compared
+It also times the boards on their own (random games on MiniMaxBoardClass and BitBoardClass) and looks up the corpus in
+the cache and the opening book, for their hit rates
+
+usage:
+	python -m services.Benchmark run [--output PATH] [--time-limit SECONDS] [--cache PATH] [--book PATH] [--tablebase] [--grundy]
+	python -m services.Benchmark compare OLD NEW [--threshold RATIO]
+(compare exits with 1 if NEW is slower than OLD)
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from random import Random
+from texttable import Texttable
+from repository.Repo import RepositoryClass
+from services.AIService import AIClass
+from services.BinaryTable import BinaryTableClass
+from domain.bitBoard import BitBoardClass, FULL_MASK, LOCK_MASKS, iterCells, cellToMove, canonicalMask
+from domain.minimaxBoard import MiniMaxBoardClass
+
+VERSION = 1
+
+# the random games of the corpus and of the board timings always use this seed, so every run has the same positions
+SEED = 2024
+
+# a position is an opening if it has at least OPENING_EMPTY empty squares, an endgame if it has at most ENDGAME_EMPTY
+OPENING_EMPTY = 24
+ENDGAME_EMPTY = 12
+
+# a time difference smaller than this is noise, it's never a regression
+MIN_SECONDS = 0.002
+
+# AIClass arguments of the timed searches, unless they're given: the tablebase answers the endgames at the root without
+# a search and the Grundy values prune most of the split positions, so the benchmark would time lookups there
+SEARCH_OPTIONS = {"tablebasePath": None, "useGrundy": False}
+
+
+def phaseOf(empty: int) -> str:
+	"""
+	:param empty: mask of the empty squares
+	:return: "opening", "midgame" or "endgame"
+	"""
+	emptyCount = empty.bit_count()
+	if emptyCount >= OPENING_EMPTY:
+		return "opening"
+	if emptyCount <= ENDGAME_EMPTY:
+		return "endgame"
+	return "midgame"
+
+
+def movesTo(target: int) -> list | None:
+	"""
+	:param target: mask of the empty squares of a position
+	:return: moves (1-indexed) that lead to it from the empty board, None if it can't be reached
+	"""
+	parents = {FULL_MASK: None}
+	frontier = [FULL_MASK]
+
+	while frontier and target not in parents:
+		nextFrontier = []
+		for empty in frontier:
+			for cell in iterCells(empty):
+				child = empty & ~LOCK_MASKS[cell]
+				if child not in parents:
+					parents[child] = (empty, cell)
+					nextFrontier.append(child)
+		frontier = nextFrontier
+
+	if target not in parents:
+		return None
+
+	moves = []
+	while parents[target] is not None:
+		target, cell = parents[target]
+		moves.append(cellToMove(cell))
+	return moves[::-1]
+
+
+def buildCorpus(perPhase: int = 3, cachePath: str | None = "files/AICache.bin") -> list:
+	"""
+	:param perPhase: number of generated positions of every phase (and of cache positions, if there are enough)
+	:param cachePath: the cache the other positions are taken from (None = only generated positions)
+	:return: list of dictionaries with "name", "phase" and "moves" (the moves leading to the position)
+	"""
+	corpus = []
+	counts = {"opening": 0, "midgame": 0, "endgame": 0}
+	random = Random(SEED)
+
+	# random games, every position of a phase that still needs some is taken
+	while min(counts.values()) < perPhase:
+		board = BitBoardClass()
+		moves = []
+		while not board.gameOver:
+			phase = phaseOf(board.empty)
+			if counts[phase] < perPhase and random.random() < 0.5:
+				counts[phase] += 1
+				corpus.append({"name": "generated-" + phase + "-" + str(counts[phase]), "phase": phase, "moves": list(moves)})
+
+			moves.append(random.choice(board.validMoves()))
+			board.makeMove(*moves[-1])
+
+	if cachePath is not None:
+		cache = BinaryTableClass(cachePath)
+		counts = {"opening": 0, "midgame": 0, "endgame": 0}
+
+		# sorted, so the same cache always gives the same positions
+		for empty in sorted(record[0] for record in cache.items()):
+			phase = phaseOf(empty)
+			moves = counts[phase] < perPhase and movesTo(empty)
+			if moves:
+				counts[phase] += 1
+				corpus.append({"name": "cache-" + phase + "-" + str(counts[phase]), "phase": phase, "moves": moves})
+		cache.close()
+
+	return corpus
+
+
+def _makeRepo(moves: list) -> RepositoryClass:
+	"""
+	:param moves: the moves leading to the position
+	:return: a repository with the position on its board
+	"""
+	repo = RepositoryClass()
+	for i, move in enumerate(moves):
+		repo.board.makeMove(i % 2 == 0, *move)
+	return repo
+
+
+def benchmarkPosition(moves: list, repeat: int = 3, **options) -> dict:
+	"""
+	searches the position with a new AIClass repeat times for the time (the fastest one counts, the others were slowed
+	down by something else) and once more with tracemalloc on for the memory
+	:param moves: the moves leading to the position
+	:param repeat: number of timed searches
+	:param options: arguments for AIClass (added to SEARCH_OPTIONS)
+	:return: dictionary with "empty", "move", "nodes", "seconds", "nodesPerSecond", "peakKiB" and "tableHitRate"
+	"""
+	options = dict(SEARCH_OPTIONS, **options)
+	seconds = None
+	for _ in range(repeat):
+		repo = _makeRepo(moves)
+		emptyCount = repo.board.availableMoves()
+		AI = AIClass(repo, cachePath=None, bookPath=None, **options)
+
+		start = time.perf_counter()
+		AI.makeMove()
+		seconds = min(time.perf_counter() - start, seconds or float("inf"))
+	tableStats = AI.tableStats
+
+	repo = _makeRepo(moves)
+	tracemalloc.start()
+	AIClass(repo, cachePath=None, bookPath=None, **options).makeMove()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return {
+		"empty": emptyCount,
+		"move": repo.board.moves[-1],
+		"nodes": AI.nodes,
+		"seconds": seconds,
+		"nodesPerSecond": seconds and AI.nodes / seconds,
+		"peakKiB": peak // 1024,
+		"tableHitRate": tableStats is not None and tableStats["hitRate"] or 0,
+	}
+
+
+def benchmarkBoard(boardClass, games: int = 200) -> dict:
+	"""
+	plays random games on a board class (MiniMaxBoardClass or BitBoardClass, they have the same methods), looking for
+	the valid moves with isMoveValid like the old minimax did
+	:param boardClass: the class
+	:param games: number of games
+	:return: dictionary with "moves", "seconds" and "movesPerSecond"
+	"""
+	random = Random(SEED)
+	squares = [(row, col) for row in range(1, 7) for col in range(1, 7)]
+	moves = 0
+
+	start = time.perf_counter()
+	for _ in range(games):
+		board = boardClass()
+		while not board.gameOver:
+			validMoves = [square for square in squares if board.isMoveValid(*square)]
+			board = board.cloneBoard()
+			board.makeMove(*random.choice(validMoves))
+			moves += 1
+	seconds = time.perf_counter() - start
+
+	return {"moves": moves, "seconds": seconds, "movesPerSecond": seconds and moves / seconds}
+
+
+def cacheHitRate(corpus: list, path: str | None) -> dict:
+	"""
+	:param corpus: the positions
+	:param path: path of a cache or book (None = nothing to look up)
+	:return: dictionary with "lookups", "hits" and "hitRate" of the corpus positions in the file
+	"""
+	if path is None:
+		return {"lookups": 0, "hits": 0, "hitRate": 0}
+
+	table = BinaryTableClass(path)
+	hits = 0
+	for position in corpus:
+		hits += table.get(canonicalMask(_makeRepo(position["moves"]).board.emptyMask)[0]) is not None
+	table.close()
+
+	return {"lookups": len(corpus), "hits": hits, "hitRate": corpus and hits / len(corpus) or 0}
+
+
+def runBenchmark(corpus: list, cachePath: str | None = "files/AICache.bin", bookPath: str | None = "files/OpeningBook.bin", boardGames: int = 200, repeat: int = 3, **options) -> dict:
+	"""
+	:param corpus: the positions (see buildCorpus)
+	:param cachePath: the cache to get the hit rate of
+	:param bookPath: the opening book to get the hit rate of
+	:param boardGames: number of random games for the board timings (0 = no board timings)
+	:param repeat: number of timed searches of every position (the fastest one counts)
+	:param options: arguments for AIClass (added to SEARCH_OPTIONS)
+	:return: the results, ready for json
+	"""
+	positions = []
+	for position in corpus:
+		positions.append(dict(position, **benchmarkPosition(position["moves"], repeat, **options)))
+
+	nodes = sum(position["nodes"] for position in positions)
+	seconds = sum(position["seconds"] for position in positions)
+
+	return {
+		"version": VERSION,
+		"python": platform.python_version(),
+		"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"options": dict(SEARCH_OPTIONS, **options, repeat=repeat),
+		"positions": positions,
+		"total": {
+			"nodes": nodes,
+			"seconds": seconds,
+			"nodesPerSecond": seconds and nodes / seconds,
+			"peakKiB": max((position["peakKiB"] for position in positions), default=0),
+		},
+		"boards": boardGames and {
+			"MiniMaxBoardClass": benchmarkBoard(MiniMaxBoardClass, boardGames),
+			"BitBoardClass": benchmarkBoard(BitBoardClass, boardGames),
+		} or {},
+		"cache": cacheHitRate(corpus, cachePath),
+		"book": cacheHitRate(corpus, bookPath),
+	}
+
+
+def compareResults(old: dict, new: dict, threshold: float = 0.25) -> list:
+	"""
+	:param old: results of the old run
+	:param new: results of the new run
+	:param threshold: how much worse (0.25 = 25%) a number has to get to be a regression
+	:return: list of (what, old value, new value, regression) for every position and board of both runs
+	"""
+	rows = []
+	oldPositions = {position["name"]: position for position in old["positions"]}
+
+	for position in new["positions"]:
+		oldPosition = oldPositions.get(position["name"])
+		if oldPosition is None:
+			continue
+
+		slower = position["seconds"] > oldPosition["seconds"] * (1 + threshold) and position["seconds"] - oldPosition["seconds"] > MIN_SECONDS
+		rows.append((position["name"] + " seconds", oldPosition["seconds"], position["seconds"], slower))
+		rows.append((position["name"] + " nodes", oldPosition["nodes"], position["nodes"],
+			position["nodes"] > oldPosition["nodes"] * (1 + threshold)))
+
+	for name in new["boards"]:
+		if name in old["boards"]:
+			oldSpeed, speed = old["boards"][name]["movesPerSecond"], new["boards"][name]["movesPerSecond"]
+			rows.append((name + " moves/s", oldSpeed, speed, speed * (1 + threshold) < oldSpeed))
+
+	return rows
+
+
+def comparisonTable(rows: list) -> str:
+	"""
+	:param rows: what compareResults returns
+	:return: the comparison as a table
+	"""
+	txtTable = Texttable()
+	txtTable.set_max_width(0)
+	txtTable.set_precision(4)
+	txtTable.header(["", "old", "new", "change", ""])
+
+	for what, oldValue, newValue, regression in rows:
+		change = oldValue and str(round((newValue - oldValue) / oldValue * 100, 1)) + "%" or "-"
+		txtTable.add_row([what, oldValue, newValue, change, regression and "REGRESSION" or ""])
+
+	return txtTable.draw()
+
+
+def resultsTable(results: dict) -> str:
+	"""
+	:param results: what runBenchmark returns
+	:return: the results of every position as a table
+	"""
+	txtTable = Texttable()
+	txtTable.set_max_width(0)
+	txtTable.set_precision(4)
+	txtTable.header(["position", "empty", "nodes", "seconds", "nodes/s", "peak KiB", "table hit rate"])
+
+	for position in results["positions"]:
+		txtTable.add_row([position["name"], position["empty"], position["nodes"], position["seconds"], int(position["nodesPerSecond"]), position["peakKiB"], position["tableHitRate"]])
+
+	return txtTable.draw()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmarks the AI on a fixed set of positions")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+
+	runParser = subparsers.add_parser("run", help="runs the benchmark")
+	runParser.add_argument("--output", default=None, help="path of the JSON results (default: only printed)")
+	runParser.add_argument("--time-limit", type=float, default=None, help="time limit of every move (default: full search)")
+	runParser.add_argument("--cache", default="files/AICache.bin", help="cache the positions are taken from")
+	runParser.add_argument("--book", default="files/OpeningBook.bin", help="opening book to get the hit rate of")
+	runParser.add_argument("--tablebase", action="store_true", help="use the endgame tablebase (most endgames aren't searched then)")
+	runParser.add_argument("--grundy", action="store_true", help="use the Grundy values (most of the split positions aren't searched then)")
+
+	compareParser = subparsers.add_parser("compare", help="compares 2 runs")
+	compareParser.add_argument("old", help="JSON results of the old run")
+	compareParser.add_argument("new", help="JSON results of the new run")
+	compareParser.add_argument("--threshold", type=float, default=0.25, help="how much worse a number has to get to be a regression")
+
+	args = parser.parse_args()
+
+	if args.command == "run":
+		benchmarkResults = runBenchmark(buildCorpus(cachePath=args.cache), args.cache, args.book, timeLimit=args.time_limit,
+			tablebasePath=args.tablebase and "files/Tablebase.bin" or None, useGrundy=args.grundy)
+		print(resultsTable(benchmarkResults))
+		print(json.dumps({key: benchmarkResults[key] for key in ("total", "boards", "cache", "book")}, indent=4))
+
+		if args.output is not None:
+			with open(args.output, "w") as file:
+				json.dump(benchmarkResults, file, indent=4)
+	else:
+		with open(args.old) as file:
+			oldResults = json.load(file)
+		with open(args.new) as file:
+			newResults = json.load(file)
+
+		comparison = compareResults(oldResults, newResults, args.threshold)
+		print(comparisonTable(comparison))
+		sys.exit(any(row[3] for row in comparison) and 1 or 0)
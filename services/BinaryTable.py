@@ -0,0 +1,473 @@
+"""
+Fixed-record binary file with an open-addressing hash index, used for the AI cache (files/AICache.bin)
+The file is opened with mmap, so loading it doesn't parse anything and a lookup only reads the slots it probes
+New entries go to an append-only log next to the table (RecordLogClass) and are folded into it later
+
+Layout (little endian):
+	header (32 bytes): magic "OBTB", version (u16), record size (u16), slot count (u32), used slots (u32),
+		key type (u32), 12 reserved bytes
+	slots (16 bytes each): key (u64), move (u8, 255 = none), flags (u8, 0 = empty slot), value (i16),
+		extra (u32, how much work the entry saves, for the AI cache it's the empty squares of the position)
+the slot count is a power of 2 and a key is stored in the first free slot starting from its hash (linear probing)
+
+Can also be used from the command line to convert an old cache (pickle or stone keyed table):
+	python -m services.BinaryTable convert files/AICache.bin [output]
+"""
+import mmap
+import os
+import pickle
+import struct
+import sys
+from services import ServicesError
+
+try:
+	import fcntl
+except ImportError:
+	# Windows
+	fcntl = None
+	import msvcrt
+from domain.bitBoard import canonicalMask, moveToCell, iterCells, LOCK_MASKS, FULL_MASK, SYMMETRY_CELLS, SIZE
+
+MAGIC = b"OBTB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHIII12x")
+RECORD = struct.Struct("<QBBhI")
+
+# what the keys of a table mean
+KEY_STONES = 1  # canonical mask of the squares with a move on them (old AI caches)
+KEY_EMPTY = 2  # canonical mask of the empty squares (different move lists can leave the same empty squares)
+KEY_SHAPE = 3  # canonical shape of a group of empty squares (see canonicalShape), the value is its Grundy value
+
+# flags of a record
+FLAG_USED = 1
+FLAG_PROVEN = 2  # the move comes from a full search (not from a time limited one)
+# the other bits of the flags are the draft of a time limited search (how many plies it looked ahead), a proven move was
+# searched to the end of the game
+DRAFT_SHIFT = 2
+
+NO_MOVE = 255
+
+# the table is rebuilt bigger when it's fuller than this, so that the probes stay short
+MAX_LOAD = 0.5
+
+
+def _hash(key: int) -> int:
+	"""
+	:param key: the key
+	:return: the key mixed (fibonacci hashing) so that similar keys don't end up in the same slots
+	"""
+	return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 16
+
+
+class BinaryTableClass:
+	def __init__(self, path: str, keyType: int = KEY_EMPTY):
+		"""
+		opens the table (read only), a file that doesn't exist is an empty table
+		:param path: path of the file
+		:param keyType: what the keys should mean, raises ServicesError if the file has another key type
+		"""
+		self.__path = path
+		self.__keyType = keyType
+		self.__file = None
+		self.__map = None
+		self.__slots = 0
+		self.__used = 0
+
+		try:
+			self.__file = open(path, "rb")
+		except FileNotFoundError:
+			return
+
+		try:
+			header = self.__file.read(HEADER.size)
+			if len(header) < HEADER.size or header[:4] != MAGIC:
+				raise ServicesError(path + " is not a binary table")
+
+			_magic, version, recordSize, self.__slots, self.__used, fileKeyType = HEADER.unpack(header)
+			if version != VERSION or recordSize != RECORD.size:
+				raise ServicesError(path + " has an unknown version")
+			if fileKeyType != keyType:
+				raise ServicesError(path + " has key type " + str(fileKeyType) + ", expected " + str(keyType))
+
+			self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+		except ServicesError:
+			self.close()
+			raise
+
+
+	@staticmethod
+	def isBinaryTable(path: str) -> bool:
+		"""
+		:param path: path of a file
+		:return: True if the file exists and is a binary table (and not an old pickle file)
+		"""
+		try:
+			with open(path, "rb") as file:
+				return file.read(4) == MAGIC
+		except FileNotFoundError:
+			return False
+
+
+	def get(self, key: int) -> tuple | None:
+		"""
+		:param key: the key
+		:return: (move, flags, value, extra) or None if the key isn't in the table
+		"""
+		if not self.__used:
+			return None
+
+		mask = self.__slots - 1
+		index = _hash(key) & mask
+
+		while True:
+			record = RECORD.unpack_from(self.__map, HEADER.size + index * RECORD.size)
+			if not record[2]:  # empty slot, the key would have been here
+				return None
+			if record[0] == key:
+				return record[1:]
+			index = (index + 1) & mask
+
+
+	def __contains__(self, key: int) -> bool:
+		return self.get(key) is not None
+
+
+	def __len__(self) -> int:
+		return self.__used
+
+
+	def items(self):
+		"""
+		:return: generator of all the records as (key, move, flags, value, extra)
+		"""
+		for index in range(self.__slots):
+			record = RECORD.unpack_from(self.__map, HEADER.size + index * RECORD.size)
+			if record[2]:
+				yield record
+
+
+	@property
+	def path(self) -> str:
+		return self.__path
+
+
+	@staticmethod
+	def keyTypeOf(path: str) -> int | None:
+		"""
+		:param path: path of a binary table
+		:return: the key type of the table or None if the file isn't a binary table
+		"""
+		if not BinaryTableClass.isBinaryTable(path):
+			return None
+
+		with open(path, "rb") as file:
+			return HEADER.unpack(file.read(HEADER.size))[5]
+
+
+	def close(self):
+		"""
+		closes the file (the table can't be used after this)
+		"""
+		if self.__map is not None:
+			self.__map.close()
+			self.__map = None
+		if self.__file is not None:
+			self.__file.close()
+			self.__file = None
+		self.__used = 0
+
+
+	@staticmethod
+	def write(path: str, records, keyType: int = KEY_EMPTY, count: int | None = None):
+		"""
+		writes a new table, to a temporary file first and then renamed, so the old file is never half written
+		(close any BinaryTableClass using path before calling this, windows can't replace an open file)
+		:param path: path of the file
+		:param records: dictionary key: (move, flags, value, extra), or an iterable of (key, (move, flags, value, extra))
+		with count different keys (read once, so the records don't have to fit in memory)
+		:param keyType: what the keys mean
+		:param count: the number of records (None = len(records))
+		"""
+		if count is None:
+			count = len(records)
+		if isinstance(records, dict):
+			records = records.items()
+
+		slots = 1
+		while slots * MAX_LOAD < count + 1:
+			slots *= 2
+
+		mask = slots - 1
+		tempPath = path + ".tmp"
+		with open(tempPath, "w+b") as file:
+			file.truncate(HEADER.size + slots * RECORD.size)
+
+			with mmap.mmap(file.fileno(), 0) as data:
+				HEADER.pack_into(data, 0, MAGIC, VERSION, RECORD.size, slots, count, keyType)
+
+				for key, (move, flags, value, extra) in records:
+					index = _hash(key) & mask
+
+					while data[HEADER.size + index * RECORD.size + 9]:  # the flags byte, slot taken
+						index = (index + 1) & mask
+
+					RECORD.pack_into(data, HEADER.size + index * RECORD.size, key, move, flags | FLAG_USED, value, extra)
+
+				data.flush()
+			os.fsync(file.fileno())
+
+		os.replace(tempPath, path)
+
+
+class RecordLogClass:
+	def __init__(self, path: str, syncEvery: int = 8):
+		"""
+		append-only log of records (same 16 byte records as the table), so that new entries are saved as soon as they're
+		found and a save only costs the new entries, the log is folded into the table from time to time
+		every record is flushed to the OS right away (a crash of the game loses nothing), and the file is fsynced
+		every syncEvery records (a power cut loses at most syncEvery - 1 of them)
+		:param path: path of the log, created if it doesn't exist
+		:param syncEvery: number of records between 2 fsyncs
+		"""
+		self.__path = path
+		self.__file = open(path, "ab")
+		self.__syncEvery = syncEvery
+		self.__unsynced = 0
+		self.__count = self.__file.tell() // RECORD.size
+
+		# a record cut off by a crash is dropped, the new records have to start at a record boundary
+		if self.__file.tell() != self.__count * RECORD.size:
+			self.__file.truncate(self.__count * RECORD.size)
+
+
+	def append(self, key: int, record: tuple):
+		"""
+		:param key: the key
+		:param record: (move, flags, value, extra)
+		"""
+		move, flags, value, extra = record
+		self.__file.write(RECORD.pack(key, move, flags | FLAG_USED, value, extra))
+		self.__file.flush()
+		self.__count += 1
+
+		self.__unsynced += 1
+		if self.__unsynced >= self.__syncEvery:
+			self.sync()
+
+
+	def sync(self):
+		"""
+		makes sure the records are on the disk
+		"""
+		if self.__unsynced:
+			os.fsync(self.__file.fileno())
+			self.__unsynced = 0
+
+
+	def clear(self, upTo: int | None = None):
+		"""
+		empties the log (after its records were written to the table), nothing can be appended to the file until it's
+		done, a log shared by several processes has to be locked by them (see FileLockClass)
+		:param upTo: only the records in the first upTo bytes are dropped (None = all of them), the ones after were
+		appended by another log on the same file after the records were read, so they aren't in the table yet
+		"""
+		tail = b""
+		if upTo is not None:
+			with open(self.__path, "rb") as file:
+				file.seek(upTo)
+				tail = file.read()
+			tail = tail[:len(tail) // RECORD.size * RECORD.size]
+
+		self.__file.truncate(0)
+		self.__file.write(tail)
+		self.__file.flush()
+		os.fsync(self.__file.fileno())
+		self.__unsynced = 0
+		self.__count = len(tail) // RECORD.size
+
+
+	def __len__(self) -> int:
+		return self.__count
+
+
+	def close(self):
+		self.sync()
+		self.__file.close()
+
+
+class FileLockClass:
+	def __init__(self, path: str):
+		"""
+		lock between processes, held in a with block (not reentrant, the threads of a process have to share one and
+		lock it with a threading lock first)
+		:param path: path of the lock file, created if it doesn't exist (it stays empty)
+		"""
+		self.__file = open(path, "ab")
+
+
+	def __enter__(self):
+		if fcntl is not None:
+			fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX)
+		else:
+			# the first byte, it doesn't need to exist
+			self.__file.seek(0)
+			msvcrt.locking(self.__file.fileno(), msvcrt.LK_LOCK, 1)
+		return self
+
+
+	def __exit__(self, *exception):
+		if fcntl is not None:
+			fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+		else:
+			self.__file.seek(0)
+			msvcrt.locking(self.__file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+	def close(self):
+		self.__file.close()
+
+
+def iterRecordLog(path: str, size: int | None = None):
+	"""
+	:param path: path of a log written by RecordLogClass
+	:param size: only the first size bytes are read (None = the whole log)
+	:return: generator of (key, (move, flags, value, extra)) in the order of the log, read a block at a time
+	(a record cut off or zeroed by a crash is skipped, a missing file is an empty log)
+	"""
+	try:
+		file = open(path, "rb")
+	except FileNotFoundError:
+		return
+
+	with file:
+		left = size
+		while left is None or left >= RECORD.size:
+			blockSize = RECORD.size * 4096 if left is None else min(RECORD.size * 4096, left)
+			data = file.read(blockSize - blockSize % RECORD.size)
+			if left is not None:
+				left -= len(data)
+
+			for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+				key, move, flags, value, extra = RECORD.unpack_from(data, offset)
+				if flags & FLAG_USED:
+					yield key, (move, flags & ~FLAG_USED, value, extra)
+
+			if len(data) < RECORD.size * 4096:
+				return
+
+
+def readRecordLog(path: str, size: int | None = None) -> dict:
+	"""
+	:param path: path of a log written by RecordLogClass
+	:param size: only the first size bytes are read (None = the whole log)
+	:return: dictionary key: (move, flags, value, extra), the later records of a key replace the earlier ones
+	(a record cut off or zeroed by a crash is skipped, a missing file is an empty log)
+	"""
+	return dict(iterRecordLog(path, size))
+
+
+def recordDraft(record: tuple) -> int:
+	"""
+	:param record: (move, flags, value, extra) of the AI cache
+	:return: how many plies the search of the move looked ahead (the empty squares of the position for a proven move,
+	0 for a time limited move that didn't save its draft)
+	"""
+	if record[1] & FLAG_PROVEN:
+		return record[3]
+	return record[1] >> DRAFT_SHIFT
+
+
+def emptyKey(stones: int) -> tuple:
+	"""
+	:param stones: mask of the squares with a move on them
+	:return: (the canonical mask of the empty squares left by those moves, the symmetry that turns the board into it)
+	"""
+	blocked = 0
+	for cell in iterCells(stones):
+		blocked |= LOCK_MASKS[cell]
+
+	return canonicalMask(FULL_MASK ^ blocked)
+
+
+def convertPickleCache(cache: dict) -> dict:
+	"""
+	converts the old cache format ({availableMoves: [{"moves": [...], "bestMove": [row, col]}, ...]})
+	:param cache: the unpickled cache
+	:return: dictionary canonical empty mask: (move, flags, value, extra), ready for BinaryTableClass.write
+	"""
+	records = {}
+
+	for availableMoves in cache:
+		for moveDict in cache[availableMoves]:
+			stones = 0
+			for move in moveDict["moves"]:
+				stones |= 1 << (move[0] * SIZE + move[1])
+
+			key, sym = emptyKey(stones)
+			if key not in records:
+				records[key] = (SYMMETRY_CELLS[sym][moveToCell(*moveDict["bestMove"])], FLAG_PROVEN, 0, availableMoves)
+
+	return records
+
+
+def convertStonesTable(table: BinaryTableClass) -> dict:
+	"""
+	converts a table keyed by the canonical stones (KEY_STONES) to one keyed by the empty squares, moves that lead to
+	the same empty squares become one entry
+	:param table: the old table
+	:return: dictionary canonical empty mask: (move, flags, value, extra), ready for BinaryTableClass.write
+	"""
+	records = {}
+
+	for stones, move, flags, value, extra in table.items():
+		key, sym = emptyKey(stones)
+		if key not in records:
+			records[key] = (SYMMETRY_CELLS[sym][move], flags & ~FLAG_USED, value, extra)
+
+	return records
+
+
+def loadOldCache(path: str) -> dict:
+	"""
+	reads a cache in one of the old formats (pickle or stone keyed table)
+	:param path: path of the file
+	:return: dictionary canonical empty mask: (move, flags, value, extra) (empty if the file is missing or broken)
+	"""
+	if BinaryTableClass.keyTypeOf(path) == KEY_STONES:
+		table = BinaryTableClass(path, KEY_STONES)
+		records = convertStonesTable(table)
+		table.close()
+		return records
+
+	try:
+		with open(path, "rb") as file:
+			return convertPickleCache(pickle.load(file))
+	except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+		return {}
+
+
+def convertCacheFile(path: str, outputPath: str = None) -> int:
+	"""
+	one-shot conversion of an old cache file to a binary table keyed by the empty squares
+	:param path: path of the old file
+	:param outputPath: path of the new file (the old file gets replaced if it's None)
+	:return: the number of positions written
+	"""
+	records = loadOldCache(path)
+
+	BinaryTableClass.write(outputPath or path, records)
+	return len(records)
+
+
+if __name__ == "__main__":
+	if len(sys.argv) not in (3, 4) or sys.argv[1] != "convert":
+		print("usage: python -m services.BinaryTable convert <old cache> [output]")
+		sys.exit(1)
+
+	if BinaryTableClass.keyTypeOf(sys.argv[2]) == KEY_EMPTY:
+		print(sys.argv[2] + " is already up to date")
+		sys.exit(0)
+
+	count = convertCacheFile(*sys.argv[2:])
+	print("converted " + str(count) + " positions")
@@ -0,0 +1,169 @@
+"""
+Merges the AI caches of different computers into one file, so every game can start with everything the others solved
+The inputs can be in any of the cache formats (binary table, old pickle or stone keyed table), their logs (path + ".log")
+are applied over their own table first (a log entry is newer than the table row of the same file), every position
+becomes one entry keyed by its canonical empty squares
+When 2 caches have the same position, the deeper entry wins (a proven one was searched to the end of the game), then
+the proven one, then the one from the file given first
+
+The memory doesn't grow with the inputs: the positions are split into parts of at most chunkEntries entries (by the hash
+of their key), every part is merged on its own (the inputs are read again for each part, the binary tables straight
+from the file) and its entries are written to a temporary file, the output table is then written from that file
+With --max-entries the most valuable entries are kept (proven first, then the ones that took longest to search)
+
+usage: python -m services.CacheMerge OUTPUT INPUT [INPUT ...] [--max-entries N] [--chunk-entries N]
+"""
+import argparse
+import heapq
+import os
+from texttable import Texttable
+from services import ServicesError
+from services.BinaryTable import BinaryTableClass, iterRecordLog, loadOldCache, recordDraft, RECORD, KEY_EMPTY, FLAG_PROVEN, FLAG_USED
+
+# the most entries of a part merged in memory
+CHUNK_ENTRIES = 1 << 18
+
+
+def readCache(path: str):
+	"""
+	:param path: path of a cache in any format
+	:return: generator of (canonical empty mask, (move, flags, value, extra)), the entries of the log come last (a key
+	can come twice, the later one is newer)
+	"""
+	if BinaryTableClass.keyTypeOf(path) == KEY_EMPTY:
+		table = BinaryTableClass(path)
+		try:
+			for key, move, flags, value, extra in table.items():
+				yield key, (move, flags & ~FLAG_USED, value, extra)
+		finally:
+			table.close()
+	elif os.path.exists(path):
+		yield from loadOldCache(path).items()
+	elif not os.path.exists(path + ".log"):
+		raise ServicesError(path + " doesn't exist")
+
+	yield from iterRecordLog(path + ".log")
+
+
+def _rank(record: tuple) -> tuple:
+	"""
+	:param record: (move, flags, value, extra)
+	:return: the entries with a bigger rank win the conflicts (the deeper search first, then the proven one)
+	"""
+	return recordDraft(record), bool(record[1] & FLAG_PROVEN)
+
+
+def _value(record: tuple) -> tuple:
+	"""
+	:param record: (move, flags, value, extra)
+	:return: the entries with a bigger value are kept by --max-entries (proven first, then the longer search)
+	"""
+	return bool(record[1] & FLAG_PROVEN), record[2]
+
+
+def _part(key: int, parts: int) -> int:
+	"""
+	:param key: canonical empty mask
+	:param parts: number of parts
+	:return: the part of the key (the key is mixed first, the canonical masks aren't spread evenly)
+	"""
+	return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) % parts
+
+
+def mergeCaches(outputPath: str, paths: list, maxEntries: int | None = None, chunkEntries: int = CHUNK_ENTRIES) -> dict:
+	"""
+	merges the caches and writes the result (to a temporary file first, so the output can be one of the inputs)
+	:param outputPath: path of the merged cache
+	:param paths: paths of the caches to merge
+	:param maxEntries: the most entries written (None = all of them)
+	:param chunkEntries: the most input entries merged in memory at once
+	:return: dictionary with the stats: "inputs" (list of dictionaries with the path and the positions read, new,
+	replacing an entry, ignored and with a different move than the kept one), "parts", "dropped", "entries", "bytes"
+	"""
+	if chunkEntries < 1:
+		raise ServicesError("a part needs room for at least 1 entry")
+
+	# the number of input entries (a key in a table and in its log counts twice), also checks that every input exists
+	total = sum(1 for path in paths for _entry in readCache(path))
+	parts = max(1, -(-total // chunkEntries))
+
+	stats = {"inputs": [{"path": path, "read": 0, "new": 0, "replaced": 0, "ignored": 0, "disagreements": 0} for path in paths],
+		"parts": parts, "dropped": 0}
+	count = 0
+	mergedPath = outputPath + ".merge"
+
+	try:
+		with open(mergedPath, "wb") as merged:
+			for part in range(parts):
+				records = {}
+
+				for path, inputStats in zip(paths, stats["inputs"]):
+					# the log of the input replaces the rows of its own table
+					entries = {key: record for key, record in readCache(path) if _part(key, parts) == part}
+					inputStats["read"] += len(entries)
+
+					for key, record in entries.items():
+						old = records.get(key)
+
+						if old is None:
+							inputStats["new"] += 1
+							records[key] = record
+							continue
+
+						if old[0] != record[0]:
+							inputStats["disagreements"] += 1
+
+						if _rank(record) > _rank(old):
+							inputStats["replaced"] += 1
+							records[key] = record
+						else:
+							inputStats["ignored"] += 1
+
+				for key, (move, flags, value, extra) in records.items():
+					merged.write(RECORD.pack(key, move, flags | FLAG_USED, value, extra))
+				count += len(records)
+
+		if maxEntries is not None and count > maxEntries:
+			stats["dropped"] = count - maxEntries
+			kept = heapq.nlargest(maxEntries, iterRecordLog(mergedPath), key=lambda entry: _value(entry[1]))
+			BinaryTableClass.write(outputPath, dict(kept))
+			count = maxEntries
+		else:
+			BinaryTableClass.write(outputPath, iterRecordLog(mergedPath), count=count)
+	finally:
+		if os.path.exists(mergedPath):
+			os.remove(mergedPath)
+
+	stats["entries"] = count
+	stats["bytes"] = os.path.getsize(outputPath)
+	return stats
+
+
+def statsTable(stats: dict) -> str:
+	"""
+	:param stats: what mergeCaches returns
+	:return: a table with the stats of every input
+	"""
+	txtTable = Texttable()
+	txtTable.set_max_width(0)
+	txtTable.header(["input", "read", "new", "replaced", "ignored", "different move"])
+
+	for inputStats in stats["inputs"]:
+		txtTable.add_row([inputStats["path"], inputStats["read"], inputStats["new"], inputStats["replaced"],
+			inputStats["ignored"], inputStats["disagreements"]])
+
+	return txtTable.draw()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Merges AI caches (any format) into one binary cache")
+	parser.add_argument("output", help="path of the merged cache (can be one of the inputs)")
+	parser.add_argument("inputs", nargs="+", help="paths of the caches to merge, the first one wins the ties")
+	parser.add_argument("--max-entries", type=int, default=None, help="most positions written, the least valuable are dropped")
+	parser.add_argument("--chunk-entries", type=int, default=CHUNK_ENTRIES, help="most input entries merged in memory at once")
+	args = parser.parse_args()
+
+	mergeStats = mergeCaches(args.output, args.inputs, args.max_entries, args.chunk_entries)
+	print(statsTable(mergeStats))
+	print("wrote " + str(mergeStats["entries"]) + " positions (" + str(mergeStats["bytes"]) + " bytes, "
+		+ str(mergeStats["dropped"]) + " dropped, " + str(mergeStats["parts"]) + " parts) to " + args.output)
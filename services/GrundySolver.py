@@ -0,0 +1,184 @@
+"""
+Sprague-Grundy solver for Obstruction
+Obstruction is impartial (both players have the same moves) and the last player to move wins, so once the empty
+squares split into groups that don't touch each other, the position is a sum of independent games:
+	- every group has a Grundy value (the mex of the values of the positions it can move to)
+	- the whole position is the XOR (nim-sum) of the values of its groups
+	- the player to move wins if and only if the nim-sum isn't 0
+sources: https://en.wikipedia.org/wiki/Sprague%E2%80%93Grundy_theorem, https://cp-algorithms.com/game_theory/sprague-grundy-nim.html
+"""
+from services import ServicesError
+from services.BinaryTable import BinaryTableClass, KEY_SHAPE, FLAG_PROVEN, NO_MOVE
+from domain.bitBoard import LOCK_MASKS, iterCells, regions, canonicalShape
+
+
+class GrundySolverClass:
+	def __init__(self, tablePath: str = None, stop=None):
+		"""
+		:param tablePath: path of the precomputed table of shapes (built with services/GrundyTableBuilder.py),
+		it's only opened when a shape isn't in memory, None = no table
+		:param stop: function called before every shape that isn't known yet is solved, it can raise an exception to
+		stop the solver (the shapes solved until then are kept), None = never stopped
+		"""
+		# canonical shape of a group: its Grundy value
+		# (the same shape anywhere on the board, rotated or mirrored, has the same value)
+		self.__values = {}
+		# same thing but by the exact mask, so that groups seen before don't need to be canonicalized again
+		self.__regionValues = {}
+
+		self.__tablePath = tablePath
+		self.__table = None
+		self.__tableOpened = False
+		# shapes that weren't in the table, they're added to it with saveTable
+		self.__newShapes = {}
+		self.__stop = stop
+
+
+	def regionValue(self, region: int) -> int:
+		"""
+		:param region: mask of a group of empty squares that touch each other
+		:return: the Grundy value of the group
+		"""
+		value = self.__regionValues.get(region)
+		if value is not None:
+			return value
+
+		shape = canonicalShape(region)
+
+		value = self.__values.get(shape)
+		if value is None:
+			value = self.__tableValue(shape)
+			if value is None:
+				value = self.__computeValue(shape)
+				self.__newShapes[shape] = value
+			self.__values[shape] = value
+
+		self.__regionValues[region] = value
+		return value
+
+
+	def __tableValue(self, shape: int) -> int | None:
+		"""
+		:param shape: canonical shape of a group
+		:return: the Grundy value of the shape from the precomputed table, None if it's not there
+		"""
+		if not self.__tableOpened:
+			self.__tableOpened = True
+			if self.__tablePath is not None:
+				try:
+					self.__table = BinaryTableClass(self.__tablePath, KEY_SHAPE)
+				except ServicesError:
+					self.__table = None
+
+		if self.__table is None:
+			return None
+
+		record = self.__table.get(shape)
+		return record and record[2]
+
+
+	def saveTable(self):
+		"""
+		adds the shapes solved since the table was opened to the table file
+		"""
+		if self.__tablePath is None or not self.__newShapes:
+			return
+
+		records = self.records()
+		if self.__table is not None:
+			for record in self.__table.items():
+				records.setdefault(record[0], record[1:])
+			self.__table.close()
+
+		try:
+			BinaryTableClass.write(self.__tablePath, records, KEY_SHAPE)
+			self.__newShapes = {}
+		except FileNotFoundError:
+			pass
+
+		# opened again on the next lookup
+		self.__table = None
+		self.__tableOpened = False
+
+
+	def records(self, maxSquares: int = 36) -> dict:
+		"""
+		:param maxSquares: only the shapes with at most this many squares are returned
+		:return: the shapes solved in memory, as BinaryTableClass records (shape: (move, flags, value, squares))
+		"""
+		records = {}
+
+		for shape, value in self.__values.items():
+			squares = shape.bit_count()
+			if squares <= maxSquares:
+				records[shape] = (NO_MOVE, FLAG_PROVEN, value, squares)
+
+		return records
+
+
+	def __computeValue(self, shape: int) -> int:
+		"""
+		:param shape: mask of a group of empty squares (in canonical form)
+		:return: mex of the values of all the positions reachable with one move
+		"""
+		if self.__stop is not None:
+			self.__stop()
+
+		reachable = set()
+
+		for cell in iterCells(shape):
+			reachable.add(self.value(shape & ~LOCK_MASKS[cell]))
+
+		value = 0
+		while value in reachable:
+			value += 1
+
+		return value
+
+
+	def value(self, empty: int) -> int:
+		"""
+		:param empty: mask of the empty squares
+		:return: the Grundy value of the position (nim-sum of its groups), 0 means the player to move loses
+		"""
+		nimSum = 0
+
+		for region in regions(empty):
+			nimSum ^= self.regionValue(region)
+
+		return nimSum
+
+
+	def bestMove(self, empty: int) -> int | None:
+		"""
+		picks a move by nim-sum: a winning move leaves a nim-sum of 0 for the other player
+		if there's no winning move, the move that locks the fewest empty squares is picked,
+		so that the game lasts longer and the other player has more chances to make a mistake
+		:param empty: mask of the empty squares (not 0)
+		:return: the square of the move
+		"""
+		groups = regions(empty)
+		values = [self.regionValue(region) for region in groups]
+
+		nimSum = 0
+		for value in values:
+			nimSum ^= value
+
+		if nimSum:
+			for region, value in zip(groups, values):
+				target = value ^ nimSum  # the value this group needs to have after the move
+				if target >= value:
+					continue
+
+				for cell in iterCells(region):
+					if self.value(region & ~LOCK_MASKS[cell]) == target:
+						return cell
+
+		return min(iterCells(empty), key=lambda cell: (LOCK_MASKS[cell] & empty).bit_count())
+
+
+	def __len__(self) -> int:
+		"""
+		:return: the number of shapes solved so far
+		"""
+		return len(self.__values)
@@ -0,0 +1,39 @@
+"""
+Builds the table of Grundy values used by GrundySolverClass (files/GrundyTable.bin)
+Solving the empty board goes through every group of empty squares that can show up in a game, so all of their
+canonical shapes end up solved and get written to the table
+
+usage: python -m services.GrundyTableBuilder [--max-squares N] [--output PATH]
+"""
+import argparse
+import time
+from services.GrundySolver import GrundySolverClass
+from services.BinaryTable import BinaryTableClass, KEY_SHAPE
+from domain.bitBoard import FULL_MASK
+
+
+def buildTable(path: str, maxSquares: int = 36) -> int:
+	"""
+	solves every shape reachable from the empty board and writes them to a table
+	:param path: path of the table file
+	:param maxSquares: only the shapes with at most this many squares are written
+	:return: the number of shapes written
+	"""
+	solver = GrundySolverClass()
+	solver.value(FULL_MASK)
+
+	records = solver.records(maxSquares)
+	BinaryTableClass.write(path, records, KEY_SHAPE)
+
+	return len(records)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds the table of Grundy values of the shapes of empty squares")
+	parser.add_argument("--max-squares", type=int, default=36, help="biggest shape written to the table")
+	parser.add_argument("--output", default="files/GrundyTable.bin", help="path of the table")
+	args = parser.parse_args()
+
+	start = time.time()
+	count = buildTable(args.output, args.max_squares)
+	print("wrote " + str(count) + " shapes to " + args.output + " in " + str(round(time.time() - start, 2)) + "s")
@@ -1,66 +1,339 @@
 
+import asyncio
+import functools
+import threading
+import time
 from services import AIService, ServicesError
+from services.Metrics import MetricsClass
+from services.Settings import SettingsClass
 from repository.Repo import RepositoryClass
 
+# seconds an async AI move gets after its timeout to stop on its own (the search stops at the time limit, this is
+# for the parts that don't check it), after them it's cancelled and gets as long again to stop, then a fallback move
+# is made
+FALLBACK_GRACE = 0.5
+
 class MainServiceClass:
-	def __init__(self):
+	def __init__(self, metrics: MetricsClass | None = None, **AIOptions):
+		"""
+		:param metrics: where the latency of the calls is counted (pass the same one to every game to count all of
+		them together, None = a new one)
+		:param AIOptions: arguments for AIClass, they replace the ones from the settings (e.g. cachePath=None,
+		bookPath=None for an AI that always searches)
+		"""
 		self.__repo = RepositoryClass()
-		self.__AI = AIService.AIClass(self.__repo)
+		self.__metrics = metrics or MetricsClass()
+		
+		settings = SettingsClass()
+		# 0 or missing = no limit
+		timeLimit = settings.getFloat("AITimeLimit", 0) or None
+		# 0 = one for every CPU core
+		workers = settings.getInt("AIWorkers", 1)
+		cacheMaxEntries = settings.getInt("AICacheMaxEntries", 1 << 16)
+		# missing = no log
+		statsLogPath = settings.get("AIStatsLog")
+		ponder = settings.getBool("AIPonder", False)
+		# empty = no table
+		grundyTablePath = settings.get("AIGrundyTable", "files/GrundyTable.bin") or None
+		
+		options = dict(timeLimit=timeLimit, workers=workers, cacheMaxEntries=cacheMaxEntries, statsLogPath=statsLogPath, ponder=ponder, grundyTablePath=grundyTablePath)
+		options.update(AIOptions)
+		self.__AI = AIService.AIClass(self.__repo, **options)
+		# the async moves of a game wait for each other (a game can only have one move searched at a time), the lock is
+		# made on the event loop that uses it (see __loopLock)
+		self.__asyncLock = None
+		self.__asyncLoop = None
+		# set when a cancelled async AI move that didn't stop in time is done, it can't make its move anymore but the
+		# next move waits for it to stop (a threading.Event, the next move can be on another event loop)
+		self.__pendingMove = None
 	
 	
 	def AIFirstMove(self):
 		"""
 		calls the makeFirstMove function from the AIService
+		:return: the SearchStatsClass of the move
 		"""
-		self.__AI.makeFirstMove()
+		start = time.perf_counter()
+		source = "error"
+		
+		try:
+			stats = self.__AI.makeFirstMove()
+			source = stats.source
+			return stats
+		finally:
+			self.__metrics.observe("AIFirstMove", source, time.perf_counter() - start)
 	
 	
-	def makeAIMove(self):
+	def makeAIMove(self, timeLimit: float | None = None):
 		"""
 		calls the makeMove function from the AIService
+		:param timeLimit: max number of seconds for this move (None = the one from the settings)
+		:return: the SearchStatsClass of the move
+		:raises SearchCancelledError: if cancelAIMove was called, no move is made then
+		"""
+		start = time.perf_counter()
+		source = "error"
+		
+		try:
+			stats = self.__AI.makeMove(timeLimit)
+			source = stats.source
+			return stats
+		except AIService.SearchCancelledError:
+			source = "cancelled"
+			raise
+		finally:
+			self.__metrics.observe("makeAIMove", source, time.perf_counter() - start)
+	
+	
+	def cancelAIMove(self):
 		"""
-		self.__AI.makeMove()
+		stops the AI move being searched (can be called from another thread), makeAIMove raises SearchCancelledError
+		"""
+		self.__AI.cancel()
 	
 	
-	def makeHumanMove(self, userInput: str) -> bool:
+	def stopPondering(self):
+		"""
+		stops searching the replies of the human in the background (for when the game is left before it's over)
+		"""
+		self.__AI.stopPondering()
+	
+	
+	def makeHumanMove(self, userInput: str, AIMoves: bool = True) -> bool:
 		"""
 		Validates user input and sends it to the HumanService
 		:param: userInput: str - user input
+		:param AIMoves: False = only the human move is made, the AI move is left for makeAIMove (so it can be searched
+		in the background)
 		:return: bool - True if the human won, False otherwise
 		"""
+		start = time.perf_counter()
+		source = "error"
 		
-		# validating user input
-		choice = userInput.split(" ")
-		if len(choice) != 2 or not self.__is_int(choice[0]) or not self.__is_int(choice[1]):
-			raise ServicesError("Invalid move")
+		try:
+			# validating user input
+			choice = userInput.split(" ")
+			if len(choice) != 2 or not self.__is_int(choice[0]) or not self.__is_int(choice[1]):
+				raise ServicesError("Invalid move")
+			
+			row, col = int(choice[0]), int(choice[1])
+			
+			# sending the move to the HumanService
+			self.__repo.board.makeMove(True, row, col)
+			
+			# checking if the game is over to end it before AI move
+			if self.isGameOver():
+				source = "none"
+				return True
+			
+			if not AIMoves:
+				source = "none"
+				return False
+			
+			# if the game is not over, the AI makes a move right after the human move
+			source = self.makeAIMove().source
+		finally:
+			self.__metrics.observe("makeHumanMove", source, time.perf_counter() - start)
 		
-		row, col = int(choice[0]), int(choice[1])
+	
+	async def makeAIMoveAsync(self, timeout: float | None = None, executor=None):
+		"""
+		makeAIMove on an executor thread, so the event loop can run other games meanwhile (the async moves of the same
+		game wait for each other)
+		:param timeout: max number of seconds for the move (None = no limit), the search plays the best move found so
+		far when they're up, if it still isn't done FALLBACK_GRACE seconds later it's cancelled and a fallback move is
+		made (see AIClass.makeFallbackMove), at most FALLBACK_GRACE seconds after that
+		:param executor: concurrent.futures executor the search runs on (None = the default one of the event loop)
+		:return: the SearchStatsClass of the move
+		:raises asyncio.CancelledError: if the task is cancelled, the search is stopped first (or given FALLBACK_GRACE
+		seconds to stop) and no move is made (unless the move was already done)
+		"""
+		async with self.__loopLock():
+			return await self.__runAIMove(timeout, executor)
+	
+	
+	async def makeHumanMoveAsync(self, userInput: str, timeout: float | None = None, executor=None) -> bool:
+		"""
+		makeHumanMove with the AI move made like in makeAIMoveAsync (the human move is made on the executor too, at the
+		end of the game it saves the cache)
+		:param userInput: str - user input
+		:param timeout: max number of seconds for the AI move (see makeAIMoveAsync)
+		:param executor: concurrent.futures executor the search runs on (None = the default one of the event loop)
+		:return: bool - True if the human won, False otherwise
+		"""
+		async with self.__loopLock():
+			await self.__waitForPending(executor)
+			if await asyncio.get_running_loop().run_in_executor(executor, self.makeHumanMove, userInput, False):
+				return True
+			
+			await self.__runAIMove(timeout, executor)
+			return False
+	
+	
+	async def __runAIMove(self, timeout: float | None, executor):
+		"""
+		runs makeAIMove on the executor, cancels it when the timeout (and the grace period) is up or the task is cancelled
+		:return: the SearchStatsClass of the move
+		"""
+		await self.__waitForPending(executor)
+		start = time.perf_counter()
+		source = "error"
+		moves = len(self.__repo.board.moves)
+		finished = threading.Event()
+		future = asyncio.get_running_loop().run_in_executor(executor, self.__runAndSet, finished, self.makeAIMove, timeout)
 		
-		# sending the move to the HumanService
-		self.__repo.board.makeMove(True, row, col)
+		try:
+			try:
+				# shielded, so the thread isn't left running on its own (the board can't change under the next move)
+				stats = await asyncio.wait_for(asyncio.shield(future), timeout is not None and timeout + FALLBACK_GRACE or None)
+			except asyncio.TimeoutError:
+				self.cancelAIMove()
+				stats = await self.__waitForCancelled(future, finished, moves)
+				if stats is None:
+					stats = await self.__makeFallbackMove(executor)
+			
+			source = stats.source
+			return stats
+		except asyncio.CancelledError:
+			source = "cancelled"
+			# (a move that didn't stop in time is already pending)
+			if self.__pendingMove is not finished:
+				self.cancelAIMove()
+				await self.__waitForCancelled(future, finished, moves)
+			raise
+		finally:
+			self.__metrics.observe("makeAIMoveAsync", source, time.perf_counter() - start)
+	
+	
+	async def __waitForCancelled(self, future, finished: threading.Event, moves: int):
+		"""
+		waits for a cancelled AI move to stop, at most FALLBACK_GRACE seconds if it didn't make its move yet (it can't
+		make it anymore then, see AIClass.cancel)
+		:param future: the asyncio future of makeAIMove
+		:param finished: set when makeAIMove is done
+		:param moves: the number of moves on the board before the AI move
+		:return: the SearchStatsClass of the move if it was done before the cancel, None if it was cancelled or didn't
+		stop in time (the next move waits for it)
+		"""
+		# the move is on the board already, only its stats are left
+		grace = None if len(self.__repo.board.moves) != moves else FALLBACK_GRACE
+		# pending until it's stopped (also if this task is cancelled while waiting)
+		self.__pendingMove = finished
 		
-		# checking if the game is over to end it before AI move
-		if self.isGameOver():
-			return True
+		try:
+			return await asyncio.wait_for(asyncio.shield(future), grace)
+		except asyncio.TimeoutError:
+			# its SearchCancelledError is expected, also when no move waits for it anymore
+			future.add_done_callback(lambda done: done.cancelled() or done.exception())
+			return None
+		except AIService.SearchCancelledError:
+			return None
+		finally:
+			if future.done():
+				self.__pendingMove = None
+				# a cancel that came after the move was done would cancel the next one
+				self.__AI.clearCancel()
+	
+	
+	async def __waitForPending(self, executor):
+		"""
+		waits for the cancelled AI move that didn't stop in time (if there is one), so the AI only searches one move
+		at a time
+		:param executor: concurrent.futures executor it's waited for on
+		"""
+		pending = self.__pendingMove
+		if pending is None:
+			return
 		
-		# if the game is not over, the AI makes a move right after the human move
-		self.makeAIMove()
+		# the event is set by the thread, so the move can even be from another event loop
+		if not pending.is_set():
+			await asyncio.get_running_loop().run_in_executor(executor, pending.wait)
+		self.__pendingMove = None
+		self.__AI.clearCancel()
+	
+	
+	async def __makeFallbackMove(self, executor):
+		"""
+		AIClass.makeFallbackMove on the executor (it waits for the pondering thread to stop), the replies aren't
+		pondered after it if the cancelled move is still stopping
+		:param executor: concurrent.futures executor the move is made on
+		:return: the SearchStatsClass of the move
+		"""
+		fallback = asyncio.get_running_loop().run_in_executor(executor, functools.partial(self.__AI.makeFallbackMove, ponder=self.__pendingMove is None))
 		
+		try:
+			return await asyncio.shield(fallback)
+		except asyncio.CancelledError:
+			# it can't be stopped, but it's quick, and the next move can't start before it's done
+			await asyncio.wait([fallback])
+			raise
+	
+	
+	@staticmethod
+	def __runAndSet(finished: threading.Event, function, *args):
+		"""
+		runs on the executor
+		:param finished: set when function is done (also if it raised)
+		:return: what function returned
+		"""
+		try:
+			return function(*args)
+		finally:
+			finished.set()
+	
+	
+	def __loopLock(self) -> asyncio.Lock:
+		"""
+		:return: the lock of the async moves for the running event loop (an asyncio lock only works on one loop, a game
+		can move to a new loop, e.g. with another asyncio.run, but it's played on one loop at a time)
+		"""
+		loop = asyncio.get_running_loop()
+		if self.__asyncLoop is not loop:
+			self.__asyncLoop = loop
+			self.__asyncLock = asyncio.Lock()
+		return self.__asyncLock
+	
 	
 	def isGameOver(self) -> bool:
 		"""
 		Saves cache if the game is over
 		:return: bool - True if the game is over, False otherwise
 		"""
+		start = time.perf_counter()
 		
 		gameOver = self.__repo.board.gameOver
 		
 		if gameOver: # saving cache at the end of the game
 			self.__AI.saveCache()
 		
+		self.__metrics.observe("isGameOver", "none", time.perf_counter() - start)
 		return gameOver
 	
 	
+	def close(self):
+		"""
+		stops the pondering and the worker processes of the AI and closes its cache (the game can't be played after this)
+		"""
+		self.__AI.close()
+	
+	
+	@property
+	def metrics(self) -> dict:
+		"""
+		:return: snapshot of the latency histograms of the calls (see MetricsClass.snapshot)
+		"""
+		return self.__metrics.snapshot()
+	
+	
+	def writeMetrics(self, path: str, format: str = "prometheus"):
+		"""
+		writes the latency histograms to a file
+		:param path: path of the file
+		:param format: "prometheus" (text format) or "json"
+		"""
+		self.__metrics.write(path, format)
+	
+	
 	@property
 	def boardStr(self) -> str:
 		"""
@@ -0,0 +1,162 @@
+"""
+Latency histograms of the MainServiceClass calls, cheap enough to always be on (a bisect and 3 additions per call)
+Every call is counted under its name and a source: for the AI moves where the move came from (see SearchStatsClass:
+first, cache, book, tablebase, search), "none" when no AI move was made and "error" when the call raised
+The histograms can be read as a dictionary (snapshot) or written to a file in the Prometheus text format or as JSON
+One MetricsClass can be shared by games played on different threads at the same time (it's locked)
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from services import ServicesError
+
+# upper bounds of the buckets in seconds (the last bucket, +Inf, is every call)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# name of the histogram in the Prometheus format
+METRIC_NAME = "obstruction_call_seconds"
+
+FORMATS = ("prometheus", "json")
+
+
+class LatencyHistogramClass:
+	def __init__(self):
+		# calls in every bucket (not cumulative), the last one is for the calls slower than the biggest bound
+		self.__counts = [0] * (len(BUCKETS) + 1)
+		self.__sum = 0.0
+		self.__count = 0
+		self.__max = 0.0
+
+
+	def observe(self, seconds: float):
+		"""
+		:param seconds: how long a call took
+		"""
+		self.__counts[bisect_left(BUCKETS, seconds)] += 1
+		self.__sum += seconds
+		self.__count += 1
+		if seconds > self.__max:
+			self.__max = seconds
+
+
+	def quantile(self, q: float) -> float:
+		"""
+		:param q: between 0 and 1 (0.99 = the time 99% of the calls are faster than)
+		:return: an estimate of the quantile (linear inside its bucket), 0 if there were no calls
+		"""
+		if not self.__count:
+			return 0.0
+
+		rank = q * self.__count
+		seen = 0
+		for index, count in enumerate(self.__counts):
+			if count and seen + count >= rank:
+				low = index and BUCKETS[index - 1] or 0.0
+				high = index < len(BUCKETS) and BUCKETS[index] or self.__max
+				return min(low + (high - low) * (rank - seen) / count, self.__max)
+			seen += count
+		return self.__max
+
+
+	def snapshot(self) -> dict:
+		"""
+		:return: dictionary with "count", "sum", "max", "p50", "p90", "p99" and "buckets" (upper bound: calls up to it,
+		cumulative like in Prometheus)
+		"""
+		buckets = {}
+		total = 0
+		for bound, count in zip(BUCKETS + ("+Inf",), self.__counts):
+			total += count
+			buckets[str(bound)] = total
+
+		return {
+			"count": self.__count,
+			"sum": self.__sum,
+			"max": self.__max,
+			"p50": self.quantile(0.5),
+			"p90": self.quantile(0.9),
+			"p99": self.quantile(0.99),
+			"buckets": buckets,
+		}
+
+
+class MetricsClass:
+	def __init__(self):
+		# (call name, source): LatencyHistogramClass
+		self.__histograms = {}
+		self.__started = time.time()
+		# the histograms aren't locked themselves, every use of them goes through this lock (reentrant, write and
+		# toPrometheus take it and call snapshot)
+		self.__lock = threading.RLock()
+
+
+	def observe(self, call: str, source: str, seconds: float):
+		"""
+		:param call: name of the call (e.g. "makeAIMove")
+		:param source: where the AI move came from, "none" or "error"
+		:param seconds: how long the call took
+		"""
+		with self.__lock:
+			histogram = self.__histograms.get((call, source))
+			if histogram is None:
+				histogram = self.__histograms[(call, source)] = LatencyHistogramClass()
+			histogram.observe(seconds)
+
+
+	def snapshot(self) -> dict:
+		"""
+		:return: dictionary call name: source: the snapshot of its histogram
+		"""
+		calls = {}
+		with self.__lock:
+			for (call, source), histogram in sorted(self.__histograms.items()):
+				calls.setdefault(call, {})[source] = histogram.snapshot()
+		return calls
+
+
+	def toPrometheus(self) -> str:
+		"""
+		:return: the histograms in the Prometheus text format
+		"""
+		lines = [
+			"# HELP " + METRIC_NAME + " Latency of the MainServiceClass calls",
+			"# TYPE " + METRIC_NAME + " histogram",
+		]
+
+		for call, sources in self.snapshot().items():
+			for source, snapshot in sources.items():
+				labels = 'call="' + call + '",source="' + source + '"'
+				for bound, count in snapshot["buckets"].items():
+					lines.append(METRIC_NAME + "_bucket{" + labels + ',le="' + bound + '"} ' + str(count))
+				lines.append(METRIC_NAME + "_sum{" + labels + "} " + repr(snapshot["sum"]))
+				lines.append(METRIC_NAME + "_count{" + labels + "} " + str(snapshot["count"]))
+
+		return "\n".join(lines) + "\n"
+
+
+	def toJson(self) -> str:
+		"""
+		:return: the snapshot as JSON, with the time the counting started and the current time
+		"""
+		return json.dumps({"started": self.__started, "time": time.time(), "calls": self.snapshot()}, indent=4)
+
+
+	def write(self, path: str, format: str = "prometheus"):
+		"""
+		writes the metrics to a file (to a temporary file first and then renamed, so a reader never sees half of it)
+		:param path: path of the file
+		:param format: "prometheus" or "json"
+		"""
+		if format not in FORMATS:
+			raise ServicesError("format must be one of " + str(FORMATS))
+
+		# locked, so 2 threads don't write the same temporary file
+		with self.__lock:
+			text = format == "json" and self.toJson() or self.toPrometheus()
+
+			tempPath = path + ".tmp"
+			with open(tempPath, "w") as file:
+				file.write(text)
+			os.replace(tempPath, path)
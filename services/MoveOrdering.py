@@ -0,0 +1,121 @@
+"""
+Move ordering for the minimax algorithm
+Alpha-beta prunes the most when the best move is searched first, so the moves of a position are sorted by how likely
+they are to be good before they're searched:
+	- static score: the number of empty squares the move locks, moves that leave the opponent fewer moves go first
+	- killer moves: moves that caused a cutoff in another position at the same depth (the positions next to each other
+	in the tree are usually alike, so the same refutation often works)
+	- history: how many cutoffs each square caused in the whole search, deeper cutoffs count more
+the static score is by far the best of the 3 in this game (python -m services.SearchComparison), so it comes first and
+the others only break its ties
+sources: https://www.chessprogramming.org/Killer_Heuristic, https://www.chessprogramming.org/History_Heuristic
+"""
+from services import ServicesError
+from domain.bitBoard import LOCK_MASKS, CELLS
+
+# the parts that can be turned on, "all" is every one of them and "none" is the plain row by row order
+ORDERING_PARTS = ("static", "killers", "history")
+
+# killer moves remembered for every depth
+KILLERS = 2
+
+# the game can't last longer than this
+MAX_PLIES = CELLS + 1
+
+
+class MoveOrderingClass:
+	def __init__(self, static: bool = True, killers: bool = True, history: bool = True):
+		"""
+		:param static: sort by the number of empty squares each move locks
+		:param killers: search the killer moves of the depth first
+		:param history: sort by the history table (cutoffs caused by each square in the search)
+		"""
+		self.__static = static
+		self.__useKillers = killers
+		self.__useHistory = history
+
+		self.__killers = [[] for _ in range(MAX_PLIES)]
+		self.__history = [0] * CELLS
+
+
+	@staticmethod
+	def fromName(name: str):
+		"""
+		:param name: "all", "none" or the parts separated by commas (e.g. "static,history")
+		:return: a MoveOrderingClass with those parts, None for "none"
+		"""
+		if name == "none":
+			return None
+		if name == "all":
+			return MoveOrderingClass()
+
+		parts = name.split(",")
+		for part in parts:
+			if part not in ORDERING_PARTS:
+				raise ServicesError("move ordering parts must be in " + str(ORDERING_PARTS) + ", 'all' or 'none'")
+
+		return MoveOrderingClass("static" in parts, "killers" in parts, "history" in parts)
+
+
+	def newSearch(self):
+		"""
+		called before every search, the killers are forgotten and the history is halved (it still helps, but the
+		cutoffs of the new search have to matter more)
+		"""
+		self.__killers = [[] for _ in range(MAX_PLIES)]
+		self.__history = [value >> 1 for value in self.__history]
+
+
+	def order(self, cells: list, empty: int, depth: int) -> list:
+		"""
+		:param cells: the moves to sort (square indexes)
+		:param empty: mask of the empty squares of the position
+		:param depth: depth of the position
+		:return: the moves, best first
+		"""
+		killers = self.__useKillers and self.__killers[depth] or ()
+		history = self.__history
+
+		if self.__static:
+			if self.__useHistory:
+				key = lambda cell: ((LOCK_MASKS[cell] & empty).bit_count(), cell in killers, history[cell])
+			else:
+				key = lambda cell: ((LOCK_MASKS[cell] & empty).bit_count(), cell in killers)
+		elif self.__useHistory:
+			key = lambda cell: (cell in killers, history[cell])
+		else:
+			key = lambda cell: cell in killers
+
+		# stable sort, moves with the same key stay in row by row order
+		return sorted(cells, key=key, reverse=True)
+
+
+	def orderRoot(self, cells: list, empty: int) -> list:
+		"""
+		the moves of the root are only sorted by the static score, their order can't depend on what was searched
+		before (the parallel search sorts them in another process and has to get the same order)
+		:param cells: the moves to sort (square indexes)
+		:param empty: mask of the empty squares of the root
+		:return: the moves, best first
+		"""
+		if not self.__static:
+			return cells
+
+		return sorted(cells, key=lambda cell: (LOCK_MASKS[cell] & empty).bit_count(), reverse=True)
+
+
+	def cutoff(self, cell: int, depth: int, draft: int):
+		"""
+		called when a move causes a cutoff
+		:param cell: the move
+		:param depth: depth of the position
+		:param draft: how deep the position was searched (cutoffs close to the root save more)
+		"""
+		if self.__useKillers:
+			killers = self.__killers[depth]
+			if cell not in killers:
+				killers.insert(0, cell)
+				del killers[KILLERS:]
+
+		if self.__useHistory:
+			self.__history[cell] += draft * draft
@@ -0,0 +1,131 @@
+"""
+Builds the opening book of the AI (files/OpeningBook.bin)
+Every position that can be reached from the empty board and still has at least --min-empty empty squares is solved
+ahead of time, so the AI never has to search an opening during a game
+The positions are keyed like the AI cache (canonical mask of the empty squares), so the 8 rotations/reflections of a
+position are solved once, and they're split between worker processes
+
+The solved positions are appended to a checkpoint file (the output path + ".checkpoint") as they come in, if the build
+is stopped, running it again skips the positions that are already in there, the checkpoint is deleted at the end
+
+usage: python -m services.OpeningBookBuilder [--min-empty N] [--workers N] [--output PATH]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from services.AIService import AIClass
+from services.BinaryTable import BinaryTableClass, RecordLogClass, readRecordLog, FLAG_PROVEN
+from domain.bitBoard import FULL_MASK, LOCK_MASKS, iterCells, canonicalMask
+
+# positions sent to a worker at once
+CHUNK_SIZE = 16
+
+# the AI of a worker process
+_workerAI = None
+
+
+def openingPositions(minEmpty: int) -> list:
+	"""
+	:param minEmpty: only the positions with at least this many empty squares
+	:return: the canonical empty masks of all the positions reachable from the empty board, most empty squares first
+	"""
+	start = canonicalMask(FULL_MASK)[0]
+	seen = {start}
+	positions = []
+	frontier = [start]
+
+	# a move always removes empty squares, so the positions under the limit never lead back above it
+	while frontier:
+		positions += frontier
+		nextFrontier = []
+
+		for empty in frontier:
+			for cell in iterCells(empty):
+				child = empty & ~LOCK_MASKS[cell]
+				if child.bit_count() < minEmpty or not child:
+					continue
+
+				key = canonicalMask(child)[0]
+				if key not in seen:
+					seen.add(key)
+					nextFrontier.append(key)
+
+		frontier = nextFrontier
+
+	return sorted(positions, key=lambda empty: empty.bit_count(), reverse=True)
+
+
+def _initWorker():
+	"""
+	runs once in every worker process
+	"""
+	global _workerAI
+	# the Grundy values only say who wins, the scores they give aren't always the fastest win or the slowest loss
+	_workerAI = AIClass(None, cachePath=None, bookPath=None, useGrundy=False)
+
+
+def _solvePositions(positions: list) -> list:
+	"""
+	runs in a worker process
+	:param positions: canonical empty masks
+	:return: list of (empty mask, best move, score)
+	"""
+	return [(empty, *_workerAI.solvePosition(empty)) for empty in positions]
+
+
+def buildBook(path: str, minEmpty: int = 14, workers: int = 0, log=print) -> int:
+	"""
+	solves every position with at least minEmpty empty squares and writes the book
+	:param path: path of the book
+	:param minEmpty: the smallest positions in the book
+	:param workers: number of worker processes (0 = one for every CPU core)
+	:param log: called with a progress message after every chunk (None = quiet)
+	:return: the number of positions in the book
+	"""
+	checkpointPath = path + ".checkpoint"
+	records = readRecordLog(checkpointPath)
+
+	# the positions solved in the checkpoint that aren't in the book anymore (bigger minEmpty) are dropped
+	positions = openingPositions(minEmpty)
+	wanted = set(positions)
+	records = {key: records[key] for key in records if key in wanted}
+	todo = [empty for empty in positions if empty not in records]
+
+	if todo:
+		chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+		start = time.time()
+
+		with ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=_initWorker) as pool:
+			checkpoint = RecordLogClass(checkpointPath, CHUNK_SIZE)
+			futures = [pool.submit(_solvePositions, chunk) for chunk in chunks]
+
+			try:
+				for future in as_completed(futures):
+					for empty, cell, score in future.result():
+						records[empty] = (cell, FLAG_PROVEN, score, empty.bit_count())
+						checkpoint.append(empty, records[empty])
+					checkpoint.sync()
+
+					if log is not None:
+						log("solved " + str(len(records)) + "/" + str(len(positions)) + " positions ("
+							+ str(round(time.time() - start, 1)) + "s)")
+			finally:
+				checkpoint.close()
+
+	BinaryTableClass.write(path, records)
+	if os.path.exists(checkpointPath):
+		os.remove(checkpointPath)
+
+	return len(records)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds the opening book of the AI")
+	parser.add_argument("--min-empty", type=int, default=14, help="smallest number of empty squares of a book position")
+	parser.add_argument("--workers", type=int, default=0, help="number of worker processes (0 = one for every CPU core)")
+	parser.add_argument("--output", default="files/OpeningBook.bin", help="path of the book")
+	args = parser.parse_args()
+
+	count = buildBook(args.output, args.min_empty, args.workers)
+	print("wrote " + str(count) + " positions to " + args.output)
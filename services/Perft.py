@@ -0,0 +1,128 @@
+"""
+Perft: counts the positions reached after exactly N moves from a position, by playing every move of every position
+(like https://www.chessprogramming.org/Perft), so the move generation of a board can be checked and timed without
+the search on top of it
+the counts from the empty board are known (PERFT_COUNTS), a board that gets a different number has a bug
+divide gives the count of every first move, to find which move goes wrong
+
+usage: python -m services.Perft [--board minimax board bitboard] [--depth N] [--divide]
+"""
+import argparse
+import copy
+import sys
+import time
+from texttable import Texttable
+from domain.board import BoardClass
+from domain.minimaxBoard import MiniMaxBoardClass
+from domain.bitBoard import BitBoardClass
+
+# the positions after 0, 1, 2... moves from the empty board, a game never lasts more than 9 moves
+PERFT_COUNTS = (1, 36, 1040, 23520, 404016, 5084160, 44831520, 259580160, 878653440, 1306368000)
+
+# the boards perft can run on
+BOARDS = {
+	"minimax": MiniMaxBoardClass,
+	"board": BoardClass,
+	"bitboard": BitBoardClass,
+}
+
+SQUARES = [(row, col) for row in range(1, 7) for col in range(1, 7)]
+
+
+def validMoves(board) -> list:
+	"""
+	:param board: MiniMaxBoardClass, BoardClass or BitBoardClass
+	:return: the valid moves (1-indexed), found with the board's own isMoveValid
+	"""
+	return [square for square in SQUARES if board.isMoveValid(*square)]
+
+
+def child(board, row: int, col: int, isHuman: bool):
+	"""
+	:param board: MiniMaxBoardClass, BoardClass or BitBoardClass
+	:param row, col: the move (1-indexed)
+	:param isHuman: who makes the move (only BoardClass keeps it)
+	:return: a copy of the board with the move made
+	"""
+	if isinstance(board, BoardClass):
+		# BoardClass can't be cloned, it's the board of the game
+		newBoard = copy.deepcopy(board)
+		newBoard.makeMove(isHuman, row, col)
+	else:
+		newBoard = board.cloneBoard()
+		newBoard.makeMove(row, col)
+	return newBoard
+
+
+def perft(board, depth: int, isHuman: bool = True) -> int:
+	"""
+	:param board: MiniMaxBoardClass, BoardClass or BitBoardClass
+	:param depth: number of moves
+	:param isHuman: True if the human moves first
+	:return: the number of positions reached after exactly depth moves (a game that ends before doesn't count)
+	"""
+	if depth == 0:
+		return 1
+
+	moves = validMoves(board)
+	if depth == 1:
+		return len(moves)
+
+	return sum(perft(child(board, row, col, isHuman), depth - 1, not isHuman) for row, col in moves)
+
+
+def divide(board, depth: int, isHuman: bool = True) -> dict:
+	"""
+	:param board: MiniMaxBoardClass, BoardClass or BitBoardClass
+	:param depth: number of moves (at least 1)
+	:param isHuman: True if the human moves first
+	:return: dictionary first move (row, col): perft of the position after it
+	"""
+	return {(row, col): perft(child(board, row, col, isHuman), depth - 1, not isHuman) for row, col in validMoves(board)}
+
+
+def timePerft(name: str, depth: int) -> dict:
+	"""
+	:param name: key of BOARDS
+	:param depth: number of moves
+	:return: dictionary with "board", "depth", "positions", "expected", "seconds" and "positionsPerSecond"
+	"""
+	start = time.perf_counter()
+	positions = perft(BOARDS[name](), depth)
+	seconds = time.perf_counter() - start
+
+	return {
+		"board": name,
+		"depth": depth,
+		"positions": positions,
+		"expected": depth < len(PERFT_COUNTS) and PERFT_COUNTS[depth] or 0,
+		"seconds": seconds,
+		"positionsPerSecond": seconds and positions / seconds,
+	}
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Counts and times the positions reached from the empty board")
+	parser.add_argument("--board", nargs="+", default=list(BOARDS), choices=list(BOARDS), help="boards to check")
+	parser.add_argument("--depth", type=int, default=3, help="number of moves")
+	parser.add_argument("--divide", action="store_true", help="print the count of every first move")
+	args = parser.parse_args()
+
+	txtTable = Texttable()
+	txtTable.set_max_width(0)
+	txtTable.header(["board", "depth", "positions", "expected", "seconds", "positions/s", ""])
+	wrong = False
+
+	for boardName in args.board:
+		result = timePerft(boardName, args.depth)
+		ok = result["positions"] == result["expected"]
+		wrong = wrong or not ok
+		txtTable.add_row([boardName, args.depth, result["positions"], result["expected"], round(result["seconds"], 3),
+			int(result["positionsPerSecond"]), ok and "OK" or "WRONG"])
+
+		if args.divide and args.depth > 0:
+			for move, count in divide(BOARDS[boardName](), args.depth).items():
+				print(boardName, move, count)
+
+	print(txtTable.draw())
+	sys.exit(wrong and 1 or 0)
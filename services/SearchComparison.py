@@ -0,0 +1,100 @@
+"""
+Compares AI search settings on a fixed set of positions: the number of positions searched and the time of each move
+Every setting searches every position with a new AIClass (empty transposition table, no cache or book), so the numbers
+don't depend on what was searched before
+
+usage: python -m services.SearchComparison [--orderings none static killers history all] [--algorithms minimax pvs]
+	[--table-megabytes MB] [--time-limit SECONDS] [--no-tablebase]
+"""
+import argparse
+import time
+from texttable import Texttable
+from repository.Repo import RepositoryClass
+from services.AIService import AIClass, ALGORITHMS
+
+# the moves leading to each position (1-indexed, the human moves first), all of them get searched to the end
+POSITIONS = (
+	(),
+	((1, 1),),
+	((3, 3),),
+	((1, 3),),
+	((1, 1), (4, 4)),
+	((2, 5), (5, 2)),
+	((1, 1), (1, 4), (4, 1)),
+	((3, 4), (6, 1), (1, 6)),
+)
+
+
+def searchPosition(moves: tuple, **options) -> tuple:
+	"""
+	:param moves: the moves leading to the position
+	:param options: arguments for AIClass
+	:return: (the move picked, the number of positions searched, seconds)
+	"""
+	repo = RepositoryClass()
+	for i, move in enumerate(moves):
+		repo.board.makeMove(i % 2 == 0, *move)
+
+	AI = AIClass(repo, cachePath=None, bookPath=None, **options)
+
+	start = time.perf_counter()
+	AI.makeMove()
+	seconds = time.perf_counter() - start
+
+	return repo.board.moves[-1], AI.nodes, seconds
+
+
+def compare(settings: dict, positions: tuple = POSITIONS) -> dict:
+	"""
+	:param settings: dictionary name: arguments for AIClass
+	:param positions: the positions to search (lists of moves)
+	:return: dictionary name: list of (move, positions searched, seconds), one for each position
+	"""
+	results = {}
+
+	for name in settings:
+		results[name] = [searchPosition(moves, **settings[name]) for moves in positions]
+
+	return results
+
+
+def resultsTable(results: dict) -> str:
+	"""
+	:param results: what compare returns
+	:return: a table with the positions searched and the time of every setting, and the totals
+	"""
+	txtTable = Texttable()
+	txtTable.set_max_width(0)
+	txtTable.set_precision(3)
+	names = list(results)
+	txtTable.header(["position"] + [name + " nodes" for name in names] + [name + " s" for name in names])
+
+	rows = len(next(iter(results.values())))
+	for i in range(rows):
+		txtTable.add_row([i + 1] + [results[name][i][1] for name in names] + [results[name][i][2] for name in names])
+
+	txtTable.add_row(["total"] + [sum(r[1] for r in results[name]) for name in names]
+		+ [sum(r[2] for r in results[name]) for name in names])
+
+	return txtTable.draw()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Compares the nodes and time of the AI search with different settings")
+	parser.add_argument("--orderings", nargs="+", default=["none", "static", "killers", "history", "all"],
+		help="move orderings to compare (see MoveOrderingClass.fromName)")
+	parser.add_argument("--algorithms", nargs="+", default=["pvs"], choices=ALGORITHMS, help="search algorithms to compare")
+	parser.add_argument("--table-megabytes", type=float, default=16, help="size of the transposition table (0 = none)")
+	parser.add_argument("--time-limit", type=float, default=None,
+		help="search with iterative deepening and this time limit (the positions are small enough to be solved in it)")
+	parser.add_argument("--no-tablebase", action="store_true", help="search without the endgame tablebase")
+	args = parser.parse_args()
+
+	comparison = compare({
+		ordering + "/" + algorithm: {
+			"moveOrdering": ordering, "algorithm": algorithm, "tableMegabytes": args.table_megabytes,
+			"timeLimit": args.time_limit, "tablebasePath": None if args.no_tablebase else "files/Tablebase.bin",
+		}
+		for ordering in args.orderings for algorithm in args.algorithms
+	})
+	print(resultsTable(comparison))
@@ -0,0 +1,120 @@
+"""
+What the AI did for one move: where the move came from, how many positions it searched at every depth, the cutoffs,
+the table hits and the time, so a slow move can be explained afterwards
+AIClass.makeMove returns one, and with statsLogPath every one of them is appended to a file as a line of JSON
+"""
+import json
+import time
+
+# where a move can come from ("ponder" = searched while the human was thinking, the time is only the wait for it,
+# the nodes and the rest are of that search, "fallback" = not searched, there was no time left, see makeFallbackMove)
+SOURCES = ("first", "cache", "book", "tablebase", "search", "ponder", "fallback")
+
+
+class SearchStatsClass:
+	def __init__(self, source: str, move: list, emptySquares: int):
+		"""
+		:param source: one of SOURCES
+		:param move: the move played (1-indexed row and column)
+		:param emptySquares: number of empty squares before the move
+		"""
+		self.source = source
+		self.move = list(move)
+		self.emptySquares = emptySquares
+		self.time = time.time()
+
+		self.seconds = 0.0
+		self.proven = True
+		# depth of the last iterative deepening search that finished (None = searched to the end of the game)
+		self.draft = None
+
+		# positions searched, in total and at every depth (the parallel search only counts the ones of this process)
+		self.nodes = 0
+		self.plyNodes = []
+		# moves that caused a cutoff at every depth
+		self.plyCutoffs = []
+
+		self.tableHits = 0
+		self.tableMisses = 0
+		# positions inside the search solved by the tablebase and by the Grundy values
+		self.tablebaseHits = 0
+		self.grundyHits = 0
+
+
+	@property
+	def maxDepth(self) -> int:
+		"""
+		:return: the deepest position searched (0 = only the root)
+		"""
+		depth = len(self.plyNodes)
+		while depth and not self.plyNodes[depth - 1]:
+			depth -= 1
+		return max(depth - 1, 0)
+
+
+	@property
+	def branchingFactor(self) -> float:
+		"""
+		:return: the effective branching factor, the b with b + b^2 + ... + b^d = positions searched after the root
+		(d = maxDepth), how many moves of a position the search really looked at
+		"""
+		nodes = sum(self.plyNodes[1:])
+		depth = self.maxDepth
+		if not depth or not nodes:
+			return 0.0
+
+		# b + b^2 + ... + b^d grows with b, so it's found by bisection
+		low, high = 0.0, float(nodes)
+		for _ in range(60):
+			middle = (low + high) / 2
+			if sum(middle ** i for i in range(1, depth + 1)) < nodes:
+				low = middle
+			else:
+				high = middle
+		return high
+
+
+	@property
+	def tableHitRate(self) -> float:
+		probes = self.tableHits + self.tableMisses
+		return probes and self.tableHits / probes
+
+
+	def toDict(self) -> dict:
+		"""
+		:return: the stats as a dictionary, ready for json
+		"""
+		return {
+			"time": self.time,
+			"source": self.source,
+			"move": self.move,
+			"emptySquares": self.emptySquares,
+			"seconds": self.seconds,
+			"proven": self.proven,
+			"draft": self.draft,
+			"nodes": self.nodes,
+			"nodesPerSecond": self.seconds and self.nodes / self.seconds,
+			"plyNodes": self.plyNodes,
+			"plyCutoffs": self.plyCutoffs,
+			"maxDepth": self.maxDepth,
+			"branchingFactor": round(self.branchingFactor, 3),
+			"tableHits": self.tableHits,
+			"tableMisses": self.tableMisses,
+			"tableHitRate": self.tableHitRate,
+			"tablebaseHits": self.tablebaseHits,
+			"grundyHits": self.grundyHits,
+		}
+
+
+	def writeLine(self, path: str):
+		"""
+		appends the stats to a file as a line of JSON
+		:param path: path of the file
+		"""
+		with open(path, "a") as file:
+			file.write(json.dumps(self.toDict()) + "\n")
+
+
+	def __str__(self) -> str:
+		return (self.source + " " + str(self.move) + ": " + str(self.nodes) + " nodes in " + str(round(self.seconds, 3))
+			+ "s, depth " + str(self.maxDepth) + ", branching factor " + str(round(self.branchingFactor, 2)))
@@ -0,0 +1,76 @@
+from jproperties import Properties
+
+"""
+Reads files/settings.properties, so that the services can be configured without changing the code
+(the UI type is still read by start.py)
+"""
+
+
+class SettingsClass:
+	def __init__(self, path: str = "files/settings.properties"):
+		"""
+		:param path: path of the properties file, if it doesn't exist every setting has its default value
+		"""
+		self.__properties = Properties()
+		
+		try:
+			with open(path, "rb") as file:
+				self.__properties.load(file)
+		except FileNotFoundError:
+			pass
+	
+	
+	def get(self, name: str, default: str = None) -> str | None:
+		"""
+		:param name: name of the setting
+		:param default: returned if the setting isn't in the file
+		:return: the value of the setting
+		"""
+		
+		if name not in self.__properties:
+			return default
+		
+		return self.__properties.get(name).data
+	
+	
+	def getFloat(self, name: str, default: float | None = None) -> float | None:
+		"""
+		:param name: name of the setting
+		:param default: returned if the setting isn't in the file or isn't a number
+		:return: the value of the setting as a float
+		"""
+		
+		try:
+			return float(self.get(name))
+		except (TypeError, ValueError):
+			return default
+	
+	
+	def getInt(self, name: str, default: int | None = None) -> int | None:
+		"""
+		:param name: name of the setting
+		:param default: returned if the setting isn't in the file or isn't an integer
+		:return: the value of the setting as an int
+		"""
+		
+		try:
+			return int(self.get(name))
+		except (TypeError, ValueError):
+			return default
+	
+	
+	def getBool(self, name: str, default: bool | None = None) -> bool | None:
+		"""
+		:param name: name of the setting
+		:param default: returned if the setting isn't in the file or isn't true/false (yes/no, 1/0 work too)
+		:return: the value of the setting as a bool
+		"""
+		
+		value = str(self.get(name)).strip().lower()
+		if value in ("true", "yes", "1"):
+			return True
+		if value in ("false", "no", "0"):
+			return False
+		return default
+	
+	
@@ -0,0 +1,211 @@
+"""
+Endgame tablebase: the exact result and the best move of every position (reachable from the empty board) with at most
+a few empty squares, so minimax can stop as soon as it gets to one of them
+It's built backwards from the end of the game: the positions are solved from the fewest empty squares up, and every
+move of a position leads to one with fewer empty squares, which is already solved
+
+Layout (little endian):
+	header (16 bytes): magic "OBEG", version (u16), max empty squares (u16), record count (u32), 4 reserved bytes
+	records (u64 each, sorted): empty mask << 16 | player to move wins << 15 | moves left << 8 | best move
+the positions are stored as they are (not canonical, every rotation/reflection has its own record), so a probe is just
+a binary search for the mask of the empty squares
+
+Can also be used from the command line to build the table:
+	python -m services.Tablebase build [--max-empty K] [--output PATH]
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from services import ServicesError
+from domain.bitBoard import FULL_MASK, LOCK_MASKS, iterCells
+
+MAGIC = b"OBEG"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHI4x")
+
+NO_MOVE = 255
+
+# the positions the AI probes most are the small ones, and there are few positions with a lot of empty squares
+DEFAULT_MAX_EMPTY = 14
+
+
+def packRecord(empty: int, wins: bool, movesLeft: int, move: int) -> int:
+	"""
+	:param empty: mask of the empty squares of the position
+	:param wins: True if the player to move wins
+	:param movesLeft: number of moves until the end of the game (with both players playing the best moves)
+	:param move: the best move (square index) or NO_MOVE if the game is over
+	:return: the record
+	"""
+	return empty << 16 | wins << 15 | movesLeft << 8 | move
+
+
+def unpackRecord(record: int) -> tuple:
+	"""
+	:param record: a record
+	:return: (player to move wins, moves left, best move)
+	"""
+	return bool(record >> 15 & 1), record >> 8 & 127, record & 255
+
+
+class TablebaseClass:
+	def __init__(self, path: str):
+		"""
+		opens the table (read only), a file that doesn't exist is an empty table
+		:param path: path of the file
+		"""
+		self.__file = None
+		self.__map = None
+		self.__records = ()
+		self.__maxEmpty = -1
+
+		try:
+			self.__file = open(path, "rb")
+		except FileNotFoundError:
+			return
+
+		header = self.__file.read(HEADER.size)
+		if len(header) < HEADER.size or header[:4] != MAGIC:
+			self.close()
+			raise ServicesError(path + " is not a tablebase")
+
+		_magic, version, maxEmpty, count = HEADER.unpack(header)
+		if version != VERSION:
+			self.close()
+			raise ServicesError(path + " has an unknown version")
+
+		self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+		self.__maxEmpty = maxEmpty
+
+		if sys.byteorder == "little":
+			# the records are read straight from the file, bisect works on the memoryview without copying anything
+			self.__records = memoryview(self.__map)[HEADER.size:HEADER.size + count * 8].cast("Q")
+		else:
+			self.__records = array("Q", self.__map[HEADER.size:HEADER.size + count * 8])
+			self.__records.byteswap()
+
+
+	@property
+	def maxEmpty(self) -> int:
+		"""
+		:return: every reachable position with at most this many empty squares is in the table (-1 = empty table)
+		"""
+		return self.__maxEmpty
+
+
+	def probe(self, empty: int) -> tuple | None:
+		"""
+		:param empty: mask of the empty squares
+		:return: (player to move wins, moves left, best move) or None if the position isn't in the table
+		"""
+		records = self.__records
+		index = bisect_left(records, empty << 16)
+
+		if index < len(records) and records[index] >> 16 == empty:
+			return unpackRecord(records[index])
+		return None
+
+
+	def __len__(self) -> int:
+		return len(self.__records)
+
+
+	def close(self):
+		"""
+		closes the file (the table can't be used after this)
+		"""
+		if isinstance(self.__records, memoryview):
+			self.__records.release()
+		self.__records = ()
+		if self.__map is not None:
+			self.__map.close()
+			self.__map = None
+		if self.__file is not None:
+			self.__file.close()
+			self.__file = None
+
+
+def reachablePositions(maxEmpty: int) -> list:
+	"""
+	:param maxEmpty: only the positions with at most this many empty squares are returned
+	:return: the empty masks of every position reachable from the empty board, fewest empty squares first
+	"""
+	seen = {FULL_MASK}
+	frontier = [FULL_MASK]
+
+	while frontier:
+		nextFrontier = []
+		for empty in frontier:
+			for cell in iterCells(empty):
+				child = empty & ~LOCK_MASKS[cell]
+				if child not in seen:
+					seen.add(child)
+					nextFrontier.append(child)
+		frontier = nextFrontier
+
+	return sorted((empty for empty in seen if empty.bit_count() <= maxEmpty), key=lambda empty: empty.bit_count())
+
+
+def solvePositions(positions: list) -> dict:
+	"""
+	solves the positions backwards: a position is won if a move leaves the other player in a lost position (the fastest
+	win is picked), otherwise it's lost (and the slowest loss is picked), same as the minimax scores
+	:param positions: empty masks, fewest empty squares first, with every position their moves lead to
+	:return: dictionary empty mask: (player to move wins, moves left, best move)
+	"""
+	results = {}
+
+	for empty in positions:
+		if not empty:
+			results[empty] = (False, 0, NO_MOVE)
+			continue
+
+		best = None
+		for cell in iterCells(empty):
+			childWins, childMovesLeft, _childMove = results[empty & ~LOCK_MASKS[cell]]
+			# the other player losing is a win, fewer moves is better for a win and more moves is better for a loss
+			rank = not childWins and (1, -childMovesLeft) or (0, childMovesLeft)
+			if best is None or rank > best[0]:
+				best = (rank, (not childWins, childMovesLeft + 1, cell))
+
+		results[empty] = best[1]
+
+	return results
+
+
+def buildTablebase(path: str, maxEmpty: int = DEFAULT_MAX_EMPTY) -> int:
+	"""
+	solves every reachable position with at most maxEmpty empty squares and writes the table (to a temporary file
+	first and then renamed, like BinaryTableClass.write)
+	:param path: path of the file
+	:param maxEmpty: the biggest positions in the table
+	:return: the number of positions written
+	"""
+	results = solvePositions(reachablePositions(maxEmpty))
+	records = sorted(packRecord(empty, *results[empty]) for empty in results)
+
+	tempPath = path + ".tmp"
+	with open(tempPath, "wb") as file:
+		file.write(HEADER.pack(MAGIC, VERSION, maxEmpty, len(records)))
+		file.write(struct.pack("<" + str(len(records)) + "Q", *records))
+		file.flush()
+		os.fsync(file.fileno())
+
+	os.replace(tempPath, path)
+	return len(records)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds the endgame tablebase of the AI")
+	parser.add_argument("command", choices=["build"])
+	parser.add_argument("--max-empty", type=int, default=DEFAULT_MAX_EMPTY, help="biggest number of empty squares of a position in the table")
+	parser.add_argument("--output", default="files/Tablebase.bin", help="path of the table")
+	args = parser.parse_args()
+
+	count = buildTablebase(args.output, args.max_empty)
+	print("wrote " + str(count) + " positions to " + args.output)
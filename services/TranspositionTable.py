@@ -0,0 +1,154 @@
+"""
+Transposition table used by the minimax algorithm
+In Obstruction the position only depends on which squares are blocked, not on the order of the moves, so the same
+position is reached from a lot of different move orders, there's no reason to search it again every time
+"""
+from services import ServicesError
+
+# bound types, so that the stored scores work with alpha-beta pruning
+EXACT = 0  # the score is the real score of the position
+LOWER = 1  # the real score is >= the stored score (the search failed high)
+UPPER = 2  # the real score is <= the stored score (the search failed low)
+
+# positions of the values in an entry tuple
+KEY, SCORE, FLAG, DEPTH, MOVE, AGE = range(6)
+
+# roughly what an entry costs in memory (tuple of 6 + the key int + the slot in the list)
+ENTRY_BYTES = 120
+
+REPLACEMENT_POLICIES = ("depth", "always")
+
+
+class TranspositionTableClass:
+	def __init__(self, maxMegabytes: float = 16, replacement: str = "depth"):
+		"""
+		Fixed size table, the number of slots is the biggest power of 2 that fits in maxMegabytes
+		:param maxMegabytes: memory cap of the table
+		:param replacement: "depth" - keeps the entry with the bigger search depth when 2 positions want the same slot
+		(entries from older searches are always replaced), "always" - the newest entry always replaces the old one
+		"""
+
+		if replacement not in REPLACEMENT_POLICIES:
+			raise ServicesError("replacement must be one of " + str(REPLACEMENT_POLICIES))
+
+		slots = max(1, int(maxMegabytes * 1024 * 1024) // ENTRY_BYTES)
+		self.__bits = max(1, slots.bit_length() - 1)
+		self.__size = 1 << self.__bits
+		self.__alwaysReplace = replacement == "always"
+
+		self.__entries = [None] * self.__size
+		self.__age = 0
+
+		self.__hits = 0
+		self.__misses = 0
+		self.__stores = 0
+		self.__overwrites = 0
+		self.__rejected = 0
+
+
+	def __index(self, key: int) -> int:
+		"""
+		the key is the bitboard, which is already a perfect 36 bit hash of the position, but its low bits are just
+		the first row, so it gets mixed (fibonacci hashing) before being used as an index
+		:param key: the position key
+		:return: the slot of the key
+		"""
+		return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.__bits)
+
+
+	def probe(self, key: int) -> tuple | None:
+		"""
+		:param key: the position key
+		:return: the entry tuple (key, score, flag, depth, move, age) or None if the position isn't stored
+		"""
+		entry = self.__entries[self.__index(key)]
+
+		if entry is not None and entry[KEY] == key:
+			self.__hits += 1
+			return entry
+
+		self.__misses += 1
+		return None
+
+
+	def store(self, key: int, score: int, flag: int, depth: int, move: int | None):
+		"""
+		stores a position, following the replacement policy if the slot is taken by another position
+		:param key: the position key
+		:param score: the score of the position
+		:param flag: EXACT, LOWER or UPPER
+		:param depth: how deep the position was searched (bigger = more valuable)
+		:param move: the best move found (square index) or None
+		"""
+		index = self.__index(key)
+		old = self.__entries[index]
+
+		if old is not None and old[KEY] != key:
+			if not self.__alwaysReplace and old[AGE] == self.__age and old[DEPTH] > depth:
+				self.__rejected += 1
+				return
+			self.__overwrites += 1
+
+		self.__entries[index] = (key, score, flag, depth, move, self.__age)
+		self.__stores += 1
+
+
+	def newSearch(self):
+		"""
+		called before every search, so that the entries of older searches can be replaced first
+		"""
+		self.__age += 1
+
+
+	def items(self):
+		"""
+		:return: generator of all the stored entries (key, score, flag, depth, move, age)
+		"""
+		return (entry for entry in self.__entries if entry is not None)
+
+
+	def clear(self):
+		"""
+		removes all entries
+		"""
+		self.__entries = [None] * self.__size
+
+
+	def resetStats(self):
+		"""
+		resets the hit/miss counters
+		"""
+		self.__hits = 0
+		self.__misses = 0
+		self.__stores = 0
+		self.__overwrites = 0
+		self.__rejected = 0
+
+
+	@property
+	def size(self) -> int:
+		"""
+		:return: the number of slots
+		"""
+		return self.__size
+
+
+	@property
+	def stats(self) -> dict:
+		"""
+		:return: dictionary with the counters of the table
+		"""
+		probes = self.__hits + self.__misses
+
+		return {
+			"hits": self.__hits,
+			"misses": self.__misses,
+			"hitRate": probes and self.__hits / probes,
+			"stores": self.__stores,
+			"overwrites": self.__overwrites,
+			"rejected": self.__rejected,
+			"slots": self.__size,
+			"used": self.__size - self.__entries.count(None),
+		}
+
+
@@ -17,9 +17,45 @@ Notes:
 			First move (when AI starts) would normally be in the left upper corner, but since
 				the board can be rotated all corners are the same, so to not make it boring,
 				the corner is randomly chosen
-			It creates the cache in real time, if there isn't a move cached already and there are
-				20+ available moves in that position, it saved the move into the cache
-			There's an optimized board created for minimax to make it even faster
+			It creates the cache in real time, if there isn't a move cached already and the search of the
+				move took 0.05+ seconds, it saved the move into the cache
+			The cache is keyed by the empty squares (different moves can leave the same empty squares and the
+				game only depends on them), in canonical form: the board can be rotated/mirrored 8 ways and all of
+				them share one entry (the big positions in the transposition table too)
+			The cache file is a binary hash table opened with mmap (services/BinaryTable.py), so startup doesn't
+				parse anything and a lookup is O(1) (old pickle caches are converted when they're loaded)
+			New cache entries are appended to a log next to the cache file as soon as they're found (so closing the
+				game before it's over doesn't lose them), the log is folded into the cache file once it gets long
+			The cache is capped (AICacheMaxEntries in files/settings.properties), the entries dropped first are
+				the ones that saved the least search time and weren't used in a while (services/AICache.py)
+			Every position with 14+ empty squares is solved ahead of time in the opening book (files/OpeningBook.bin,
+				built by services/OpeningBookBuilder.py), so the openings are never searched during a game
+			The end of the game is in an endgame tablebase (files/Tablebase.bin, built by services/Tablebase.py): the
+				exact result and best move of every position with 14 or fewer empty squares, minimax stops there
+			There's an optimized board created for minimax to make it even faster (a bitboard, the whole
+				board is one int and a move is a single OR with a precomputed 3x3 lock mask)
+			Uses a transposition table in minimax, the same position is reached through a lot of move orders
+				and it only needs to be searched once (the table has a memory cap and keeps the deeper entries)
+			When the empty squares split into groups that don't touch each other, each group is a separate game,
+				the Sprague-Grundy values (nim-sum of the groups) say who wins, minimax only looks for how soon
+				(the values of every shape are precomputed in files/GrundyTable.bin by services/GrundyTableBuilder.py)
+			With a time limit (AITimeLimit in files/settings.properties) it uses iterative deepening: it searches
+				1 move deep, 2 moves deep... (each depth starts with the best move of the last one) until the game
+				is solved or the time is up, and plays the best move found so far (only proven moves are cached)
+			The search is a principal variation search by default (negamax form, the moves after the first one only
+				get a null window search that proves they're not better, with aspiration windows around the score of
+				the last depth when there's a time limit), the plain minimax is still there (AIClass algorithm)
+			The moves are sorted before they're searched (services/MoveOrdering.py): the ones that lock the most
+				empty squares first, then the killer moves (python -m services.SearchComparison compares the orderings)
+			The moves of the root can be searched by several processes at once (AIWorkers in the settings), they
+				share the best score found so far and pick the same move as the search with 1 process
+			With AIPonder in the settings, the replies of the human are searched in the background while the human
+				thinks (the likely ones first), the search of the reply that was played is used and the rest dropped
+			MainServiceClass has async versions of the moves (makeHumanMoveAsync, makeAIMoveAsync) for asyncio front
+				ends: the search runs on an executor thread, with a timeout (best move so far, or a fallback move if
+				the search doesn't stop in time) and cancellation, so one event loop can run many games
+			The real timings of the AI are measured on a fixed set of positions with
+				python -m services.Benchmark run (and compared with python -m services.Benchmark compare OLD NEW)
 			== The first one to move can always win, there is 0 chance of you winning if AI starts
 				best play is to keep moving in the corner of the board and only take 4 squares until
 				someone breaks the loop
@@ -33,6 +69,8 @@ Notes:
 				(uses lerping - linear interpolation of numbers [a - (b-a) * alpha],
 				I wrote a post at some point explain this)
 			Added window name and icon (icon made by myself)
+			The AI moves are searched on a background thread (the window keeps drawing and shows "Thinking..."),
+				Back and quitting cancel the search (AIClass.cancel), the move is never made then
 			
 			
 		Sounds Manager - made by myself:
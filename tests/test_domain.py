@@ -2,6 +2,7 @@
 from unittest import TestCase
 from domain.board import BoardClass
 from domain.minimaxBoard import MiniMaxBoardClass
+from domain.bitBoard import BitBoardClass, LOCK_MASKS, FULL_MASK, SYMMETRIES, SYMMETRY_CELLS, INVERSE_SYMMETRY, transformMask, canonicalMask, regions, isSplit, canonicalShape
 from domain import DomainError
 
 class TestDomain(TestCase):
@@ -42,6 +43,12 @@ class TestDomain(TestCase):
 		self.assertEqual(board.availableMoves(), 32)
 		
 		
+		# the empty squares mask is kept up to date by the moves
+		self.assertEqual(board.emptyMask.bit_count(), 32)
+		self.assertEqual(board.emptyMask & 1, 0)
+		self.assertEqual(board.emptyMask >> 35 & 1, 1)
+		
+		
 		# if the move is not valid it should raise a DomainError
 		self.assertRaises(DomainError, board.makeMove, True, 1, 1)
 		
@@ -80,5 +87,113 @@ class TestDomain(TestCase):
 		self.assertIsInstance(board.board, list)
 		self.assertIsInstance(str(board), str)
 		self.assertIsInstance(board.cloneBoard(), MiniMaxBoardClass)
+	
+	
+	def test_bitBoard(self):
+		board = BitBoardClass()
+		
+		
+		# making sure isMoveValid works fine in normal conditions
+		self.assertEqual(board.isMoveValid(1, 1), True)
+		self.assertEqual(board.isMoveValid(6, 6), True)
+		self.assertEqual(board.availableMoves(), 36)
+		
+		
+		# a corner locks 4 squares, the middle of the board locks 9
+		self.assertEqual(LOCK_MASKS[0].bit_count(), 4)
+		self.assertEqual(LOCK_MASKS[14].bit_count(), 9)
+		
+		
+		# making a move returns True if it works
+		self.assertEqual(board.makeMove(1, 1), True)
+		
+		
+		# should not be valid as a move locks the 3x3 grid around the move location
+		self.assertEqual(board.isMoveValid(1, 1), False)
+		self.assertEqual(board.isMoveValid(2, 2), False)
+		self.assertEqual(board.isMoveValid(1, 3), True)
+		self.assertEqual(board.availableMoves(), 32)
+		self.assertEqual(board.validMoves()[0], [1, 3])
+		
+		
+		# making sure the board is not full
+		self.assertEqual(board.gameOver, False)
+		self.assertEqual(BitBoardClass(FULL_MASK).gameOver, True)
+		
+		
+		# converting to and from BoardClass.boardList should give the same blocked squares
+		realBoard = BoardClass()
+		realBoard.makeMove(True, 1, 1)
+		realBoard.makeMove(False, 4, 4)
+		
+		converted = BitBoardClass.fromBoardList(realBoard.boardList)
+		board.makeMove(4, 4)
+		self.assertEqual(converted, board)
+		self.assertEqual(converted.availableMoves(), realBoard.availableMoves())
+		self.assertEqual(BitBoardClass.fromBoardList(converted.toBoardList()), converted)
+		
+		
+		# making sure these are the right instance types
+		self.assertIsInstance(board.toBoardList(), list)
+		self.assertIsInstance(str(board), str)
+		self.assertIsInstance(board.cloneBoard(), BitBoardClass)
+	
+	
+	def test_symmetries(self):
+		board = BitBoardClass()
+		board.makeMove(1, 2)
+		board.makeMove(4, 5)
+		
+		
+		# all 8 rotations/reflections of a position have the same canonical form
+		canonical, sym = canonicalMask(board.blocked)
+		self.assertEqual(transformMask(board.blocked, sym), canonical)
+		
+		for otherSym in range(SYMMETRIES):
+			self.assertEqual(canonicalMask(transformMask(board.blocked, otherSym))[0], canonical)
+		
+		
+		# every symmetry can be undone, and moving a square moves its lock mask with it
+		for sym in range(SYMMETRIES):
+			self.assertEqual(transformMask(transformMask(board.blocked, sym), INVERSE_SYMMETRY[sym]), board.blocked)
+			
+			for cell in range(36):
+				self.assertEqual(transformMask(LOCK_MASKS[cell], sym), LOCK_MASKS[SYMMETRY_CELLS[sym][cell]])
+		
+		
+		# a corner is moved to a corner
+		self.assertIn(SYMMETRY_CELLS[1][0], (5, 30, 35))
+	
+	
+	def test_regions(self):
+		board = BitBoardClass()
+		
+		
+		# an empty board is one group
+		self.assertEqual(len(regions(board.empty)), 1)
+		self.assertEqual(isSplit(board.empty), False)
+		
+		
+		# a full column of locked squares splits the board in 2
+		for row in range(1, 7, 3):
+			board.makeMove(row, 3)
+		board.makeMove(6, 3)
+		
+		self.assertEqual(isSplit(board.empty), True)
+		self.assertEqual(len(regions(board.empty)), 2)
+		self.assertEqual(sum(regions(board.empty)), board.empty)
+		
+		
+		# squares that only touch by a corner are still in the same group
+		self.assertEqual(len(regions(1 | 1 << 7)), 1)
+		self.assertEqual(len(regions(1 | 1 << 2)), 2)
+		
+		# the last square of the board doesn't touch the first square of the last row
+		self.assertEqual(len(regions(1 << 35 | 1 << 30 | 1 << 29)), 2)
+		self.assertEqual(len(regions(1 << 30 | 1 << 35)), 2)
+		
 		
-		
\ No newline at end of file
+		# the same shape moved, rotated or mirrored has the same canonical form
+		self.assertEqual(canonicalShape(1 | 1 << 7), canonicalShape(1 << 34 | 1 << 29))
+		self.assertEqual(canonicalShape(1 << 14), 1)
+		self.assertNotEqual(canonicalShape(1 | 1 << 1), canonicalShape(1 | 1 << 7))
@@ -1,13 +1,35 @@
 
+import asyncio
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
 import pygame
 
 from unittest import TestCase
 from services.MainService import MainServiceClass
-from services.AIService import AIClass
+from services.AIService import AIClass, SearchCancelledError
+from services.AICache import AICacheClass
+from services.CacheMerge import mergeCaches
+from services.Benchmark import buildCorpus, runBenchmark, compareResults, movesTo
+from services.Perft import perft, divide, PERFT_COUNTS, BOARDS
+from services.SearchStats import SearchStatsClass
+from services.Metrics import MetricsClass, LatencyHistogramClass
+from services.GrundySolver import GrundySolverClass
+from services.MoveOrdering import MoveOrderingClass
+from services.Settings import SettingsClass
+from services.GrundyTableBuilder import buildTable
+from services.BinaryTable import BinaryTableClass, RecordLogClass, FileLockClass, readRecordLog, recordDraft, convertPickleCache, RECORD, FLAG_PROVEN, FLAG_USED, KEY_SHAPE, DRAFT_SHIFT
+from services.OpeningBookBuilder import buildBook, openingPositions
+from services.Tablebase import TablebaseClass, buildTablebase, reachablePositions, solvePositions, NO_MOVE
+from services.TranspositionTable import TranspositionTableClass, EXACT, LOWER, KEY, SCORE, FLAG, MOVE
 from services.SoundsManager import SoundError, SoundManagerClass
 from services import ServicesError
 from repository.Repo import RepositoryClass
 from domain.board import BoardClass
+from domain.bitBoard import BitBoardClass, LOCK_MASKS, FULL_MASK, canonicalMask
 
 
 """
@@ -16,7 +38,7 @@ This test takes a long time because AI doesn't have certain moves in the cache s
 
 class TestServices(TestCase):
 	def test_main_service(self):
-		mainService = MainServiceClass()
+		mainService = MainServiceClass(cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
 		
 		# making a move returns True if the human won
 		self.assertNotEqual(mainService.makeHumanMove("2 2"), True)
@@ -38,11 +60,140 @@ class TestServices(TestCase):
 		"""
 		I can't test much more as the rest is up to the AI (which I'm also trying to test below)
 		"""
+		
+		# closing the game closes the AI (more than once is fine)
+		mainService.close()
+		mainService.close()
+	
+	
+	def test_async_service(self):
+		# several games on one event loop, each move made on an executor thread (searched, not from the cache or book)
+		services = [MainServiceClass(cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None) for _ in range(3)]
+		
+		async def play():
+			return await asyncio.gather(*(service.makeHumanMoveAsync(move) for service, move in zip(services, ("1 1", "3 3", "6 1"))))
+		
+		self.assertEqual(asyncio.run(play()), [False, False, False])
+		for service in services:
+			self.assertEqual(sum(row.count("O") for row in service.getBoardState()), 1)
+			self.assertEqual(sum(row.count("X") for row in service.getBoardState()), 1)
+		
+		
+		# with almost no time, the move is the best one found so far (or a fallback move), not proven
+		service = MainServiceClass(cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		service.makeHumanMove("1 1", AIMoves=False)
+		stats = asyncio.run(service.makeAIMoveAsync(timeout=0.001))
+		self.assertIn(stats.source, ("search", "fallback"))
+		self.assertFalse(stats.proven)
+		self.assertEqual(sum(row.count("X") for row in service.getBoardState()), 1)
+		self.assertIn(stats.source, service.metrics["makeAIMoveAsync"])
+		
+		
+		# a cancelled task stops the search, no move is made and the next move isn't cancelled
+		service = MainServiceClass(cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		service.makeHumanMove("3 3", AIMoves=False)
+		
+		async def cancelMove():
+			task = asyncio.create_task(service.makeAIMoveAsync())
+			await asyncio.sleep(0)
+			task.cancel()
+			try:
+				await task
+			except asyncio.CancelledError:
+				return True
+			return False
+		
+		self.assertTrue(asyncio.run(cancelMove()))
+		self.assertEqual(sum(row.count("X") for row in service.getBoardState()), 0)
+		self.assertIn("cancelled", service.metrics["makeAIMoveAsync"])
+		asyncio.run(service.makeAIMoveAsync())
+		self.assertEqual(sum(row.count("X") for row in service.getBoardState()), 1)
+		
+		
+		# the same game can go on in another event loop, the moves still wait for each other there
+		async def twoMoves():
+			return await asyncio.gather(service.makeAIMoveAsync(), service.makeAIMoveAsync())
+		
+		asyncio.run(twoMoves())
+		asyncio.run(twoMoves())
+		self.assertEqual(sum(row.count("X") for row in service.getBoardState()), 5)
+		
+		
+		# the fallback move is the first move the search would try
+		repo = RepositoryClass()
+		AI = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		stats = AI.makeFallbackMove()
+		self.assertEqual((stats.source, stats.proven, len(repo.board.moves)), ("fallback", False, 1))
+	
+	
+	def test_metrics(self):
+		metrics = MetricsClass()
+		mainService = MainServiceClass(metrics, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		
+		
+		# every call is counted, the human move under the source of the AI move that came after it
+		mainService.makeHumanMove("1 1")
+		self.assertRaises(ServicesError, mainService.makeHumanMove, "wrong")
+		
+		snapshot = mainService.metrics
+		source = list(snapshot["makeAIMove"])[0]
+		self.assertEqual(snapshot["makeHumanMove"][source]["count"], 1)
+		self.assertEqual(snapshot["makeHumanMove"]["error"]["count"], 1)
+		self.assertEqual(snapshot["makeAIMove"][source]["buckets"]["+Inf"], 1)
+		self.assertIn("isGameOver", snapshot)
+		
+		
+		# the buckets are cumulative and the quantiles are inside the right bucket
+		histogram = LatencyHistogramClass()
+		for seconds in (0.0005, 0.003, 0.003, 0.2, 40):
+			histogram.observe(seconds)
+		histogram = histogram.snapshot()
+		self.assertEqual(histogram["buckets"]["0.001"], 1)
+		self.assertEqual(histogram["buckets"]["0.005"], 3)
+		self.assertEqual(histogram["buckets"]["+Inf"], 5)
+		self.assertTrue(0.0025 <= histogram["p50"] <= 0.005)
+		self.assertEqual(histogram["max"], 40)
+		
+		
+		# the games of several threads can share the metrics, no call is lost (and snapshots can be taken meanwhile)
+		sharedMetrics = MetricsClass()
+		
+		def observeCalls(thread):
+			for call in range(2000):
+				sharedMetrics.observe("call" + str(call % 10), "source" + str(thread), 0.001)
+				sharedMetrics.observe("makeAIMove", "search", 0.002)
+		
+		threads = [threading.Thread(target=observeCalls, args=(thread,)) for thread in range(4)]
+		for thread in threads:
+			thread.start()
+		while any(thread.is_alive() for thread in threads):
+			sharedMetrics.snapshot()
+		for thread in threads:
+			thread.join()
+		
+		snapshot = sharedMetrics.snapshot()
+		self.assertEqual(snapshot["makeAIMove"]["search"]["count"], 8000)
+		self.assertEqual(snapshot["makeAIMove"]["search"]["buckets"]["+Inf"], 8000)
+		self.assertEqual(sum(sources["source1"]["count"] for call, sources in snapshot.items() if call != "makeAIMove"), 2000)
+		
+		
+		# the files are written in both formats
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "metrics")
+			mainService.writeMetrics(path)
+			with open(path) as file:
+				text = file.read()
+			self.assertIn('obstruction_call_seconds_count{call="makeHumanMove",source="error"} 1', text)
+			
+			mainService.writeMetrics(path, "json")
+			with open(path) as file:
+				self.assertEqual(json.load(file)["calls"]["makeHumanMove"]["error"]["count"], 1)
+			self.assertRaises(ServicesError, mainService.writeMetrics, path, "xml")
 	
 	
 	def test_ai_service(self):
 		repo = RepositoryClass()
-		AI = AIClass(repo)
+		AI = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
 		
 		"""
 		This test takes a long time because AI doesn't have certain moves in the cache so it has to be computed every time
@@ -82,6 +233,749 @@ class TestServices(TestCase):
 		self.assertNotEqual(repo.board.gameOver, True)
 		
 		
+	def test_transposition_table(self):
+		table = TranspositionTableClass(maxMegabytes=0.01)
+		
+		
+		# the number of slots is a power of 2 that fits in the memory cap
+		self.assertEqual(table.size & (table.size - 1), 0)
+		self.assertLessEqual(table.size * 120, 0.01 * 1024 * 1024)
+		
+		
+		# probing a position that isn't stored is a miss
+		self.assertIsNone(table.probe(12345))
+		self.assertEqual(table.stats["misses"], 1)
+		
+		
+		# storing and probing the same position is a hit
+		table.store(12345, 7, EXACT, 20, 3)
+		entry = table.probe(12345)
+		self.assertEqual((entry[SCORE], entry[FLAG], entry[MOVE]), (7, EXACT, 3))
+		self.assertEqual(table.stats["hits"], 1)
+		
+		
+		# with the "depth" policy a deeper entry isn't replaced by a shallower one from the same search
+		for key in range(table.size * 4):
+			table.store(key, 1, LOWER, 1, None)
+		self.assertIsNotNone(table.probe(12345))
+		self.assertGreater(table.stats["rejected"], 0)
+		
+		
+		# after a new search older entries can be replaced
+		table.newSearch()
+		for key in range(table.size * 4):
+			table.store(key, 1, LOWER, 1, None)
+		self.assertIsNone(table.probe(12345))
+		
+		
+		# the AI with and without a table should make the same move
+		repoWithTable, repoWithoutTable = RepositoryClass(), RepositoryClass()
+		for repo in (repoWithTable, repoWithoutTable):
+			repo.board.makeMove(False, 1, 1)
+			repo.board.makeMove(True, 3, 4)
+		
+		AIWithTable = AIClass(repoWithTable, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		AIWithoutTable = AIClass(repoWithoutTable, tableMegabytes=0, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		AIWithTable.makeMove()
+		AIWithoutTable.makeMove()
+		
+		self.assertIsNone(AIWithoutTable.tableStats)
+		self.assertEqual(repoWithTable.board.boardList, repoWithoutTable.board.boardList)
+	
+	
+	def test_binary_table(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "table.bin")
+			
+			
+			# a file that doesn't exist is an empty table
+			table = BinaryTableClass(path)
+			self.assertEqual(len(table), 0)
+			self.assertIsNone(table.get(5))
+			self.assertEqual(BinaryTableClass.isBinaryTable(path), False)
+			
+			
+			# every record written can be found again, the others can't
+			records = {key * 7919: (key % 36, FLAG_PROVEN, -key, key) for key in range(1, 500)}
+			BinaryTableClass.write(path, records)
+			
+			table = BinaryTableClass(path)
+			self.assertEqual(BinaryTableClass.isBinaryTable(path), True)
+			self.assertEqual(len(table), len(records))
+			self.assertEqual(table.get(7919 * 3)[0], 3)
+			self.assertEqual(table.get(7919 * 3)[2:], (-3, 3))
+			self.assertIsNone(table.get(7919 * 1000))
+			self.assertEqual(len(list(table.items())), len(records))
+			table.close()
+			
+			
+			# opening a file that isn't a binary table raises ServicesError
+			with open(path, "wb") as file:
+				file.write(b"not a table at all, definitely longer than the header")
+			self.assertRaises(ServicesError, BinaryTableClass, path)
+			
+			
+			# a position and its rotation become the same entry when converting the old pickle cache
+			records = convertPickleCache({
+				32: [
+					{"moves": [[0, 0]], "bestMove": [1, 3]},
+					{"moves": [[5, 5]], "bestMove": [6, 4]},
+				]
+			})
+			self.assertEqual(len(records), 1)
+			
+			
+			# different moves that leave the same empty squares are the same position too
+			records = convertPickleCache({
+				28: [
+					{"moves": [[0, 0], [0, 3]], "bestMove": [6, 6]},
+					{"moves": [[0, 1], [0, 3]], "bestMove": [6, 6]},
+				]
+			})
+			self.assertEqual(len(records), 1)
+	
+	
+	def test_cache_log(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "cache.bin")
+			
+			
+			# the records of the log are read back, a record cut off by a crash is skipped and a later record wins
+			log = RecordLogClass(path + ".log", 2)
+			log.append(5, (1, FLAG_PROVEN, 0, 30))
+			log.append(5, (2, FLAG_PROVEN, 0, 30))
+			log.close()
+			with open(path + ".log", "ab") as file:
+				file.write(RECORD.pack(9, 3, FLAG_PROVEN | FLAG_USED, 0, 30)[:7])
+			
+			self.assertEqual(readRecordLog(path + ".log"), {5: (2, FLAG_PROVEN, 0, 30)})
+			self.assertEqual(readRecordLog(path + ".missing"), {})
+			
+			
+			# the AI plays a move found in the log of the last game without searching
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 3, 3)
+			key, sym = canonicalMask(repo.board.emptyMask)
+			
+			log = RecordLogClass(path + ".log")
+			log.append(key, (35, FLAG_PROVEN, 0, repo.board.availableMoves()))
+			log.close()
+			
+			AI = AIClass(repo, cachePath=path, bookPath=None, grundyTablePath=None)
+			AI.makeMove()
+			self.assertEqual(AI.nodes, 0)
+			self.assertEqual(AI.lastMoveProven, True)
+			
+			
+			# saving folds the log into the cache file (there isn't one yet) and empties the log
+			AI.saveCache()
+			AI.close()
+			self.assertEqual(BinaryTableClass(path).get(key)[0], 35)
+			self.assertEqual(os.path.getsize(path + ".log"), 0)
+	
+	
+	def test_ai_cache(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "cache.bin")
+			cache = AICacheClass(path, maxEntries=3, compactEvery=100)
+			self.assertRaises(ServicesError, AICacheClass, path, 0)
+			
+			
+			# an entry that saves a lot of search time stays longer than a cheap one used just as recently
+			cache.put(1, 0, FLAG_PROVEN, 2.0, 30)
+			cache.put(2, 0, FLAG_PROVEN, 0.01, 30)
+			cache.put(3, 0, FLAG_PROVEN, 0.5, 30)
+			cache.put(4, 0, FLAG_PROVEN, 0.5, 30)
+			self.assertEqual(cache.get(1)[2], 2000)
+			
+			cache.compact()
+			self.assertIsNone(cache.get(2))
+			self.assertEqual(len(cache), 3)
+			
+			
+			# an expensive entry that isn't used anymore is dropped after the cheap ones that keep being used
+			for key in range(5, 9):
+				for other in range(key - 2, key + 1):
+					cache.get(other) or cache.put(other, 0, FLAG_PROVEN, 0.5, 30)
+				cache.compact()
+			self.assertIsNone(cache.get(1))
+			
+			
+			# the counters
+			stats = cache.stats
+			self.assertEqual(stats["entries"], 3)
+			self.assertEqual(stats["maxEntries"], 3)
+			self.assertGreater(stats["evictions"], 1)
+			self.assertGreater(stats["hits"], 0)
+			self.assertEqual(stats["logEntries"], 0)
+			cache.close()
+			
+			
+			# 2 caches on the same file don't drop each other's entries when they compact
+			first, second = AICacheClass(path + "4"), AICacheClass(path + "4")
+			second.put(1, 0, FLAG_PROVEN, 1, 30)
+			first.put(2, 0, FLAG_PROVEN, 1, 30)
+			first.compact()
+			first.put(3, 0, FLAG_PROVEN, 1, 30)
+			second.compact()
+			first.close()
+			second.close()
+			self.assertEqual(sorted(key for key, *record in BinaryTableClass(path + "4").items()), [1, 2, 3])
+			
+			
+			# an entry isn't appended while another process holds the file lock (in the middle of a compaction)
+			cache = AICacheClass(path + "6")
+			with FileLockClass(path + "6.lock"):
+				thread = threading.Thread(target=cache.put, args=(1, 0, FLAG_PROVEN, 1, 30))
+				thread.start()
+				thread.join(0.2)
+				self.assertTrue(thread.is_alive())
+				self.assertEqual(readRecordLog(path + "6.log"), {})
+			thread.join()
+			cache.close()
+			self.assertEqual(readRecordLog(path + "6.log"), {1: (0, FLAG_PROVEN, 1000, 30)})
+			
+			
+			# open gives the same cache for the same file, it's closed by the last one
+			first, second = AICacheClass.open(path + "5"), AICacheClass.open(path + "5")
+			self.assertIs(first, second)
+			first.put(1, 0, FLAG_PROVEN, 1, 30)
+			first.close()
+			self.assertEqual(second.get(1)[0], 0)
+			second.close()
+			self.assertIsNot(AICacheClass.open(path + "5"), first)
+			
+			
+			# only the moves that took long enough to search are cached
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 3, 3)
+			repo.board.makeMove(False, 6, 6)
+			repo.board.makeMove(True, 1, 1)
+			repo.board.makeMove(False, 1, 6)
+			repo.board.makeMove(True, 6, 1)
+			AI = AIClass(repo, cachePath=path + "2", bookPath=None, tablebasePath=None, grundyTablePath=None, cacheMinSeconds=60)
+			AI.makeMove()
+			self.assertEqual(AI.cacheStats["stores"], 0)
+			AI.close()
+			
+			
+			# the positions solved inside the search tree are cached too, with a winning move if there is one
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 1, 1)
+			AI = AIClass(repo, cachePath=path + "3", bookPath=None, tablebasePath=None, grundyTablePath=None, cacheMinSeconds=60, cacheInteriorMinEmpty=8)
+			AI.makeMove()
+			AI.saveCache()
+			AI.close()
+			
+			cached = list(BinaryTableClass(path + "3").items())
+			self.assertGreater(len(cached), 100)
+			
+			results = solvePositions(reachablePositions(FULL_MASK.bit_count()))
+			for empty, move, _flags, _value, emptySquares in cached:
+				self.assertGreaterEqual(emptySquares, 8)
+				self.assertEqual(empty.bit_count(), emptySquares)
+				self.assertEqual(results[empty][0], not results[empty & ~LOCK_MASKS[move]][0])
+	
+	
+	def test_cache_merge(self):
+		with tempfile.TemporaryDirectory() as folder:
+			first, second, output = (os.path.join(folder, name) for name in ("first.bin", "second.bin", "merged.bin"))
+			
+			
+			# a binary cache with a log and an old pickle cache, the position after (1, 1) is in both (rotated in the pickle)
+			key = canonicalMask(FULL_MASK & ~LOCK_MASKS[0])[0]
+			BinaryTableClass.write(first, {key: (20, FLAG_PROVEN, 10, 32), 5: (1, FLAG_PROVEN, 500, 2)})
+			log = RecordLogClass(first + ".log")
+			log.append(7, (2, 2 << DRAFT_SHIFT, 900, 10))
+			log.append(5, (3, FLAG_PROVEN, 40, 2))
+			log.close()
+			
+			with open(second, "wb") as file:
+				pickle.dump({32: [{"moves": [[5, 5]], "bestMove": [3, 3]}]}, file)
+			
+			
+			# every position is written once, the log of a cache replaces its own table, the same depth goes to the file
+			# given first (the pickle entries have no search time)
+			stats = mergeCaches(output, [second, first])
+			self.assertEqual(stats["entries"], 3)
+			self.assertEqual(stats["inputs"][1]["read"], 3)
+			self.assertEqual(stats["inputs"][1]["ignored"], 1)
+			self.assertEqual(BinaryTableClass(output).get(key)[1:3], (FLAG_PROVEN | FLAG_USED, 0))
+			self.assertEqual(BinaryTableClass(output).get(5)[0], 3)
+			
+			
+			# the deeper search wins even if it took less time, a proven move was searched to the end of the game
+			third = os.path.join(folder, "third.bin")
+			log = RecordLogClass(third + ".log")
+			log.append(7, (4, 6 << DRAFT_SHIFT, 100, 10))
+			log.close()
+			mergeCaches(output, [first, third])
+			self.assertEqual(BinaryTableClass(output).get(7)[0], 4)
+			self.assertEqual(recordDraft((4, FLAG_PROVEN, 0, 10)), 10)
+			
+			
+			# merged a few entries at a time, the result is the same
+			merged = sorted(BinaryTableClass(output).items())
+			stats = mergeCaches(output, [first, third], chunkEntries=1)
+			self.assertEqual(stats["parts"], 5)
+			self.assertEqual(sorted(BinaryTableClass(output).items()), merged)
+			
+			
+			# proven entries are kept over longer ones by the cap
+			stats = mergeCaches(output, [first], 2)
+			self.assertEqual(stats["dropped"], 1)
+			self.assertIsNone(BinaryTableClass(output).get(7))
+			self.assertRaises(ServicesError, mergeCaches, output, [os.path.join(folder, "missing.bin")])
+			self.assertFalse(os.path.exists(output + ".merge"))
+	
+	
+	def test_benchmark(self):
+		# the corpus is the same every time, with every phase in it
+		corpus = buildCorpus(1, None)
+		self.assertEqual(corpus, buildCorpus(1, None))
+		self.assertEqual(sorted(position["phase"] for position in corpus), ["endgame", "midgame", "opening"])
+		self.assertEqual(len(movesTo(FULL_MASK & ~LOCK_MASKS[14] & ~LOCK_MASKS[35])), 2)
+		
+		
+		# every position is searched (no root tablebase or Grundy value), the results can be written as json, a run
+		# isn't a regression of itself but twice the nodes is
+		results = runBenchmark(corpus, None, None, boardGames=5, repeat=1)
+		self.assertTrue(all(position["nodes"] > 0 for position in results["positions"]))
+		self.assertEqual(json.loads(json.dumps(results))["total"]["nodes"], sum(position["nodes"] for position in results["positions"]))
+		self.assertEqual(len(results["boards"]), 2)
+		self.assertFalse(any(row[3] for row in compareResults(results, results)))
+		
+		slower = json.loads(json.dumps(results))
+		for position in slower["positions"]:
+			position["nodes"] = position["nodes"] * 2 + 10
+		self.assertTrue(any(row[3] for row in compareResults(results, slower)))
+	
+	
+	def test_perft(self):
+		# every board finds the known number of positions, and divide splits it by first move
+		for boardClass in BOARDS.values():
+			self.assertEqual(perft(boardClass(), 2), PERFT_COUNTS[2])
+			
+			counts = divide(boardClass(), 2)
+			self.assertEqual(len(counts), 36)
+			self.assertEqual(counts[(1, 1)], 32)
+			self.assertEqual(sum(counts.values()), PERFT_COUNTS[2])
+		
+		self.assertEqual(perft(BOARDS["bitboard"](), 3), PERFT_COUNTS[3])
+		self.assertEqual(perft(BitBoardClass(FULL_MASK), 1), 0)
+	
+	
+	def test_search_stats(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "stats.jsonl")
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 1, 1)
+			AI = AIClass(repo, timeLimit=5, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None, statsLogPath=path)
+			
+			
+			# the positions of every depth add up to the nodes, and the root was searched
+			stats = AI.makeMove()
+			self.assertIs(AI.lastStats, stats)
+			self.assertEqual(stats.source, "search")
+			self.assertEqual(stats.move, [index + 1 for index in repo.board.moves[-1]])
+			self.assertEqual(sum(stats.plyNodes), stats.nodes)
+			self.assertEqual(stats.maxDepth, len(stats.plyNodes) - 1)
+			self.assertGreater(stats.plyNodes[0], 0)
+			self.assertGreater(sum(stats.plyCutoffs), 0)
+			self.assertGreater(stats.branchingFactor, 1)
+			self.assertGreater(stats.tableHits, 0)
+			
+			
+			# the first move isn't searched, every move is a line of the log
+			AI = AIClass(RepositoryClass(), cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None, statsLogPath=path)
+			self.assertEqual(AI.makeFirstMove().nodes, 0)
+			with open(path) as file:
+				lines = [json.loads(line) for line in file]
+			self.assertEqual([line["source"] for line in lines], ["search", "first"])
+			self.assertEqual(lines[0]["plyNodes"], stats.plyNodes)
+			
+			
+			# a search that only looked at the root and its moves has the number of moves as branching factor
+			stats = SearchStatsClass("search", [1, 1], 20)
+			stats.plyNodes = [1, 20]
+			self.assertAlmostEqual(stats.branchingFactor, 20)
+	
+	
+	def test_grundy_solver(self):
+		solver = GrundySolverClass()
+		
+		
+		# 1 empty square: one move and the game is over
+		self.assertEqual(solver.value(1 << 14), 1)
+		self.assertEqual(solver.value(0), 0)
+		
+		
+		# 2 copies of the same group cancel out (the second player copies the first one)
+		self.assertEqual(solver.value(1 | 1 << 1 | 1 << 34 | 1 << 35), 0)
+		
+		
+		# the player who starts on an empty board wins
+		self.assertNotEqual(solver.value(FULL_MASK), 0)
+		
+		
+		# a winning move leaves a nim-sum of 0 for the other player
+		empty = FULL_MASK ^ LOCK_MASKS[14] ^ LOCK_MASKS[20] ^ LOCK_MASKS[26]
+		if solver.value(empty):
+			move = solver.bestMove(empty)
+			self.assertEqual(solver.value(empty & ~LOCK_MASKS[move]), 0)
+		
+		
+		# the shapes are memoized
+		self.assertGreater(len(solver), 0)
+		
+		
+		# the stop function can stop the solver, it solves the same values afterwards
+		stopping = [True]
+		
+		def stop():
+			if stopping[0]:
+				raise TimeoutError()
+		
+		stoppedSolver = GrundySolverClass(None, stop)
+		self.assertEqual(stoppedSolver.value(0), 0)
+		self.assertRaises(TimeoutError, stoppedSolver.value, empty)
+		stopping[0] = False
+		self.assertEqual(stoppedSolver.value(empty), solver.value(empty))
+		
+		
+		# the AI with and without the Grundy values should agree on who wins
+		repoWithGrundy, repoWithoutGrundy = RepositoryClass(), RepositoryClass()
+		for repo in (repoWithGrundy, repoWithoutGrundy):
+			repo.board.makeMove(False, 1, 3)
+			repo.board.makeMove(True, 4, 3)
+		
+		AIClass(repoWithGrundy, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None).makeMove()
+		AIClass(repoWithoutGrundy, useGrundy=False, cachePath=None, bookPath=None, tablebasePath=None).makeMove()
+		
+		self.assertEqual(solver.value(repoWithGrundy.board.emptyMask) == 0, solver.value(repoWithoutGrundy.board.emptyMask) == 0)
+		
+		
+		# the Grundy values only say who wins, the score (how soon) is the same as without them
+		for position in (empty, repoWithGrundy.board.emptyMask, FULL_MASK ^ LOCK_MASKS[7] ^ LOCK_MASKS[28]):
+			withGrundy = AIClass(RepositoryClass(), cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+			withoutGrundy = AIClass(RepositoryClass(), useGrundy=False, cachePath=None, bookPath=None, tablebasePath=None)
+			self.assertEqual(withGrundy.solvePosition(position)[1], withoutGrundy.solvePosition(position)[1])
+	
+	
+	def test_grundy_table(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "grundy.bin")
+			
+			
+			# the builder writes the small shapes only
+			count = buildTable(path, maxSquares=6)
+			self.assertGreater(count, 0)
+			
+			
+			# a solver with the table gives the same values as one without it
+			tableSolver = GrundySolverClass(path)
+			solver = GrundySolverClass()
+			empty = FULL_MASK ^ LOCK_MASKS[8] ^ LOCK_MASKS[27]
+			self.assertEqual(tableSolver.value(empty), solver.value(empty))
+			self.assertEqual(tableSolver.value(FULL_MASK), solver.value(FULL_MASK))
+			
+			
+			# the shapes that weren't in the table are added to it when it's saved
+			tableSolver.saveTable()
+			self.assertGreater(len(BinaryTableClass(path, KEY_SHAPE)), count)
+			
+			
+			# the AI uses the table it's given and adds its new shapes to it
+			AIPath = os.path.join(os.path.dirname(path), "AIGrundy.bin")
+			AICount = buildTable(AIPath, maxSquares=4)
+			repo = RepositoryClass()
+			repo.board.makeMove(False, 1, 3)
+			repo.board.makeMove(True, 4, 3)
+			AI = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=AIPath)
+			AI.makeMove()
+			AI.saveCache()
+			self.assertGreater(len(BinaryTableClass(AIPath, KEY_SHAPE)), AICount)
+	
+	
+	def test_time_limit(self):
+		repo = RepositoryClass()
+		AI = AIClass(repo, timeLimit=0.001, tableMegabytes=0, useGrundy=False, cachePath=None, bookPath=None, tablebasePath=None)
+		
+		
+		# with almost no time the AI still makes a valid move, but it isn't proven to be the best one
+		AI.makeMove()
+		self.assertEqual(len(repo.board.moves), 1)
+		self.assertEqual(AI.lastMoveProven, False)
+		
+		
+		# with enough time the search gets to the end and the move is proven
+		repo = RepositoryClass()
+		repo.board.makeMove(True, 1, 1)
+		repo.board.makeMove(False, 4, 4)
+		AI = AIClass(repo, timeLimit=60, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		
+		AI.makeMove()
+		self.assertEqual(len(repo.board.moves), 3)
+		self.assertEqual(AI.lastMoveProven, True)
+		
+		
+		# the tablebase scores come from past the depth of the search, the proven move still wins as soon as the move
+		# of the full search
+		exact = AIClass(RepositoryClass(), useGrundy=False, cachePath=None, bookPath=None, tablebasePath=None)
+		scores = []
+		for timeLimit in (60, None):
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 1, 1)
+			repo.board.makeMove(False, 4, 4)
+			repo.board.makeMove(True, 6, 1)
+			AI = AIClass(repo, timeLimit=timeLimit, cachePath=None, bookPath=None, grundyTablePath=None)
+			AI.makeMove()
+			self.assertEqual(AI.lastMoveProven, True)
+			scores.append(exact.solvePosition(repo.board.emptyMask)[1])
+		self.assertEqual(scores[0], scores[1])
+		
+		
+		# settings that aren't in the file get their default values
+		settings = SettingsClass("notfound.properties")
+		self.assertIsNone(settings.get("AITimeLimit"))
+		self.assertEqual(settings.getFloat("AITimeLimit", 5), 5)
+	
+	
+	def test_cancel(self):
+		# a move cancelled before it starts isn't made, the next one is
+		repo = RepositoryClass()
+		AI = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		AI.cancel()
+		
+		self.assertRaises(SearchCancelledError, AI.makeMove)
+		self.assertEqual(len(repo.board.moves), 0)
+		AI.makeMove()
+		self.assertEqual(len(repo.board.moves), 1)
+		
+		
+		# a move cancelled from another thread stops long before the full search would (about 2 seconds with these)
+		repo = RepositoryClass()
+		AI = AIClass(repo, tableMegabytes=0, useGrundy=False, moveOrdering="none", algorithm="minimax", cachePath=None, bookPath=None, tablebasePath=None)
+		errors = []
+		
+		def search():
+			try:
+				AI.makeMove()
+			except SearchCancelledError as err:
+				errors.append(err)
+		
+		thread = threading.Thread(target=search)
+		thread.start()
+		time.sleep(0.05)
+		AI.cancel()
+		thread.join(5)
+		
+		self.assertFalse(thread.is_alive())
+		self.assertEqual(len(errors), 1)
+		self.assertEqual(len(repo.board.moves), 0)
+		
+		
+		# the service only makes the human move when asked to, the AI move can be made (or cancelled) after it
+		service = MainServiceClass(cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+		self.assertFalse(service.makeHumanMove("1 1", AIMoves=False))
+		self.assertEqual(sum(row.count("O") for row in service.getBoardState()), 1)
+		service.cancelAIMove()
+		self.assertRaises(SearchCancelledError, service.makeAIMove)
+		self.assertIn("cancelled", service.metrics["makeAIMove"])
+		service.makeAIMove()
+		self.assertEqual(sum(row.count("X") for row in service.getBoardState()), 1)
+	
+	
+	def test_pondering(self):
+		# the replies of the human are searched after the AI moves, the one played is answered without a search
+		repo = RepositoryClass()
+		AI = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None, ponder=True)
+		repo.board.makeMove(True, 1, 1)
+		AI.makeMove()
+		
+		start = time.monotonic()
+		while AI.pondering and time.monotonic() - start < 60:
+			time.sleep(0.01)
+		self.assertFalse(AI.pondering)
+		
+		repo.board.makeMove(True, *next((row, col) for row in range(6, 0, -1) for col in range(6, 0, -1) if repo.board.isMoveValid(row, col)))
+		stats = AI.makeMove()
+		self.assertEqual(stats.source, "ponder")
+		self.assertEqual(len(repo.board.moves), 4)
+		self.assertEqual(stats.move, [index + 1 for index in repo.board.moves[-1]])
+		
+		
+		# stopping the pondering doesn't wait for the searches, the next move is searched normally
+		repo = RepositoryClass()
+		AI = AIClass(repo, tableMegabytes=0, useGrundy=False, moveOrdering="none", algorithm="minimax", cachePath=None, bookPath=None, tablebasePath=None, ponder=True)
+		AI.makeFirstMove()
+		self.assertTrue(AI.pondering)
+		
+		start = time.monotonic()
+		AI.stopPondering()
+		self.assertFalse(AI.pondering)
+		self.assertLess(time.monotonic() - start, 1)
+		
+		AI.close()
+	
+	
+	def test_parallel_search(self):
+		# the worker processes pick the same moves as the sequential search
+		for moves in ([], [(1, 1)], [(1, 1), (4, 4)], [(3, 3)]):
+			repos = []
+			
+			for workers in (1, 2):
+				repo = RepositoryClass()
+				for i, move in enumerate(moves):
+					repo.board.makeMove(i % 2 == 0, *move)
+				
+				AI = AIClass(repo, workers=workers, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+				AI.makeMove()
+				AI.close()
+				repos.append(repo)
+			
+			self.assertEqual(repos[0].board.moves, repos[1].board.moves)
+	
+	
+	def test_move_ordering(self):
+		# the moves that lock more empty squares go first, ties stay row by row
+		ordering = MoveOrderingClass(killers=False, history=False)
+		self.assertEqual(ordering.order([0, 1, 7, 35], FULL_MASK, 1), [7, 1, 0, 35])
+		
+		# killer moves break the ties of the static score
+		ordering = MoveOrderingClass(history=False)
+		ordering.cutoff(35, 1, 4)
+		self.assertEqual(ordering.order([0, 1, 7, 35], FULL_MASK, 1), [7, 1, 35, 0])
+		self.assertEqual(ordering.order([0, 1, 7, 35], FULL_MASK, 2), [7, 1, 0, 35])
+		
+		self.assertIsNone(MoveOrderingClass.fromName("none"))
+		self.assertRaises(ServicesError, MoveOrderingClass.fromName, "random")
+		
+		
+		# sorting the moves searches fewer positions than the row by row order
+		nodes = {}
+		for moveOrdering in ("none", "static,killers"):
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 1, 1)
+			
+			AI = AIClass(repo, tableMegabytes=0, moveOrdering=moveOrdering, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None)
+			AI.makeMove()
+			nodes[moveOrdering] = AI.nodes
+		
+		self.assertLess(nodes["static,killers"], nodes["none"])
+	
+	
+	def test_pvs(self):
+		# the principal variation search picks the same moves as minimax, with or without a time limit
+		for moves in ([], [(1, 1)], [(2, 5), (5, 2)]):
+			for timeLimit in (None, 60):
+				repos = []
+				
+				for algorithm in ("minimax", "pvs"):
+					repo = RepositoryClass()
+					for i, move in enumerate(moves):
+						repo.board.makeMove(i % 2 == 0, *move)
+					
+					AIClass(repo, timeLimit=timeLimit, algorithm=algorithm, cachePath=None, bookPath=None, tablebasePath=None, grundyTablePath=None).makeMove()
+					repos.append(repo)
+				
+				self.assertEqual(repos[0].board.moves, repos[1].board.moves)
+		
+		self.assertRaises(ServicesError, AIClass, RepositoryClass(), algorithm="negascout")
+	
+	
+	def test_proof_search(self):
+		# the proof-number search proves who wins, and then picks the same move and score as the normal search
+		for empty in (FULL_MASK, FULL_MASK ^ LOCK_MASKS[0], FULL_MASK ^ LOCK_MASKS[0] ^ LOCK_MASKS[21]):
+			results = []
+			
+			for algorithm in ("pvs", "dfpn"):
+				AI = AIClass(None, cachePath=None, bookPath=None, tablebasePath=None, useGrundy=False, algorithm=algorithm)
+				results.append(AI.solvePosition(empty))
+			
+			self.assertEqual(results[0], results[1])
+		
+		
+		# the positions of the proof search are counted by depth too
+		repo = RepositoryClass()
+		repo.board.makeMove(True, 1, 1)
+		stats = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=None, useGrundy=False, algorithm="dfpn").makeMove()
+		self.assertEqual(sum(stats.plyNodes), stats.nodes)
+	
+	
+	def test_opening_book(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "book.bin")
+			
+			
+			# a position solved before the build was stopped is kept, half a record is skipped
+			positions = openingPositions(24)
+			self.assertEqual(positions[0], FULL_MASK)
+			
+			with open(path + ".checkpoint", "wb") as file:
+				file.write(RECORD.pack(positions[1], 7, FLAG_PROVEN | FLAG_USED, 5, 32))
+				file.write(RECORD.pack(positions[2], 7, FLAG_PROVEN | FLAG_USED, 5, 30)[:10])
+			
+			count = buildBook(path, 24, 1, None)
+			self.assertEqual(count, len(positions))
+			self.assertFalse(os.path.exists(path + ".checkpoint"))
+			
+			book = BinaryTableClass(path)
+			self.assertEqual(book.get(positions[1]), (7, FLAG_PROVEN | FLAG_USED, 5, 32))
+			self.assertEqual(book.get(positions[2])[2], AIClass(None, cachePath=None, bookPath=None, grundyTablePath=None).solvePosition(positions[2])[1])
+			
+			
+			# the AI plays the book moves without searching
+			repo = RepositoryClass()
+			repo.board.makeMove(True, 3, 3)
+			AI = AIClass(repo, cachePath=None, bookPath=path, grundyTablePath=None)
+			AI.makeMove()
+			
+			self.assertEqual(len(repo.board.moves), 2)
+			self.assertEqual(AI.nodes, 0)
+			book.close()
+	
+	
+	def test_tablebase(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "tablebase.bin")
+			count = buildTablebase(path, 12)
+			
+			tablebase = TablebaseClass(path)
+			self.assertEqual(len(tablebase), count)
+			self.assertEqual(tablebase.maxEmpty, 12)
+			
+			
+			# the game is over, the player to move lost
+			self.assertEqual(tablebase.probe(0), (False, 0, NO_MOVE))
+			
+			# the results are the same as the ones of a full search
+			AI = AIClass(None, cachePath=None, bookPath=None, tablebasePath=None, useGrundy=False)
+			for empty in reachablePositions(12)[1::500]:
+				wins, movesLeft, move = tablebase.probe(empty)
+				self.assertEqual(AI.solvePosition(empty)[1], wins and 10 - movesLeft or movesLeft - 10)
+				self.assertEqual(empty >> move & 1, 1)
+			
+			# positions with too many empty squares aren't in the table
+			self.assertIsNone(tablebase.probe(FULL_MASK))
+			
+			
+			# the AI plays the moves of the table without searching
+			repo = RepositoryClass()
+			for i, move in enumerate([(1, 1), (1, 4), (4, 1), (4, 4)]):
+				repo.board.makeMove(i % 2 == 0, *move)
+			
+			AI = AIClass(repo, cachePath=None, bookPath=None, tablebasePath=path, grundyTablePath=None)
+			AI.makeMove()
+			self.assertEqual(len(repo.board.moves), 5)
+			self.assertEqual(AI.nodes, 0)
+			tablebase.close()
+		
+		
+		# a missing file is an empty table
+		self.assertEqual(TablebaseClass("notfound.bin").maxEmpty, -1)
+	
+	
 	def test_sounds_manager(self):
 		pygame.init() # needs to be initialized before using the SoundManagerClass
 		soundsManager = SoundManagerClass("../sounds/")
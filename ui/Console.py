@@ -28,6 +28,8 @@ class ConsoleClass:
 					print("[ValueError]:" + str(ve))
 				except (DomainError, ServicesError, UIError) as err:
 					print(err)
+			
+			self.__services.close()
 		elif userInput == "exit":
 			self.running = False
 			return
@@ -1,5 +1,6 @@
 
 import pygame
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from domain import DomainError
 from services import ServicesError, MainService
@@ -34,6 +35,14 @@ class GUIClass:
 		self.__running = True
 		self.__score = [0, 0]
 		
+		# the AI moves are searched on a background thread, so the window keeps drawing and handling events
+		# self.__AIFuture is the move being searched (None = it's the human's turn)
+		self.__AIExecutor = ThreadPoolExecutor(max_workers=1)
+		self.__AIFuture = None
+		# frames per second, the search gets the CPU while the frame loop waits
+		self.__clock = pygame.time.Clock()
+		self.__FPS = 60
+		
 		# fonts
 		self.__titlefont = pygame.font.SysFont("Impact", 150)
 		self.__creditsfont = pygame.font.SysFont("Impact", 35)
@@ -205,7 +214,7 @@ class GUIClass:
 		self.__BackButton.makeShadow(offset=5)
 		
 		# ID = -10 is for events that won't ever be unbinded
-		self.__bindButton(self.__BackButton, "Game", -10, self.__changeState, ["Main Menu"], extraArgsHover={
+		self.__bindButton(self.__BackButton, "Game", -10, self.__leaveGame, [], extraArgsHover={
 			# this is the color change dictionary
 			"init": ColorEnums.LIGHT_GREEN,
 			"hover": ColorEnums.LIGHTER_GREEN
@@ -246,6 +255,15 @@ class GUIClass:
 		self.__LoseLabel.beText(self.__outcomefont, "You lost.")
 		self.__LoseLabel.makeShadow(offset=5)
 		
+		# shown while the AI is searching its move
+		self.__ThinkingText = GUIObjectClass(
+			self.__screen,
+			5, 5, startX - 20, startY - 10
+		)
+		
+		self.__ThinkingText.beText(self.__creditsfont, "Thinking", color=ColorEnums.WHITE)
+		self.__ThinkingText.makeTextShadow(offset=3)
+		
 		
 	def __renderGame(self):
 		# background
@@ -261,6 +279,13 @@ class GUIClass:
 			self.__WinLabel.render()
 		elif self.__gameState == "lost":
 			self.__LoseLabel.render()
+		
+		if self.__AIFuture is not None:
+			# 0 to 3 dots, one more every 300 ms
+			dots = "." * (pygame.time.get_ticks() // 300 % 4)
+			self.__ThinkingText.beText(self.__creditsfont, "Thinking" + dots, color=ColorEnums.WHITE)
+			self.__ThinkingText.makeTextShadow(offset=3)
+			self.__ThinkingText.render()
 	# ----
 	
 	# MAIN MENU
@@ -405,14 +430,20 @@ class GUIClass:
 				if self.__state == "Main Menu":
 					self.__renderMainMenu()
 				elif self.__state == "Game":
+					self.__checkAIMove()
 					self.__renderGame()
 				
 				# events should be handled before display (such as button presses)
 				self.__handleEvents()
 				
 				pygame.display.flip()
+				self.__clock.tick(self.__FPS)
 			except (DomainError, ServicesError, UIError, SoundError) as err:
 				print(err)
+		
+		self.__cancelAIMove()
+		self.__AIExecutor.shutdown(wait=True)
+		self.__service.close()
 	
 	
 	# defining all event functions here
@@ -420,6 +451,11 @@ class GUIClass:
 		self.__running = False
 	
 	
+	def __leaveGame(self):
+		self.__cancelAIMove()
+		self.__changeState("Main Menu")
+	
+	
 	def __clickedButton(self, xPos: int, yPos: int, width: int, height: int, whatToDoFunc, extraArgs: list = ()):
 		mouse = pygame.mouse.get_pos()
 		if xPos <= mouse[0] <= xPos + width and yPos <= mouse[1] <= yPos + height:
@@ -445,6 +481,8 @@ class GUIClass:
 		
 	
 	def __startGame(self, HumanStarts: bool):
+		self.__cancelAIMove()
+		self.__service.close()
 		self.__gameState = ""
 		self.__changeState("Game")
 		self.__resetGameGUI()
@@ -461,24 +499,59 @@ class GUIClass:
 	
 	
 	def __makeMove(self, row, col):
-		if self.__justChangedState:
+		if self.__justChangedState or self.__AIFuture is not None:
 			return
 		
-		didHumanWin = self.__service.makeHumanMove(str(row) + " " + str(col))
+		# only the human move is made here, the AI move is searched in the background (see __checkAIMove)
+		didHumanWin = self.__service.makeHumanMove(str(row) + " " + str(col), AIMoves=False)
 		
 		self.__updateAllTiles()
+		
+		if self.__service.isGameOver():
+			self.__endGame(didHumanWin)
+		else:
+			self.__AIFuture = self.__AIExecutor.submit(self.__service.makeAIMove)
 	
+	
+	def __checkAIMove(self):
+		# called every frame, shows the AI move once the search is done
+		
+		if self.__AIFuture is None or not self.__AIFuture.done():
+			return
+		
+		future = self.__AIFuture
+		self.__AIFuture = None
+		# raises the errors of the search, like it was called here
+		future.result()
+		
+		self.__updateAllTiles()
+		
 		if self.__service.isGameOver():
-			if didHumanWin:
-				self.__soundManager.playSound("win")
-				self.__gameState = "won"
-				self.__score[0] += 1
-			else:
-				self.__soundManager.playSound("lose")
-				self.__gameState = "lost"
-				self.__score[1] += 1
-			
-			self.__ScoreText.beText(self.__creditsfont, str(self.__score[0]) + " : " + str(self.__score[1]), color=ColorEnums.WHITE)
-			self.__ScoreText.makeTextShadow(offset=3)
-				
-				
\ No newline at end of file
+			self.__endGame(False)
+	
+	
+	def __cancelAIMove(self):
+		# stops the search of the AI move, if there is one, its result is never shown
+		# and the search of the human replies (pondering) if the game is left on the human's turn
+		
+		if self.__AIFuture is not None:
+			self.__service.cancelAIMove()
+			# the search stops within a few hundred positions, the service can't be closed while it's still searching
+			wait([self.__AIFuture])
+			self.__AIFuture = None
+		
+		self.__service.stopPondering()
+	
+	
+	def __endGame(self, didHumanWin):
+		if didHumanWin:
+			self.__soundManager.playSound("win")
+			self.__gameState = "won"
+			self.__score[0] += 1
+		else:
+			self.__soundManager.playSound("lose")
+			self.__gameState = "lost"
+			self.__score[1] += 1
+		
+		self.__ScoreText.beText(self.__creditsfont, str(self.__score[0]) + " : " + str(self.__score[1]), color=ColorEnums.WHITE)
+		self.__ScoreText.makeTextShadow(offset=3)